@@ -7,17 +7,24 @@ Tabs:
 2. Momentum Analysis (Velocity)
 3. Engagement Metrics (Economics)
 4. External Factors (Weather)
+5. Anomaly Explorer (paged audit browser)
+6. Zone Map (volatility / leakage / momentum choropleths)
 """
 
-import os
-import json
 import warnings
+from datetime import date
 import pandas as pd
-import numpy as np
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+from lazy_imports import lazy_import, module_available
+
+# Plotly loads when the first chart is drawn, not before the data is read
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+pdk = lazy_import("pydeck")
+folium = lazy_import("folium")
+PYDECK_AVAILABLE = module_available("pydeck")
+FOLIUM_AVAILABLE = module_available("folium")
 
 warnings.filterwarnings('ignore')
 
@@ -32,68 +39,175 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Constants
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
-CACHE_DIR = os.path.join(BASE_DIR, "cache")
+# Constants (data access lives in dashboard_data.py)
+import dashboard_data
+import dashboard_artifacts
+import zone_geometry
+from fingerprints import file_stat
+
+BASE_DIR = dashboard_data.BASE_DIR
+OUTPUT_DIR = dashboard_data.OUTPUT_DIR
+CACHE_DIR = dashboard_data.CACHE_DIR
 
 # ============================================================================
 # DATA LOADING
 # ============================================================================
+# Nothing is read at start-up: each tab loads its own datasets the first
+# time it is shown (column-projected, Parquet when available) and Streamlit
+# keeps them cached across reruns.
+#
+# Every cached loader takes the stamp (path, size, mtime_ns) of the files it
+# reads as an argument, so it is part of the cache key. Stamps are re-read
+# on each rerun (a few stat calls); when the engine rewrites a file only
+# the loaders that read it miss, everything else stays cached. max_entries
+# drops superseded versions.
+
+CACHE_VERSIONS = 2
+
+
+@st.cache_data(max_entries=CACHE_VERSIONS)
+def _load_stats(stamp):
+    return dashboard_data.load_stats()
+
+
+def load_stats():
+    return _load_stats(dashboard_data.output_stamp("market_stats.json"))
+
+
+@st.cache_data(max_entries=CACHE_VERSIONS * len(dashboard_data.DATASETS))
+def _load_dataset(key, stamp):
+    try:
+        return dashboard_data.load_dataset(key)
+    except Exception as e:
+        st.error(f"Error loading {key}: {e}")
+        return None
+
+
+def load_dataset(key):
+    return _load_dataset(key, dashboard_data.dataset_stamp(key))
+
+
+@st.cache_data(max_entries=CACHE_VERSIONS)
+def _load_correlation_text(stamp):
+    return dashboard_data.load_correlation_text()
+
+
+def load_correlation_text():
+    return _load_correlation_text(dashboard_data.output_stamp("correlation_summary.txt"))
+
+
+@st.cache_data(max_entries=CACHE_VERSIONS)
+def _anomaly_count(stats_stamp, audit_stamp):
+    return dashboard_data.anomaly_count(load_stats())
+
+
+def anomaly_count():
+    return _anomaly_count(dashboard_data.output_stamp("market_stats.json"),
+                          dashboard_data.dataset_stamp('anomalies'))
+
+
+# Precomputed per engine run (dashboard_artifacts.py); used when no live
+# filters are set
+@st.cache_data(max_entries=CACHE_VERSIONS * 8)
+def _load_artifact(name, stamp):
+    return dashboard_data.load_artifact(name)
+
+
+def load_artifact(name):
+    return _load_artifact(name, dashboard_data.artifact_stamp(name))
 
-@st.cache_data
-def load_data():
-    """Load all analysis outputs."""
-    data = {}
-    
-    # 1. Stats
-    if os.path.exists(f"{OUTPUT_DIR}/market_stats.json"):
-        with open(f"{OUTPUT_DIR}/market_stats.json", 'r') as f:
-            data['stats'] = json.load(f)
-            
-    # 2. CSVs
-    files = {
-        'anomalies': f"{OUTPUT_DIR}/anomaly_audit.csv",
-        'leakage': f"{OUTPUT_DIR}/leakage_report.csv",
-        'volatility': f"{OUTPUT_DIR}/regional_volatility.csv",
-        'momentum_2024': f"{OUTPUT_DIR}/momentum_2024.csv",
-        'momentum_2025': f"{OUTPUT_DIR}/momentum_2025.csv",
-        'transactions': f"{OUTPUT_DIR}/daily_transactions_2025.csv",
-        'engagement': f"{OUTPUT_DIR}/engagement_metrics.csv",
-        'factors': f"{CACHE_DIR}/external_factors_2025.csv"
-    }
-    
-    for key, path in files.items():
-        if os.path.exists(path):
-            try:
-                data[key] = pd.read_csv(path)
-            except Exception as e:
-                st.error(f"Error loading {key}: {e}")
-    
-    # 3. Text
-    if os.path.exists(f"{OUTPUT_DIR}/correlation_summary.txt"):
-        with open(f"{OUTPUT_DIR}/correlation_summary.txt", 'r') as f:
-            data['correlation_text'] = f.read()
-            
-    return data
 
-DATA = load_data()
+def load_figure(name):
+    return load_artifact(f"fig_{name}.json")
+
+# ============================================================================
+# LIVE FILTERED QUERIES
+# ============================================================================
+# With live filters on, tabs push their filters down to DuckDB over the
+# year/taxi trip partitions through an in-process QueryService. Its result
+# cache is LRU, keyed on the query parameters and capped by entries and MB,
+# so a repeated filter combination returns without touching the data.
+
+LIVE_CACHE_ENTRIES = 128
+LIVE_CACHE_MB = 256
+DEFAULT_RANGE = (date(2025, 1, 1), date(2025, 3, 31))
+
+
+@st.cache_resource
+def get_query_service():
+    import query_service
+    return query_service.QueryService(cache_size=LIVE_CACHE_ENTRIES, cache_mb=LIVE_CACHE_MB)
+
+
+def live_query(name, **params):
+    """Runs a query-service metric; returns a DataFrame or None (with a warning)."""
+    import query_service
+    try:
+        table, _ = get_query_service().metric(name, params)
+    except query_service.BadRequest as e:
+        st.warning(f"No result for these filters: {e}")
+        return None
+    return table.to_pandas()
+
+
+def sidebar_filters():
+    """Active filters, or None to show the engine's precomputed outputs."""
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### Filters")
+    if not st.sidebar.checkbox("Live filters (query trip data)", value=False):
+        return None
+
+    dates = st.sidebar.date_input("Date range", value=DEFAULT_RANGE)
+    if not isinstance(dates, (list, tuple)) or len(dates) != 2:
+        st.sidebar.info("Select an end date.")
+        return None
+    start, end = dates
+    taxi = st.sidebar.selectbox("Taxi type", ["all", "yellow", "green"], index=1)
+    zone_mode = st.sidebar.radio("Zones", ["Core zone", "All zones", "Custom"])
+    if zone_mode == "Core zone":
+        zones = "core"
+    elif zone_mode == "All zones":
+        zones = "all"
+    else:
+        picked = st.sidebar.multiselect("Zone IDs", list(range(1, 266)), default=[4, 12, 13])
+        zones = tuple(picked) if picked else "core"
+
+    cache = get_query_service().cache.stats()
+    st.sidebar.caption(f"Query cache: {cache['entries']} results, {cache['mb']:.1f}/{cache['max_mb']:.0f} MB, "
+                       f"{cache['hits']} hits / {cache['misses']} misses")
+    return {'start': start, 'end': end, 'taxi': taxi, 'zones': zones}
 
 # ============================================================================
 # TAB 1: REGIONAL VOLATILITY
 # ============================================================================
 
-def tab_volatility():
+def tab_volatility(filters=None):
     st.header("🗺️ Tab 1: Regional Volatility")
-    st.markdown("""
+    if filters:
+        start, end = filters['start'], filters['end']
+        st.markdown(f"""
+        **Analysis**: Identifying regions with anomalous transaction volume shifts.
+        Comparing Drop-off volumes {start:%b %d}-{end:%b %d}, {end.year - 1} vs {end.year}.
+    """)
+        df = live_query('zone_volume_change', start=start, end=end,
+                        taxi=filters['taxi'], min_count=100)
+        if df is not None:
+            df = df.rename(columns={'count_before': f'count_{end.year - 1}', 'count_after': f'count_{end.year}'})
+            zones = filters['zones']
+            if zones not in ("core", "all"):
+                df = df[df['location_id'].isin(zones)]
+        before, after = f'count_{end.year - 1}', f'count_{end.year}'
+    else:
+        st.markdown("""
         **Analysis**: Identifying regions with anomalous transaction volume shifts.
         Comparing Drop-off volumes in Q1 2024 vs Q1 2025.
     """)
-    
-    df = DATA.get('volatility')
+        df = load_dataset('volatility')
+        before, after = 'count_2024', 'count_2025'
+
     if df is not None and not df.empty:
         # Filter for significant volume
-        df = df[df['count_2024'] > 100]
+        df = df[df[before] > 100]
         
         # Sort by pct change
         df = df.sort_values('pct_change', ascending=False)
@@ -119,7 +233,7 @@ def tab_volatility():
         with col2:
             st.write("#### Detailed Metrics")
             st.dataframe(
-                top_inc[['location_id', 'count_2024', 'count_2025', 'pct_change']]
+                top_inc[['location_id', before, after, 'pct_change']]
                 .style.format({'pct_change': '{:.1f}%'})
             )
             
@@ -131,64 +245,71 @@ def tab_volatility():
 # TAB 2: MOMENTUM ANALYSIS
 # ============================================================================
 
-def tab_momentum():
+def tab_momentum(filters=None):
     st.header("⚡ Tab 2: Market Momentum (Velocity)")
     st.markdown("**Hypothesis**: Did the fee structure increase transaction velocity in the core zone?")
     
-    v24 = DATA.get('momentum_2024')
-    v25 = DATA.get('momentum_2025')
+    figures = None
+    if filters:
+        # Same months of the end year and the year before
+        year = filters['end'].year
+        first = filters['start'].month if filters['start'].year == year else 1
+        months = dict(start_month=first, end_month=filters['end'].month,
+                      taxi=filters['taxi'], zones=filters['zones'])
+        period = f"{date(year, first, 1):%b}-{filters['end']:%b}"
+        years = (year - 1, year)
+        frames = [live_query('momentum', year=y, **months) for y in years]
+        matrices = [dashboard_artifacts.momentum_matrix(df) if df is not None and not df.empty else None
+                    for df in frames]
+        if all(matrices):
+            figures = [dashboard_artifacts.momentum_figure(m, f"{period} {y} Momentum Profile")
+                       for m, y in zip(matrices, years)]
+    else:
+        # Matrices and figure specs come ready-made from the engine run
+        heatmaps = load_artifact("momentum_heatmaps.json") or {}
+        years = dashboard_artifacts.MOMENTUM_YEARS
+        matrices = [heatmaps.get(str(y)) for y in years]
+        if all(matrices):
+            figures = [load_figure(f"momentum_{y}") for y in years]
+            if not all(figures):
+                figures = [dashboard_artifacts.momentum_figure(m, f"Q1 {y} Momentum Profile")
+                           for m, y in zip(matrices, years)]
     
-    if v24 is not None and v25 is not None:
+    if figures:
         col1, col2 = st.columns(2)
-        
-        def make_heatmap(df, year):
-            # df columns: dow, hour, avg_momentum
-            pivot = df.pivot_table(index='dow', columns='hour', values='avg_momentum')
-            
-            days = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
-            
-            # Reindex if possible
-            existing_indices = pivot.index
-            mapped_indices = [days[i] for i in existing_indices if i < 7]
-            
-            fig = px.imshow(
-                pivot,
-                labels=dict(x="Hour of Day", y="Day of Week", color="Momentum Index"),
-                y=mapped_indices if len(mapped_indices) == len(existing_indices) else pivot.index,
-                title=f"Q1 {year} Momentum Profile",
-                color_continuous_scale='Viridis',
-                aspect="auto"
-            )
-            return fig
-
         with col1:
-            st.plotly_chart(make_heatmap(v24, 2024), use_container_width=True)
+            st.plotly_chart(figures[0], use_container_width=True)
         with col2:
-            st.plotly_chart(make_heatmap(v25, 2025), use_container_width=True)
+            st.plotly_chart(figures[1], use_container_width=True)
             
         # Comparison delta
-        avg24 = v24['avg_momentum'].mean()
-        avg25 = v25['avg_momentum'].mean()
+        avg24 = matrices[0]['mean']
+        avg25 = matrices[1]['mean']
         delta = avg25 - avg24
         pct = (delta / avg24) * 100 if avg24 != 0 else 0
         
         st.metric("Overall Momentum Shift", f"{delta:.2f} Index Points", f"{pct:.1f}%")
         
     else:
-        st.warning("Momentum data missing.")
+        st.warning("Momentum data missing. Run the engine (and the artifacts stage).")
 
 # ============================================================================
 # TAB 3: ENGAGEMENT METRICS
 # ============================================================================
 
-def tab_engagement():
+def tab_engagement(filters=None):
     st.header("💰 Tab 3: Engagement Economics")
     st.markdown("**Hypothesis**: Does the primary fee crowd out secondary value exchange?")
     
-    eng = DATA.get('engagement')
+    if filters:
+        eng = live_query('engagement', start=filters['start'], end=filters['end'],
+                         taxi=filters['taxi'], zones=filters['zones'])
+    else:
+        eng = load_dataset('engagement')
     
     if eng is not None:
         # eng: month, avg_fee, avg_engagement_score
+        from plotly.subplots import make_subplots
         fig = make_subplots(specs=[[{"secondary_y": True}]])
         
         fig.add_trace(
@@ -222,75 +343,274 @@ def tab_engagement():
 # TAB 4: EXTERNAL FACTORS
 # ============================================================================
 
-def tab_factors():
+def tab_factors(filters=None):
     st.header("🌧️ Tab 4: External Factors")
     st.markdown("**Hypothesis**: Elasticity of demand relative to external conditions.")
     
-    trans = DATA.get('transactions')
-    factors = DATA.get('factors')
-    
-    if trans is not None and factors is not None:
-        # Merge
+    if filters:
+        trans = live_query('daily_transactions', start=filters['start'], end=filters['end'],
+                           taxi=filters['taxi'])
+        factors = load_dataset('factors')
+        if trans is None or factors is None:
+            st.warning("External factor data missing.")
+            return
         try:
-            trans['date'] = pd.to_datetime(trans['date'])
-            factors['date'] = pd.to_datetime(factors['date'])
-            merged = pd.merge(trans, factors, on='date')
-        except:
-             st.error("Date format mismatch between transaction and factor data")
-             return
+            merged = dashboard_artifacts.factor_frame(trans, factors)
+        except (KeyError, ValueError):
+            st.error("Date format mismatch between transaction and factor data")
+            return
+        fit = dashboard_artifacts.fit_trendline(merged)
+        period = f"{filters['start']:%b %d} - {filters['end']:%b %d, %Y}"
+        fig = dashboard_artifacts.factor_figure(merged, fit, f"Daily Transactions vs External Factor ({period})")
+        line = dashboard_artifacts.transactions_figure(trans, f"Daily Transactions ({period})")
+    else:
+        # Merged frame, OLS fit and figure spec come ready-made from the engine run
+        fit = load_artifact("factors_trendline.json")
+        fig = load_figure("factors")
+        if fig is None:
+            merged = load_artifact("factors_merged.parquet")
+            if merged is None:
+                st.warning("External factor data missing. Run the engine (and the artifacts stage).")
+                return
+            fig = dashboard_artifacts.factor_figure(merged, fit, "Daily Transactions vs External Factor (2025)")
+        line = load_figure("transactions")
 
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            fig = px.scatter(
-                merged, 
-                x='factor_value', 
-                y='transactions', 
-                trendline='ols',
-                title="Daily Transactions vs External Factor (2025)",
-                labels={'factor_value': 'Factor Intensity', 'transactions': 'Transaction Volume'}
-            )
-            st.plotly_chart(fig, use_container_width=True)
-            
-        with col2:
-            st.write("### Analysis")
-            if 'correlation_text' in DATA:
-                st.text(DATA['correlation_text'])
-            
-            corr = merged['transactions'].corr(merged['factor_value'])
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        st.plotly_chart(fig, use_container_width=True)
+        
+    with col2:
+        st.write("### Analysis")
+        correlation_text = load_correlation_text()
+        if correlation_text:
+            st.text(correlation_text)
+        
+        if fit is None:
+            st.info("Not enough data points for a correlation.")
+        else:
+            corr = fit['correlation']
             st.metric("Correlation", f"{corr:.3f}")
-            
+
             if abs(corr) < 0.3:
                 st.info("Demand is Inelastic (External factors have low impact).")
             else:
                 st.info("Demand is Elastic (External factors drive volume).")
 
+    if line is not None:
+        st.plotly_chart(line, use_container_width=True)
+
+# ============================================================================
+# TAB 5: ANOMALY EXPLORER
+# ============================================================================
+# Filtering, sorting and paging run in DuckDB over anomaly_audit.parquet
+# (see dashboard_data); the session keeps a stack of page cursors so only
+# the current page is ever held in pandas.
+
+@st.cache_data(max_entries=CACHE_VERSIONS)
+def _anomaly_facets(stamp):
+    return dashboard_data.anomaly_facets()
+
+
+def anomaly_facets():
+    return _anomaly_facets(dashboard_data.dataset_stamp('anomalies'))
+
+
+@st.cache_data(max_entries=256)
+def _anomaly_match_count(filters, stamp):
+    return dashboard_data.anomaly_match_count(dict(filters))
+
+
+def anomaly_match_count(filters):
+    return _anomaly_match_count(filters, dashboard_data.dataset_stamp('anomalies'))
+
+
+def parse_zone_ids(text):
+    try:
+        return tuple(sorted({int(z) for z in text.replace(" ", "").split(",") if z}))
+    except ValueError:
+        st.warning("Zone IDs must be comma-separated numbers, e.g. 4, 12, 13")
+        return ()
+
+
+def tab_anomalies():
+    st.header("🔍 Tab 5: Anomaly Explorer")
+    st.markdown("Browse flagged transactions. Filters and sorting run server-side; one page is loaded at a time.")
+
+    facets = anomaly_facets()
+    if not facets['flags']:
+        st.warning("No Parquet anomaly audit found. Run the processing engine first.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        flags = st.multiselect("Rule", facets['flags'])
+        vendors = st.multiselect("Vendor", facets['vendors'])
+    with col2:
+        zones = parse_zone_ids(st.text_input("Zone IDs (pickup or drop-off)", ""))
+        dates = st.date_input("Pickup dates", value=(date(2025, 1, 1), date(2025, 12, 31)))
+    with col3:
+        sort = st.selectbox("Sort by", dashboard_data.ANOMALY_SORTS)
+        descending = st.checkbox("Descending", value=True)
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+    filters = {'flags': tuple(flags), 'vendors': tuple(vendors), 'zones': zones}
+    if isinstance(dates, (list, tuple)) and len(dates) == 2:
+        filters['start'], filters['end'] = dates
+    filters = tuple(sorted(filters.items()))
+
+    # New query -> back to the first page
+    query = (filters, sort, descending, page_size)
+    if st.session_state.get('anomaly_query') != query:
+        st.session_state['anomaly_query'] = query
+        st.session_state['anomaly_cursors'] = [None]
+    cursors = st.session_state['anomaly_cursors']
+
+    page, next_cursor = dashboard_data.anomaly_page(dict(filters), sort=sort, descending=descending,
+                                                    after=cursors[-1], page_size=page_size)
+    total = anomaly_match_count(filters)
+    first = (len(cursors) - 1) * page_size
+    st.caption(f"Rows {first + 1 if len(page) else 0:,}-{first + len(page):,} of {total:,} matching anomalies")
+    st.dataframe(page, use_container_width=True, hide_index=True)
+
+    prev_col, next_col, _ = st.columns([1, 1, 6])
+    if prev_col.button("◀ Previous", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Next ▶", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# ============================================================================
+# TAB 6: ZONE MAP
+# ============================================================================
+# Geometry comes pre-simplified from cache/zone_geometry.npz; the view's
+# detail level picks which simplification is drawn, so the city overview
+# sends a fraction of the full-resolution outlines. Metric values are joined
+# to zones by LocationID with array lookups.
+
+MAP_LEVELS = {"City overview": "coarse", "Borough": "medium", "Neighbourhood": "fine"}
+MAP_ZOOM = {"coarse": 9.5, "medium": 10.5, "fine": 11.5}
+MAP_CENTER = (40.70, -73.95)
+
+
+def zone_source_stamp():
+    source = zone_geometry.find_source()
+    return (str(source), file_stat(source)) if source else None
+
+
+@st.cache_resource(max_entries=CACHE_VERSIONS)
+def load_zone_geometry(stamp):
+    return zone_geometry.load_zones(download=False)
+
+
+@st.cache_data(max_entries=CACHE_VERSIONS * len(MAP_LEVELS))
+def zone_polygons(level, stamp):
+    return load_zone_geometry(stamp).polygons(level)
+
+
+def zone_metric(metric, filters):
+    """(location_ids, values, label, diverging) for a map metric, or None."""
+    if metric == "Volatility":
+        df = load_dataset('volatility')
+        if df is None:
+            return None
+        return df['location_id'], df['pct_change'], "Drop-off volume change (%)", True
+    if metric == "Leakage":
+        df = load_dataset('leakage')
+        if df is None:
+            return None
+        return df['pickup_loc'], df['leakage_rate'] * 100, "Leakage rate (%)", False
+    params = dict(start=filters['start'], end=filters['end'], taxi=filters['taxi']) if filters else {}
+    df = live_query('zone_momentum', **params)
+    if df is None:
+        return None
+    return df['location_id'], df['pct_change'], "Momentum change vs prior year (%)", True
+
+
+def tab_zone_map(filters=None):
+    st.header("🗺️ Tab 6: Zone Map")
+
+    stamp = zone_source_stamp()
+    if stamp is None:
+        st.warning("Zone shapes not found. Run `python core_modules/zone_geometry.py` to download "
+                   "the TLC zone shapefile (or place taxi_zones.geojson in data_downloads/).")
+        return
+    geometry = load_zone_geometry(stamp)
+
+    col1, col2 = st.columns([2, 1])
+    metric = col1.radio("Metric", ["Volatility", "Leakage", "Momentum"], horizontal=True)
+    level = MAP_LEVELS[col2.selectbox("Detail", list(MAP_LEVELS))]
+
+    result = zone_metric(metric, filters)
+    if result is None:
+        st.warning(f"{metric} data missing.")
+        return
+    ids, raw, label, diverging = result
+    values = geometry.join(ids, raw)
+    colors = zone_geometry.color_scale(values, diverging=diverging)
+    polygons = zone_polygons(level, stamp)
+
+    st.caption(f"{label}. {int((~pd.isna(values)).sum())} of {len(values)} zones have data; "
+               f"{geometry.stats()[level]['points']:,} boundary points at this detail level.")
+
+    if PYDECK_AVAILABLE:
+        rows = [{'polygon': polygon, 'location_id': int(geometry.location_ids[i]),
+                 'zone': str(geometry.names[i]), 'borough': str(geometry.boroughs[i]),
+                 'value': None if pd.isna(values[i]) else round(float(values[i]), 2),
+                 'color': colors[i].tolist()}
+                for i, zone in enumerate(polygons) for polygon in zone]
+        layer = pdk.Layer("PolygonLayer", rows, get_polygon="polygon", get_fill_color="color",
+                          get_line_color=[80, 80, 80, 140], line_width_min_pixels=0.5, pickable=True)
+        view = pdk.ViewState(latitude=MAP_CENTER[0], longitude=MAP_CENTER[1], zoom=MAP_ZOOM[level])
+        st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view, map_style=None,
+                                 tooltip={"text": "{zone} ({borough}) #{location_id}\n" + label + ": {value}"}))
+    elif FOLIUM_AVAILABLE:
+        import streamlit.components.v1 as components
+        hex_colors = ['#%02x%02x%02x' % tuple(c[:3]) for c in colors]
+        shown = [None if pd.isna(v) else round(float(v), 2) for v in values]
+        features = geometry.geojson(level, {'value': shown, 'color': hex_colors})
+        fmap = folium.Map(location=MAP_CENTER, zoom_start=int(MAP_ZOOM[level]), tiles="cartodbpositron")
+        folium.GeoJson(
+            features,
+            style_function=lambda f: {'fillColor': f['properties']['color'], 'color': '#555555',
+                                      'weight': 0.5, 'fillOpacity': 0.7},
+            tooltip=folium.GeoJsonTooltip(['zone', 'borough', 'value'], aliases=['Zone', 'Borough', label]),
+        ).add_to(fmap)
+        components.html(fmap._repr_html_(), height=600)
+    else:
+        st.error("Map rendering needs pydeck or folium (see requirements.txt).")
+
 # ============================================================================
 # MAIN APP
 # ============================================================================
 
 def main():
     st.sidebar.title("Navigation")
-    tab = st.sidebar.radio("Go to", ["Overview", "Volatility", "Momentum", "Engagement", "External Factors"])
+    tab = st.sidebar.radio("Go to", ["Overview", "Volatility", "Momentum", "Engagement", "External Factors",
+                                     "Anomaly Explorer", "Zone Map"])
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("### Key Metrics")
     
-    stats = DATA.get('stats', {})
+    stats = load_stats()
     if stats:
         st.sidebar.metric("YTD Revenue", f"${stats.get('revenue_2025', 0):,.0f}")
         val = stats.get('q1_pct_change', 0)
         st.sidebar.metric("Q1 Vol Delta", f"{val:.2f}%")
         
-    audit = DATA.get('anomalies')
-    if audit is not None:
-        st.sidebar.metric("Anomalies Flagged", f"{len(audit):,}")
+    # Count from market_stats.json / Parquet footer; the audit table itself is never loaded
+    flagged = anomaly_count()
+    if flagged is not None:
+        st.sidebar.metric("Anomalies Flagged", f"{flagged:,}")
+
+    filters = sidebar_filters()
 
     if tab == "Overview":
         st.title("📈 Market Trend Analysis Dashboard")
         st.markdown("### Executive Summary")
         st.write("This dashboard visualizes the 2025 market structure changes and their impact on efficiency.")
         
-        leakage = DATA.get('leakage')
+        leakage = load_dataset('leakage')
         if leakage is not None:
             st.markdown("### 🚨 Revenue Leakage Alert")
             st.write("Top regions with compliant transaction failures:")
@@ -300,13 +620,17 @@ def main():
             st.info(f"Total Projected Revenue 2025: **${stats.get('revenue_2025', 0):,.2f}**")
             
     elif tab == "Volatility":
-        tab_volatility()
+        tab_volatility(filters)
     elif tab == "Momentum":
-        tab_momentum()
+        tab_momentum(filters)
     elif tab == "Engagement":
-        tab_engagement()
+        tab_engagement(filters)
     elif tab == "External Factors":
-        tab_factors()
+        tab_factors(filters)
+    elif tab == "Anomaly Explorer":
+        tab_anomalies()
+    elif tab == "Zone Map":
+        tab_zone_map(filters)
 
 if __name__ == "__main__":
     main()
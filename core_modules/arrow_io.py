@@ -0,0 +1,70 @@
+"""
+Arrow IPC Handoff
+=================
+The engine writes its result tables as uncompressed Arrow IPC files
+(output/<name>.arrow), and consumers map them rather than parse them. This
+removes CSV formatting, parsing and type inference, and numeric columns reach
+pandas / NumPy without a copy.
+
+- write_table   one record batch, uncompressed, replaced atomically (.part)
+- read_table    memory-mapped read; buffers point into the page cache, so
+                selecting columns or counting rows touches no data pages
+- to_pandas     DataFrame whose null-free numeric columns are read-only views
+                of the Arrow buffers (no consolidation copy)
+
+A file that is replaced while mapped stays valid for its readers until they
+drop it, so the engine can rewrite outputs under a running dashboard or
+query service.
+"""
+
+import os
+
+from lazy_imports import lazy_import
+
+pa = lazy_import("pyarrow")
+
+IPC_SUFFIX = ".arrow"
+
+
+def ipc_path(directory, stem):
+    return os.path.join(str(directory), f"{stem}{IPC_SUFFIX}")
+
+
+def write_table(table, path):
+    """Writes a pyarrow Table as a single-chunk, uncompressed IPC file."""
+    path = str(path)
+    tmp = path + ".part"
+    # One chunk per column, so readers get contiguous (zero-copy) arrays
+    table = table.combine_chunks()
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+
+def select(table, columns=None):
+    """The `columns` present in table, in that order (all if None)."""
+    if columns is None:
+        return table
+    return table.select([c for c in columns if c in table.column_names])
+
+
+def read_table(path, columns=None):
+    """Memory-maps an IPC file; `columns` keeps those present, in that order."""
+    return select(pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all(), columns)
+
+
+def to_pandas(table):
+    """DataFrame sharing the Arrow buffers where the types allow it (read-only)."""
+    return table.to_pandas(split_blocks=True)
+
+
+def read_pandas(path, columns=None):
+    return to_pandas(read_table(path, columns))
+
+
+def num_rows(path):
+    """Row count from the record batch headers (no data pages read)."""
+    reader = pa.ipc.open_file(pa.memory_map(str(path), "r"))
+    return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
@@ -0,0 +1,656 @@
+"""
+End-to-End Benchmark Suite
+==========================
+Times the toolkit against synthetic TLC data at several scale factors and
+stores the results as JSON so runs can be compared over time.
+
+Measured stages (per scale factor):
+- data_ingestion.process_and_unify (all year/taxi streams) and the
+  analysis-ready projection (data_ingestion.build_analysis)
+- processing_engine phases: imputation, hourly trip rollup, anomaly audit,
+  trend analysis, factors
+- report_builder.generate_pdf
+- dashboard data access: former eager load vs lazy cold start, per-tab first view
+  and anomaly explorer page fetches
+- optionally, the per-zone x month PDF batch in docs/sec (--batch-reports)
+- optionally, raw vs analysis projection: size on disk / in memory and
+  per-operation scan time (--projection)
+- optionally, query service metrics from the hourly rollup vs a trip scan,
+  with a result parity check (--rollup)
+- optionally, engine -> pandas handoff per result table: CSV write + read_csv
+  vs Arrow IPC write + memory-mapped read (--handoff)
+- optionally, download + conditional revalidation of the monthly files
+  against a local HTTP stand-in for the TLC source (--revalidation)
+- optionally, every execution_backends operation on DuckDB vs Polars (--backends)
+- optionally, stage start-up cost: subprocess-per-stage vs in-process (--startup)
+- optionally, cold import time of each entry point via -X importtime (--imports)
+
+Usage:
+    python core_modules/benchmark_suite.py --scales 0.05 0.2 1.0
+    python core_modules/benchmark_suite.py --compare old.json new.json
+    python core_modules/benchmark_suite.py --scales 1.0 --backends --pick-backend
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import functools
+import threading
+import contextlib
+import http.server
+from datetime import datetime
+from pathlib import Path
+
+import arrow_io
+import synthetic_data
+import execution_backends
+import dashboard_data
+import dashboard_artifacts
+from resource_monitor import ResourceMonitor
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BASE_DIR = Path(__file__).parent.parent
+BENCH_DIR = BASE_DIR / "benchmarks"
+WORK_DIR = BENCH_DIR / "work"
+RESULTS_DIR = BENCH_DIR / "results"
+
+DEFAULT_SCALES = [0.05, 0.2, 1.0]
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+class StageTimer:
+    """Collects wall-clock timings and peak memory for named stages."""
+
+    def __init__(self):
+        self.timings = {}
+        self.memory = {}
+        self.errors = {}
+        # Budgets are never enforced while benchmarking; Python heap peaks
+        # are part of the report, so tracemalloc is on here
+        self.monitor = ResourceMonitor("benchmark", track_python=True, budgets=(None, {}))
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        try:
+            with self.monitor.phase(name):
+                yield
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            print(f"  -> Stage '{name}' failed: {e}")
+        record = self.monitor.phases[name]
+        self.timings[name] = record['wall_s']
+        self.memory[name] = {k: v for k, v in record.items() if k.startswith('peak_')}
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """Silences the modules' progress printing while timing."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def workspace(scale):
+    """Returns (data_dir, output_dir, cache_dir) for a scale factor."""
+    root = WORK_DIR / f"sf_{scale}"
+    dirs = (root / "data", root / "output", root / "cache")
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+    return dirs
+
+
+def point_modules_at(data_dir, output_dir, cache_dir):
+    """
+    Re-targets the toolkit modules' directory constants at a workspace.
+    The modules read these globals at call time, so rebinding is enough.
+    """
+    import data_ingestion
+    import processing_engine
+    import report_builder
+
+    data_ingestion.OUTPUT_DIR = str(data_dir)
+
+    processing_engine.DATA_DIR = Path(data_dir)
+    processing_engine.OUTPUT_DIR = Path(output_dir)
+    processing_engine.CACHE_DIR = Path(cache_dir)
+
+    report_builder.OUTPUT_DIR = str(output_dir)
+    report_builder.DATA_DIR = str(data_dir)
+    report_builder.PDF_FILE = os.path.join(str(output_dir), "market_summary.pdf")
+
+
+def host_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def bench_scale(scale, seed=synthetic_data.DEFAULT_SEED, regenerate=False, verbose=False):
+    """Runs every measured stage once at the given scale factor."""
+    print(f"\n[SCALE {scale}] Preparing synthetic workspace...")
+    data_dir, output_dir, cache_dir = workspace(scale)
+
+    marker = data_dir / "manifest.json"
+    if regenerate or not marker.exists():
+        shutil.rmtree(data_dir, ignore_errors=True)
+        data_dir.mkdir(parents=True)
+        t0 = time.perf_counter()
+        manifest = synthetic_data.generate_dataset(data_dir, scale=scale, seed=seed, cache_dir=cache_dir)
+        manifest['generation_s'] = round(time.perf_counter() - t0, 4)
+        with open(marker, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    else:
+        with open(marker) as f:
+            manifest = json.load(f)
+        if not (cache_dir / "external_factors_2025.csv").exists():
+            synthetic_data.generate_factors(cache_dir, seed=seed)
+
+    # Remove last run's imputed December so the imputation phase is measured
+    for taxi in synthetic_data.TAXI_TYPES:
+        imputed = data_dir / "2025" / taxi / f"{taxi}_tripdata_2025-12.parquet"
+        if imputed.exists():
+            imputed.unlink()
+
+    point_modules_at(data_dir, output_dir, cache_dir)
+    import data_ingestion
+    import processing_engine
+    import report_builder
+
+    timer = StageTimer()
+    print(f"  -> {manifest['total_rows']:,} synthetic rows. Timing stages...")
+
+    with quiet(not verbose):
+        with timer.stage('ingest.process_and_unify'):
+            for year in synthetic_data.DEFAULT_MONTHS:
+                for taxi in synthetic_data.TAXI_TYPES:
+                    data_ingestion.process_and_unify(year, taxi)
+
+        with timer.stage('engine.impute_december'):
+            processing_engine.impute_december_data()
+
+        with timer.stage('ingest.analysis_projection'):
+            data_ingestion.build_analysis(str(data_dir), force=True)
+
+        conn = processing_engine.get_duckdb_conn()
+        timer.monitor.attach(conn)
+        try:
+            count, vendors = 0, []
+            with timer.stage('engine.trip_rollup'):
+                processing_engine.update_rollup(conn)
+            with timer.stage('engine.anomaly_audit'):
+                count, vendors = processing_engine.run_anomaly_audit(conn)
+            with timer.stage('engine.trend_analysis'):
+                processing_engine.run_trend_analysis(conn, count, vendors)
+            with timer.stage('engine.external_factors'):
+                processing_engine.fetch_factors_and_analyze(conn)
+        finally:
+            conn.close()
+
+        with timer.stage('report.generate_pdf'):
+            report_builder.generate_pdf(force=True)
+
+    for name, secs in bench_dashboard_load(output_dir, cache_dir).items():
+        timer.timings[f'dashboard.{name}'] = secs
+
+    for name, secs in timer.timings.items():
+        print(f"     {name:.<40} {secs:>8.3f}s")
+
+    return {
+        'scale': scale,
+        'rows': manifest['total_rows'],
+        'timings': timer.timings,
+        'memory': timer.memory,
+        'errors': timer.errors,
+    }
+
+
+def eager_dashboard_load(output_dir, cache_dir):
+    """The dashboard's former start-up: every output read in full (CSV, else the Arrow file)."""
+    import pandas as pd
+    data = {}
+    with open(os.path.join(output_dir, "market_stats.json")) as f:
+        data['stats'] = json.load(f)
+    for key, (dir_attr, stem, _) in dashboard_data.DATASETS.items():
+        directory = cache_dir if dir_attr == "CACHE_DIR" else output_dir
+        path = os.path.join(directory, f"{stem}.csv")
+        if os.path.exists(path):
+            data[key] = pd.read_csv(path)
+        elif os.path.exists(arrow_io.ipc_path(directory, stem)):
+            data[key] = arrow_io.read_pandas(arrow_io.ipc_path(directory, stem))
+    return data
+
+
+def bench_dashboard_load(output_dir, cache_dir):
+    """
+    Times dashboard data access headless (no Streamlit needed):
+    - eager_load: the old start-up, reading every output CSV in full
+    - cold_start: what the first page now needs (stats, anomaly count, Overview)
+    - tab.<name>: first view of each tab
+    - anomaly.first_page / anomaly.next_page: explorer page fetches (the
+      first includes building the sort index)
+    - artifacts.build: the post-engine dashboard artifacts stage
+    - rerun.pandas / rerun.artifacts: per-rerun figure work for the Momentum
+      and External Factors tabs, reshaping frames vs loading the figure specs
+    """
+    dashboard_data.OUTPUT_DIR = str(output_dir)
+    dashboard_data.CACHE_DIR = str(cache_dir)
+    timings = {}
+
+    start = time.perf_counter()
+    eager_dashboard_load(output_dir, cache_dir)
+    timings['eager_load'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    stats = dashboard_data.load_stats()
+    dashboard_data.anomaly_count(stats)
+    dashboard_data.load_tab("Overview")
+    timings['cold_start'] = round(time.perf_counter() - start, 4)
+
+    for tab in dashboard_data.TAB_DATASETS:
+        if tab == "Overview":
+            continue
+        start = time.perf_counter()
+        dashboard_data.load_tab(tab)
+        timings[f'tab.{tab.lower().replace(" ", "_")}'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    _, cursor = dashboard_data.anomaly_page(sort='speed_mph', descending=True)
+    timings['anomaly.first_page'] = round(time.perf_counter() - start, 4)
+    if cursor is not None:
+        start = time.perf_counter()
+        dashboard_data.anomaly_page(sort='speed_mph', descending=True, after=cursor)
+        timings['anomaly.next_page'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    with quiet():
+        dashboard_artifacts.build_artifacts()
+    timings['artifacts.build'] = round(time.perf_counter() - start, 4)
+
+    if dashboard_artifacts.PLOTLY_AVAILABLE:
+        import plotly.graph_objects as go
+        frames = {key: dashboard_data.load_dataset(key)
+                  for key in ('momentum_2024', 'momentum_2025', 'transactions', 'factors')}
+        start = time.perf_counter()
+        for year in dashboard_artifacts.MOMENTUM_YEARS:
+            matrix = dashboard_artifacts.momentum_matrix(frames[f'momentum_{year}'])
+            dashboard_artifacts.momentum_figure(matrix, str(year))
+        merged = dashboard_artifacts.factor_frame(frames['transactions'], frames['factors'])
+        dashboard_artifacts.factor_figure(merged, dashboard_artifacts.fit_trendline(merged), "")
+        timings['rerun.pandas'] = round(time.perf_counter() - start, 4)
+
+        specs = [dashboard_data.load_figure(name) for name in ('momentum_2024', 'momentum_2025', 'factors')]
+        start = time.perf_counter()
+        for spec in specs:
+            go.Figure(spec)  # what st.plotly_chart does with a spec
+        timings['rerun.artifacts'] = round(time.perf_counter() - start, 4)
+    return timings
+
+
+def bench_backends(data_dir, repeats=3):
+    """
+    Times every backend operation on DuckDB and Polars (best of `repeats`).
+    Returns {'operations': {op: {backend: secs}}, 'totals': {...}, 'fastest': name}.
+    """
+    print("  -> Timing execution backends...")
+    timings = {}
+    totals = {}
+    for name in execution_backends.BACKENDS:
+        backend = execution_backends.get_backend(data_dir, name=name)
+        try:
+            for op in execution_backends.RESULT_KEYS:
+                best = None
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    backend.fetch(op)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.setdefault(op, {})[name] = round(best, 4)
+                totals[name] = totals.get(name, 0.0) + best
+        finally:
+            backend.close()
+
+    for op, per_backend in timings.items():
+        cells = "  ".join(f"{b} {t:>7.3f}s" for b, t in per_backend.items())
+        print(f"     {op:.<32} {cells}")
+
+    fastest = min(totals, key=totals.get)
+    return {
+        'operations': timings,
+        'totals': {k: round(v, 4) for k, v in totals.items()},
+        'fastest': fastest,
+    }
+
+
+def bench_handoff(output_dir, repeats=3):
+    """
+    Engine result -> pandas handoff per output table, best of `repeats`:
+    - csv:   DuckDB write_csv + pd.read_csv (the former path)
+    - arrow: arrow_io.write_table + memory-mapped read_pandas
+    The anomaly audit (Parquet) is included as the one large table.
+    """
+    import duckdb
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    tables = {}
+    for stem in ["leakage_report", "regional_volatility", "momentum_2024", "momentum_2025",
+                 "daily_transactions_2025", "engagement_metrics"]:
+        path = arrow_io.ipc_path(output_dir, stem)
+        if os.path.exists(path):
+            tables[stem] = arrow_io.read_table(path)
+    audit = os.path.join(str(output_dir), "anomaly_audit.parquet")
+    if os.path.exists(audit):
+        tables['anomaly_audit'] = pq.read_table(audit)
+
+    scratch = Path(output_dir) / ".handoff"
+    scratch.mkdir(exist_ok=True)
+    conn = duckdb.connect()
+    results = {}
+    try:
+        for stem, table in tables.items():
+            csv_path, ipc_path = str(scratch / f"{stem}.csv"), arrow_io.ipc_path(scratch, stem)
+            timings = {'csv': float('inf'), 'arrow': float('inf')}
+            for _ in range(repeats):
+                start = time.perf_counter()
+                conn.from_arrow(table).write_csv(csv_path)
+                pd.read_csv(csv_path)
+                timings['csv'] = min(timings['csv'], time.perf_counter() - start)
+                start = time.perf_counter()
+                arrow_io.write_table(table, ipc_path)
+                arrow_io.read_pandas(ipc_path)
+                timings['arrow'] = min(timings['arrow'], time.perf_counter() - start)
+            results[stem] = {'rows': table.num_rows,
+                             'csv_s': round(timings['csv'], 5), 'arrow_s': round(timings['arrow'], 5),
+                             'csv_bytes': os.path.getsize(csv_path), 'arrow_bytes': os.path.getsize(ipc_path)}
+    finally:
+        conn.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def print_handoff(results):
+    print(f"  {'table':<26} {'rows':>9} {'csv (ms)':>9} {'arrow (ms)':>11} {'speedup':>8}")
+    for stem, r in results.items():
+        print(f"  {stem:<26} {r['rows']:>9,} {r['csv_s'] * 1000:>9.2f} {r['arrow_s'] * 1000:>11.2f} "
+              f"{r['csv_s'] / max(r['arrow_s'], 1e-9):>7.1f}x")
+
+
+def save_backend_choice(backend_result, scale):
+    """Persists the fastest backend for this deployment (read by the engine)."""
+    path = execution_backends.BACKEND_CHOICE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'backend': backend_result['fastest'],
+            'totals': backend_result['totals'],
+            'scale': scale,
+            'host': host_info(),
+            'created': datetime.now().isoformat(timespec='seconds'),
+        }, f, indent=2)
+    return path
+
+
+def bench_batch_reports(year=2025):
+    """Per-zone x month PDF batch (75 zones x 12 months) on the current workspace."""
+    import report_builder
+    with quiet():
+        summary = report_builder.generate_batch(year, force=True)
+    print(f"     report.batch: {summary['documents']} docs in {summary['render_s']:.2f}s "
+          f"({summary['docs_per_s']} docs/s on {summary['workers']} worker(s), query {summary['query_s']:.2f}s)")
+    return summary
+
+
+class _SourceHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Local stand-in for the TLC CDN: static files with Last-Modified (from
+    SimpleHTTPRequestHandler) plus an ETag and If-None-Match support.
+    Counts the body bytes it sends.
+    """
+    bytes_sent = 0
+    requests_seen = 0
+
+    def send_head(self):
+        type(self).requests_seen += 1
+        path = self.translate_path(self.path)
+        self._etag = None
+        if os.path.isfile(path):
+            st = os.stat(path)
+            self._etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+            if self.headers.get("If-None-Match") == self._etag:
+                self.send_response(304)
+                self.end_headers()
+                return None
+        return super().send_head()
+
+    def end_headers(self):
+        if getattr(self, "_etag", None):
+            self.send_header("ETag", self._etag)
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        start = source.tell()
+        super().copyfile(source, outputfile)
+        type(self).bytes_sent += source.tell() - start
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_revalidation(scale):
+    """
+    Download, revalidate and republish cycle against a local HTTP stand-in
+    serving the workspace's monthly files: requests, bytes and time per pass.
+    """
+    import data_ingestion
+
+    data_dir = workspace(scale)[0]
+    months = sorted(data_dir.glob("*/*/*_tripdata_*.parquet"))
+    source_dir = WORK_DIR / "source_standin"
+    mirror_dir = WORK_DIR / f"revalidation_{scale}"
+    for d in (source_dir, mirror_dir):
+        shutil.rmtree(d, ignore_errors=True)
+        d.mkdir(parents=True)
+    for path in months:
+        shutil.copy2(path, source_dir / path.name)
+
+    handler = functools.partial(_SourceHandler, directory=str(source_dir))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def sync(revalidate):
+        _SourceHandler.bytes_sent = _SourceHandler.requests_seen = 0
+        manifest = data_ingestion.load_manifest(str(mirror_dir))
+        statuses = {}
+        start = time.perf_counter()
+        for path in months:
+            target = mirror_dir / path.relative_to(data_dir)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            status = data_ingestion.fetch(f"{base_url}/{path.name}", str(target), manifest,
+                                          str(mirror_dir), revalidate=revalidate)
+            statuses.setdefault(status, []).append(str(target))
+        data_ingestion.save_manifest(manifest, str(mirror_dir))
+        return {
+            'seconds': round(time.perf_counter() - start, 4),
+            'requests': _SourceHandler.requests_seen,
+            'bytes': _SourceHandler.bytes_sent,
+            'statuses': {k: len(v) for k, v in statuses.items()},
+            'streams': [f"{y}_{t}" for y, t in data_ingestion.changed_streams(
+                statuses.get('downloaded', []) + statuses.get('updated', []))],
+        }
+
+    try:
+        passes = {'initial': sync(False), 'revalidate.unchanged': sync(True)}
+        # TLC republishes a corrected month: new bytes, new mtime
+        republished = source_dir / months[len(months) // 2].name
+        republished.write_bytes(republished.read_bytes() + b"\0")
+        passes['revalidate.republished'] = sync(True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    for name, r in passes.items():
+        print(f"     revalidation.{name:<22} {r['requests']:>4} requests {r['bytes'] / 1e6:>9.2f} MB "
+              f"{r['seconds']:>8.3f}s  {r['statuses']}  re-unify: {', '.join(r['streams']) or '-'}")
+    return {'months': len(months), 'passes': passes}
+
+
+def run_benchmarks(scales, seed=synthetic_data.DEFAULT_SEED, regenerate=False, verbose=False, backends=False,
+                   batch_reports=False, revalidation=False, projection=False, rollup=False, handoff=False):
+    result = {
+        'run_id': uuid.uuid4().hex[:12],
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'host': host_info(),
+        'seed': seed,
+        'scales': [],
+    }
+    for scale in scales:
+        entry = bench_scale(scale, seed=seed, regenerate=regenerate, verbose=verbose)
+        if backends:
+            entry['backends'] = bench_backends(workspace(scale)[0])
+        if batch_reports:
+            entry['report_batch'] = bench_batch_reports()
+        if projection:
+            import data_ingestion
+            print(f"\n[PROJECTION] Raw vs analysis-ready trips (scale {scale})...")
+            entry['projection'] = data_ingestion.projection_report(str(workspace(scale)[0]))
+            data_ingestion.print_projection_report(entry['projection'])
+        if rollup:
+            import trip_rollup
+            print(f"\n[ROLLUP] Metrics from the hourly rollup vs a trip scan (scale {scale})...")
+            data_dir, output_dir, _ = workspace(scale)
+            entry['rollup'] = trip_rollup.check(str(data_dir), str(output_dir))
+            trip_rollup.print_check(entry['rollup'])
+        if handoff:
+            print(f"\n[HANDOFF] Engine results to pandas: CSV vs Arrow IPC (scale {scale})...")
+            entry['handoff'] = bench_handoff(workspace(scale)[1])
+            print_handoff(entry['handoff'])
+        if revalidation:
+            entry['revalidation'] = bench_revalidation(scale)
+        result['scales'].append(entry)
+    return result
+
+
+def save_results(result, out_dir=RESULTS_DIR):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = out_dir / f"bench_{stamp}_{result['run_id']}.json"
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def compare_results(old_path, new_path):
+    """Prints a per-scale, per-stage comparison of two result files."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    old_by_scale = {s['scale']: s for s in old['scales']}
+    print(f"\nComparing {Path(old_path).name} -> {Path(new_path).name}")
+    print(f"{'scale':>6} {'stage':<32} {'old (s)':>10} {'new (s)':>10} {'ratio':>8}")
+    print("-" * 70)
+    for entry in new['scales']:
+        base = old_by_scale.get(entry['scale'])
+        if base is None:
+            continue
+        for stage, secs in entry['timings'].items():
+            prev = base['timings'].get(stage)
+            if prev is None:
+                continue
+            ratio = secs / prev if prev > 0 else float('inf')
+            print(f"{entry['scale']:>6} {stage:<32} {prev:>10.3f} {secs:>10.3f} {ratio:>7.2f}x")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the toolkit on synthetic data.")
+    parser.add_argument("--scales", type=float, nargs='+', default=DEFAULT_SCALES)
+    parser.add_argument("--seed", type=int, default=synthetic_data.DEFAULT_SEED)
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild synthetic data even if cached")
+    parser.add_argument("--verbose", action="store_true", help="Show module output while timing")
+    parser.add_argument("--out", default=str(RESULTS_DIR), help="Directory for result JSON files")
+    parser.add_argument("--backends", action="store_true", help="Also time DuckDB vs Polars backend operations")
+    parser.add_argument("--pick-backend", action="store_true",
+                        help="With --backends: store the fastest backend (largest scale) for the engine")
+    parser.add_argument("--startup", action="store_true", help="Also measure per-stage start-up overhead")
+    parser.add_argument("--imports", action="store_true", help="Also measure cold import time of entry points")
+    parser.add_argument("--batch-reports", action="store_true",
+                        help="Also time the per-zone x month PDF batch (docs/sec)")
+    parser.add_argument("--projection", action="store_true",
+                        help="Also report raw vs analysis projection size and engine scan speed")
+    parser.add_argument("--rollup", action="store_true",
+                        help="Also time query service metrics from the hourly rollup vs a trip scan")
+    parser.add_argument("--handoff", action="store_true",
+                        help="Also time engine result handoff to pandas: CSV vs memory-mapped Arrow IPC")
+    parser.add_argument("--revalidation", action="store_true",
+                        help="Also time download / conditional revalidation against a local HTTP stand-in")
+    parser.add_argument("--downsampling", action="store_true",
+                        help="Also measure chart payload/render time for 10^6 points, raw vs downsampled")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare_results(*args.compare)
+        return 0
+
+    result = run_benchmarks(args.scales, seed=args.seed, regenerate=args.regenerate,
+                            verbose=args.verbose, backends=args.backends, batch_reports=args.batch_reports,
+                            revalidation=args.revalidation, projection=args.projection, rollup=args.rollup,
+                            handoff=args.handoff)
+    if args.startup:
+        import pipeline_runner
+        print("\n[STARTUP] Measuring stage start-up overhead...")
+        result['startup'] = pipeline_runner.measure_startup_overhead()
+        for stage, t in result['startup'].items():
+            print(f"     {stage:<10} subprocess {t['subprocess_s']:>7.3f}s   in-process {t['in_process_s']:>7.3f}s")
+    if args.imports:
+        import import_timing
+        print("\n[IMPORTS] Measuring cold import time (-X importtime)...")
+        result['imports'] = import_timing.run()
+        import_timing.print_results(result['imports'])
+    if args.downsampling:
+        import downsampling
+        print("\n[DOWNSAMPLING] Measuring chart payloads (figure build + JSON)...")
+        result['downsampling'] = downsampling.benchmark(seed=args.seed)
+        downsampling.print_benchmark(result['downsampling'])
+    path = save_results(result, args.out)
+    print(f"\nBenchmark results saved to {path}")
+
+    if args.backends and args.pick_backend:
+        largest = max(result['scales'], key=lambda s: s['scale'])
+        choice = save_backend_choice(largest['backends'], largest['scale'])
+        print(f"Fastest backend '{largest['backends']['fastest']}' saved to {choice}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
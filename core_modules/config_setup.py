@@ -20,23 +20,57 @@ PROJECT_STRUCTURE = """
 │   ├── 📄 content_generator.py    # Content asset generator
 │   ├── 📄 analytics_dashboard.py  # Interactive Dashboard
 │   ├── 📄 config_setup.py         # This file
-│   └── 📄 system_check.py         # Integrity verification script
+│   ├── 📄 system_check.py         # Integrity verification script
+│   ├── 📄 pipeline_runner.py      # Dependency-aware in-process stage runner
+│   ├── 📄 fingerprints.py         # File change detection (stat / content)
+│   ├── 📄 toolkit_cli.py          # Sub-command CLI (lazy imports)
+│   ├── 📄 lazy_imports.py         # Deferred loading of heavy libraries
+│   ├── 📄 import_timing.py        # Cold-start import benchmark
+│   ├── 📄 refresh_daemon.py       # Watch mode: incremental refresh on new data
+│   ├── 📄 query_service.py        # Local HTTP/JSON + Arrow metric service
+│   ├── 📄 dashboard_data.py       # Per-tab, column-projected dashboard loading
+│   ├── 📄 dashboard_artifacts.py  # Precomputed heatmaps, factor fit, figure specs
+│   ├── 📄 zone_geometry.py        # Zone shapes: simplified, binary-cached polygons
+│   ├── 📄 downsampling.py         # LTTB / hexbin chart reduction to pixel width
+│   ├── 📄 execution_backends.py   # DuckDB / Polars analytics backends
+│   ├── 📄 trip_rollup.py          # Hourly per-zone rollup behind the query service
+│   ├── 📄 arrow_io.py             # Arrow IPC result files, memory-mapped reads
+│   ├── 📄 resource_monitor.py     # Per-phase memory instrumentation
+│   ├── 📄 synthetic_data.py       # Synthetic TLC data generator
+│   └── 📄 benchmark_suite.py      # End-to-end benchmark harness
+│
+├── 📁 benchmarks/                 # Benchmark workspaces & results
+│   ├── results/                   # bench_<timestamp>_<run_id>.json
+│   └── perf_baseline.json         # Reference run for check --perf (per host, not versioned)
 │
 ├── 📁 data_downloads/             # Raw transaction data (Parquet)
+│   ├── .download_manifest.json    # ETag / Last-Modified / length per month
+│   └── analysis/                  # Analysis-ready projection: <year>/<taxi>/ (narrow types, derived columns, zstd)
 │
 ├── 📁 output/                     # Analysis artifacts
 │   ├── market_stats.json          # Key metrics
-│   ├── anomaly_audit.csv          # Flagged irregular transactions
-│   ├── leakage_report.csv         # Revenue leakage analysis
+│   ├── run_metrics.json           # Per-phase time & memory metrics
+│   ├── .pipeline_state.json       # Input fingerprints of the last good run
+│   ├── daemon_status.json         # Watch-mode state, queue depth, latency
+│   ├── anomaly_audit.parquet      # Flagged irregular transactions (zstd, by pickup time)
+│   ├── leakage_report.arrow       # Revenue leakage analysis (Arrow IPC, read memory-mapped)
+│   ├── momentum_<year>.arrow      # Other result tables: volatility, daily transactions, engagement
+│   ├── *.csv                      # CSV copies of the result tables, only with ENGINE_CSV=1 / engine --csv
 │   ├── market_summary.pdf         # Executive PDF report
+│   ├── reports/                   # Batch reports: <year>-<month>/zone_<id>.pdf
 │   ├── white_paper.md             # Technical retrospective
 │   ├── summary_post.md            # Professional brief
 │   ├── micro_thread.md            # Social media assets
 │   ├── presentation_slides.json   # JSON data for slide decks
+│   ├── content_briefs.json        # Per-year / taxi / zone briefs (templated)
+│   ├── dashboard/                 # Ready-to-render dashboard artifacts
+│   ├── rollup/                    # Hourly trip rollup: <year>/<taxi>/ (taxi, hour, pickup zone, core drop-off)
 │   └── CONTENT_README.md          # Content guide
 │
 └── 📁 cache/                      # Temporary storage
-    └── external_factors_2025.csv  # Cached external data
+    ├── external_factors_2025.csv  # Cached external data
+    ├── verify_cache.json          # check --verify results by (path, size, mtime)
+    └── zone_geometry.npz          # Zone polygons at each simplification level
 """
 
 # ============================================================================
@@ -55,18 +89,65 @@ STEP 2: Run the Full Toolkit
 ----------------------------
 python run_analysis.py
 
-# This orchestrator will:
+# This orchestrator runs stages 1-4 in one process (one DuckDB connection,
+# engine results handed over as Arrow tables) and will:
 # 1. Acquire necessary transaction data
 # 2. Run the processing engine (ETL + Analytics)
 # 3. Generate the PDF executive summary
 # 4. Create content assets (White paper, posts)
 # 5. Launch the interactive dashboard
+#
+# Report, content and dashboard artifacts are built in parallel once the
+# engine finishes, and stages whose inputs are unchanged since the last run
+# are skipped.
+# python run_analysis.py --force     # Rebuild every stage
+
+Individual stages (only the libraries a stage needs are imported):
+python run_analysis.py ingest | engine [--backend polars] [--csv] | report | content | artifacts
+python run_analysis.py ingest --revalidate       # Conditional GETs; refetch + re-unify republished months only
+python run_analysis.py engine --revalidate       # Same for the engine's lookup / Dec sources; re-imputes Dec 2025 if they changed
+python run_analysis.py zones                     # Zone shapes for the dashboard maps
+python run_analysis.py report --batch --year 2025 --workers 8   # PDF per zone x month
+# report / content keep artifacts whose inputs are byte-identical (.<name>.fingerprint); --force rebuilds
+python run_analysis.py check | dashboard [--port 8502]   # Dashboard sidebar: live date/taxi/zone filters
+python run_analysis.py imports --budget-ms 300   # Cold-start import guard
+
+Watch mode (refreshes output/ when new months land or are published):
+python run_analysis.py watch --debounce 30 --source-interval 3600
+python run_analysis.py watch --status            # Queue depth, last refresh latency
+# Each source check also revalidates downloaded months (--no-revalidate: missing months only)
+
+Query service (engine outputs + trip store kept open, LRU result cache):
+python run_analysis.py serve --port 8765 --cache-size 256 --cache-mb 512
+curl 'localhost:8765/metrics/revenue?start=2025-01-05&end=2025-03-31&group=month'
+curl 'localhost:8765/metrics/momentum?year=2025&format=arrow' > momentum.arrows
+# Metrics are aggregated from output/rollup/ (kept current by the engine) when it
+# covers the range and zones; python core_modules/trip_rollup.py --check times both paths
 
 STEP 3: Verify Integrity
 ------------------------
-python core_modules/system_check.py
-
-# Checks all modules and output artifacts.
+python run_analysis.py check
+python run_analysis.py check --verify [--checksums]   # Validate Parquet footers / CSV rows (cached)
+
+python run_analysis.py check --perf [--perf-run] [--time-tolerance 0.5 --memory-tolerance 0.25]
+python run_analysis.py check --perf --update-baseline   # Accept the latest run as the reference
+
+# Checks all modules and output artifacts. --perf compares per-phase wall
+# time, peak RSS and rows of the latest benchmark run (run on demand if there
+# is none) with benchmarks/perf_baseline.json and fails on a regression.
+
+OPTIONAL: Benchmark on Synthetic Data
+-------------------------------------
+python core_modules/benchmark_suite.py --scales 0.05 0.2 1.0
+python core_modules/benchmark_suite.py --compare OLD.json NEW.json
+python core_modules/benchmark_suite.py --scales 0.05 --downsampling   # chart payloads, 10^6 points
+python core_modules/benchmark_suite.py --scales 0.05 --revalidation   # local HTTP stand-in for the TLC source
+python core_modules/benchmark_suite.py --scales 0.25 --projection     # raw vs analysis projection size & scan time
+python core_modules/benchmark_suite.py --scales 0.25 --rollup         # metrics from the hourly rollup vs a trip scan
+python core_modules/benchmark_suite.py --scales 0.25 --handoff        # result handoff: CSV vs memory-mapped Arrow
+
+# Generates deterministic TLC-shaped Parquet (no download needed) and times
+# ingestion, each engine phase, the PDF report and dashboard data loading.
 """
 
 # ============================================================================
@@ -81,15 +162,34 @@ Data Sources
 ------------
 Data acquisition is handled by 'core_modules/data_ingestion.py'.
 Target: Public NYC TLC Data (Yellow/Green Taxi).
+- TLC_BASE_URL=http://localhost:8000       # Mirror or local stand-in (python -m http.server)
 
-Analysis Parameters (in processing_engine.py)
----------------------------------------------
+Analysis Parameters (in execution_backends.py)
+----------------------------------------------
 - Target Region: Core Economic Zone (Manhattan south of 60th)
 - Comparison Period: Q1 2024 vs Q1 2025
 - Anomaly Thresholds:
   * Momentum Index > 65.0
   * Time Delta < 1.0 min
   * Value Mismatch > $20.00
+- Trip duration, momentum, anomaly rule and zone flags are stored in the
+  analysis projection; changing the zones or thresholds rebuilds it on the
+  next ingest / engine run.
+
+Execution Backend
+-----------------
+- ENGINE_BACKEND=duckdb|polars            # Engine analytics implementation
+- ENGINE_CSV=1                            # Also write CSV copies of the result tables
+- Otherwise cache/backend_choice.json (benchmark_suite.py --backends --pick-backend)
+- Parity check: python core_modules/execution_backends.py --parity
+
+Resource Budgets (optional)
+---------------------------
+Per-phase peak memory and DuckDB buffer usage are written to
+output/run_metrics.json by data_ingestion.py and processing_engine.py.
+- MEMORY_BUDGET_MB=4096                   # Fail any phase peaking above this RSS
+- MEMORY_BUDGETS="anomaly_audit=2048"     # Per-phase overrides
+- MEMORY_TRACE_PYTHON=1                   # Also record Python heap peaks (tracemalloc, slower)
 
 Dashboard Settings
 ------------------
@@ -2,67 +2,156 @@
 Market Insights Generator
 =========================
 Generates professional content assets from market analysis findings.
+
+- Every number in the assets comes from the engine outputs: market_stats.json,
+  correlation_summary.txt and the output tables are loaded once into a
+  context (build_context).
+- Templates are str.format-style text, parsed once at import into
+  CompiledTemplate objects; rendering only formats and joins.
+- Briefs are rendered in batch for every variant the outputs support
+  (per year, per taxi type, per zone) into content_briefs.json.
+
+Each asset keeps a .<name>.fingerprint sidecar (engine outputs + template
+version); assets whose inputs are byte-identical are not rewritten.
+
+Usage:
+    python core_modules/content_generator.py [--force]
 """
 
 import json
-from datetime import datetime
 import os
+import sys
+import time
+import string
+import argparse
+
+import arrow_io
+import fingerprints
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+
+# Engine outputs the assets are generated from (relative to OUTPUT_DIR): the
+# small summaries are compared by content, the result tables by stat
+CONTENT_SUMMARIES = [
+    "market_stats.json",
+    "correlation_summary.txt",
+]
+CONTENT_TABLES = [
+    "momentum_2024.*",
+    "momentum_2025.*",
+    "engagement_metrics.*",
+    "daily_transactions_2025.*",
+    "regional_volatility.*",
+    "leakage_report.*",
+    "anomaly_audit.*",
+]
+# Bump when a template below changes so existing assets are rebuilt
+TEMPLATE_VERSION = 2
+
+BRIEFS_FILE = "content_briefs.json"
+DAYS = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+ANOMALY_TYPES = {
+    'Impossible Physics': 'physics',
+    'Value Mismatch': 'mismatch',
+    'Stationary Transaction': 'stationary',
+}
+
+# ============================================================================
+# TEMPLATES
+# ============================================================================
+
+class CompiledTemplate:
+    """
+    A str.format-style template parsed once. Fields are plain context keys
+    with an optional format spec ({revenue:,.2f}); render() formats and joins.
+    """
+
+    def __init__(self, text, name="template"):
+        self.name = name
+        self.fields = set()
+        self._parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field is not None:
+                if not field.isidentifier() or (spec and "{" in spec):
+                    raise ValueError(f"{name}: unsupported field '{{{field}}}'")
+                self.fields.add(field)
+            self._parts.append((literal, field, spec or "", conversion))
+
+    def render(self, context):
+        out = []
+        for literal, field, spec, conversion in self._parts:
+            out.append(literal)
+            if field is None:
+                continue
+            try:
+                value = context[field]
+            except KeyError:
+                raise KeyError(f"{self.name}: no value for '{field}'") from None
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "s":
+                value = str(value)
+            out.append(format(value, spec))
+        return "".join(out)
+
 
 # ============================================================================
 # WHITE PAPER / ARTICLE
 # ============================================================================
 
 MEDIUM_ARTICLE = """
-# Market Trend Analysis: 2025 Retrospective
+# Market Trend Analysis: {year} Retrospective
 
-**Executive Summary**: Our latest analysis of 2025 market data reveals a 28% increase in 
-transaction momentum (9.2 → 11.8 Index), substantial revenue generation ($237M), 
-but a 2.6% decline in user engagement metrics.
+**Executive Summary**: Our latest analysis of {year} market data shows transaction momentum
+{momentum_verb} {momentum_change_abs:.1f}% ({momentum_before:.1f} → {momentum_after:.1f} Index), {revenue_short} in
+surcharge revenue, and a {engagement_change_abs:.1f}-point {engagement_direction} in user engagement metrics.
 
 ## The Context
 
-In Jan 2025, new market regulations were implemented to optimize flow in the Core Economic Zone. 
-The goal was to enhance efficiency and liquidity. We analyzed 147.3 million transaction records 
+In Jan {year}, new market regulations were implemented to optimize flow in the Core Economic Zone.
+The goal was to enhance efficiency and liquidity. We analyzed {records_short} transaction records
 to evaluate the impact.
 
-## Finding #1: Efficiency Gains (Momentum +28%)
+## Finding #1: Efficiency (Momentum {momentum_change:+.1f}%)
 
-Market velocity improved significantly. Pre-implementation (Q1 2024), the momentum index 
-stood at **9.2**. Post-implementation (Q1 2025), it rose to **11.8**.
+Pre-implementation (Q1 {prev_year}), the momentum index stood at **{momentum_before:.1f}**.
+Post-implementation (Q1 {year}), it {momentum_moved} **{momentum_after:.1f}**, a **{momentum_change:+.1f}% change**.
 
-This **28.3% improvement** indicates that the new fee structure successfully optimized 
-resource allocation and reduced friction in the core zone.
+Q1 drop-off volume in the core zone went from {q1_before:,} to {q1_after:,} ({q1_change:+.2f}%).
 
-## Finding #2: Engagement Headwinds (Tips -2.6%)
+## Finding #2: Engagement (Secondary Value {engagement_change:+.1f} pts)
 
-While efficiency improved, user engagement metrics faced pressure. Secondary value exchanges 
-(tips) declined from **17.8% to 15.2%**.
+Secondary value exchanges (tips and extras as a share of fare) moved from
+**{engagement_before:.1f}% to {engagement_after:.1f}%** between the first and last month of {year}.
 
-This suggests a "crowding out" effect where the primary fee cannabilizes secondary 
-discretionary spending. Small-scale operators (Green tier) saw the largest impact.
+## Finding #3: Data Anomalies ({anomaly_count:,} Records)
 
-## Finding #3: Data Anomalies (1,247 Records)
+Our integrity audit flagged {anomaly_count:,} anomalous transactions ({anomaly_share:.2f}% of dataset):
 
-Our integrity audit flagged 1,247 anomalous transactions (0.85% of dataset):
+- **Physics Violations**: {physics:,} records with impossible velocity indices.
+- **Value Mismatches**: {mismatch:,} records with inconsistent time/value ratios.
+- **Stationary Value**: {stationary:,} records generating value with zero displacement.
 
-- **Physics Violations**: 512 records with impossible velocity indices (>65).
-- **Teleportation Events**: 423 records with inconsistent time/value ratios.
-- **Stationary Value**: 312 records generating value with zero displacement.
+The flagged transactions carry **{leakage_short}** in billed amounts. Source {top_vendor} accounts
+for {top_vendor_count:,} of them.
 
-Potential revenue leakage from these anomalies is estimated at **$3-4M**.
+## Finding #4: External Factors
+
+Correlation between daily volume and the external factor (weather) is {correlation:.3f}:
+demand is **{demand}**.
 
 ## Strategic Recommendations
 
-1. **Dynamic Rate Adjustment**: Leverage the low correlation with external factors (weather) 
-   to implement dynamic pricing models.
-2. **Operator Support**: Mitigate engagement decline with targeted retention programs.
+1. **Dynamic Rate Adjustment**: Use the measured sensitivity to external factors ({demand} demand)
+   when calibrating dynamic pricing models.
+2. **Operator Support**: Track the engagement trend with targeted retention programs.
 3. **Enhanced Auditing**: Implement real-time validation to catch the identified anomalies.
 
 ## Conclusion
 
-The 2025 structural changes achieved their primary efficiency goals but introduced 
-secondary friction points. Optimizing the balance between momentum and engagement 
-will be key for Q2 2026.
+The {year} structural changes moved momentum by {momentum_change:+.1f}% and engagement by
+{engagement_change:+.1f} points. Balancing the two will be key for the year ahead.
 """
 
 # ============================================================================
@@ -70,20 +159,19 @@ will be key for Q2 2026.
 # ============================================================================
 
 LINKEDIN_POST = """
-📊 2025 Market Trend Update: Efficiency Up, Engagement Down
+📊 {year} Market Trend Update: Momentum {momentum_change:+.1f}%, Engagement {engagement_change:+.1f} pts
 
-Our team analyzed 147.3M transactions following the Jan 2025 regulatory changes.
+Our team analyzed {records_short} transactions following the Jan {year} regulatory changes.
 
 **Key Findings:**
-✅ **Momentum**: +28% efficiency gain in the Core Zone.
-✅ **Revenue**: $237M generated.
-⚠️ **Engagement**: -2.6% decline in secondary value metrics.
-🔴 **Integrity**: 1,247 anomalous records flagged.
+✅ **Momentum**: {momentum_change:+.1f}% in the Core Zone ({momentum_before:.1f} → {momentum_after:.1f}).
+✅ **Revenue**: {revenue_short} in surcharges.
+⚠️ **Engagement**: {engagement_change:+.1f} pts in secondary value metrics.
+🔴 **Integrity**: {anomaly_count:,} anomalous records flagged.
 
 **The Takeaway:**
-The structural changes succeeded in optimizing flow, but disjointed impacts on 
-operators require attention. We recommend a shift to dynamic pricing models to 
-balance the ecosystem.
+Demand proved {demand} to external conditions (r = {correlation:.2f}). We recommend
+dynamic pricing models calibrated on these results to balance the ecosystem.
 
 Full report available in the archives.
 
@@ -95,19 +183,19 @@ Full report available in the archives.
 # ============================================================================
 
 TWITTER_THREAD = """
-1/ We analyzed 147.3M market transactions from 2025. Here's what the data says about the new efficiency measures. 🧵
+1/ We analyzed {records_short} market transactions from {year}. Here's what the data says about the new efficiency measures. 🧵
 
-2/ **Momentum is up.** The Core Zone momentum index jumped 28% (9.2 -> 11.8). The new fee structure is doing its job—reducing friction and increasing velocity. 🚀
+2/ **Momentum is {momentum_trend}.** The Core Zone momentum index moved {momentum_change:+.1f}% ({momentum_before:.1f} -> {momentum_after:.1f}). 🚀
 
-3/ **Revenue is strong.** $237M in value generated. This provides a solid foundation for future infrastructure investment.
+3/ **Revenue.** {revenue_short} in surcharges collected in {year}.
 
-4/ **Engagement remains a challenge.** Secondary metrics (tips) fell by 2.6%. The new fees appear to be crowding out discretionary spending. This impacts the operator ecosystem. 📉
+4/ **Engagement.** Secondary metrics (tips) moved {engagement_change:+.1f} pts ({engagement_before:.1f}% -> {engagement_after:.1f}%). 📉
 
-5/ **Anomalies detected.** We flagged 1,247 records with impossible physics or value mismatches. Estimated leakage: $3-4M. Time to tighten the validation rules. 🔒
+5/ **Anomalies detected.** We flagged {anomaly_count:,} records with impossible physics or value mismatches, carrying {leakage_short}. 🔒
 
-6/ **External factors matter less than you think.** Correlation with external volatility (weather) was insignificant. Demand is inelastic.
+6/ **External factors.** Correlation with external volatility (weather) was {correlation:.2f}. Demand is {demand}.
 
-7/ **Verdict:** The system works, but needs tuning. We recommend dynamic pricing and enhanced operator support to sustainable growth.
+7/ **Verdict:** Q1 core-zone volume changed {q1_change:+.1f}%. We recommend dynamic pricing and enhanced operator support for sustainable growth.
 
 End/
 """
@@ -119,26 +207,26 @@ End/
 LINKEDIN_CAROUSEL = [
     {
         "slide": 1,
-        "title": "2025 Market Analysis",
-        "content": "147.3M Records Analyzed\n\n✅ Efficiency: +28%\n💰 Value: $237M\n⚠️ Engagement: -2.6%\n🔴 Anomalies: 1,247\n\nVerdict: System is effective but needs optimization.",
+        "title": "{year} Market Analysis",
+        "content": "{records_short} Records Analyzed\n\n✅ Momentum: {momentum_change:+.1f}%\n💰 Value: {revenue_short}\n⚠️ Engagement: {engagement_change:+.1f} pts\n🔴 Anomalies: {anomaly_count:,}\n\nVerdict: Measure, then optimize.",
         "hashtags": "#Analytics #Growth"
     },
     {
         "slide": 2,
-        "title": "Efficiency Gains",
-        "content": "Q1 2024: 9.2 Index\nQ1 2025: 11.8 Index\n\n+28.3% Improvement\n\nThe regulatory changes successfully reduced friction in the Core Zone.",
+        "title": "Momentum",
+        "content": "Q1 {prev_year}: {momentum_before:.1f} Index\nQ1 {year}: {momentum_after:.1f} Index\n\n{momentum_change:+.1f}% Change\n\nCore Zone velocity after the regulatory changes.",
         "hashtags": "#Efficiency #Data"
     },
     {
         "slide": 3,
         "title": "Engagement Impact",
-        "content": "Secondary value metrics (Tips) declined.\n\n2024: 17.8%\n2025: 15.2%\n\nOperator revenue is under pressure despite higher system velocity.",
+        "content": "Secondary value metrics (Tips).\n\nStart of {year}: {engagement_before:.1f}%\nEnd of {year}: {engagement_after:.1f}%\n\nOperator revenue tracks these secondary payments.",
         "hashtags": "#Economics #Strategy"
     },
     {
         "slide": 4,
         "title": "Data Integrity",
-        "content": "1,247 Anomalies Detected:\n- 512 Impossible Velocity\n- 423 Time/Value Mismatch\n- 312 Stationary Value\n\nLeakage Estimate: $3-4M",
+        "content": "{anomaly_count:,} Anomalies Detected:\n- {physics:,} Impossible Velocity\n- {mismatch:,} Time/Value Mismatch\n- {stationary:,} Stationary Value\n\nFlagged Value: {leakage_short}",
         "hashtags": "#Security #Audit"
     },
     {
@@ -150,35 +238,264 @@ LINKEDIN_CAROUSEL = [
 ]
 
 # ============================================================================
-# FILE GENERATION
+# VARIANT BRIEFS
 # ============================================================================
 
-def generate_blog_files():
-    """Generate content asset files."""
-    
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    output_dir = os.path.join(base_dir, "output")
-    
-    output_files = {
-        os.path.join(output_dir, 'white_paper.md'): MEDIUM_ARTICLE,
-        os.path.join(output_dir, 'summary_post.md'): LINKEDIN_POST,
-        os.path.join(output_dir, 'micro_thread.md'): TWITTER_THREAD,
+YEAR_BRIEF = """
+## Q1 {year} Momentum Brief
+
+- Average momentum index: {momentum:.1f} ({momentum_vs})
+- Fastest slot: {peak_day} {peak_hour:02d}:00 ({peak:.1f})
+- Slowest slot: {low_day} {low_hour:02d}:00 ({low:.1f})
+- Q1 core-zone drop-offs: {q1_volume:,}
+"""
+
+TAXI_BRIEF = """
+## {taxi_label} Taxi Integrity Brief
+
+- Anomalies flagged: {anomaly_count:,} ({anomaly_share:.1f}% of all flags)
+- Impossible physics: {physics:,} | Value mismatch: {mismatch:,} | Stationary: {stationary:,}
+- Flagged value: {leakage_short}
+- Most flagged source: {top_vendor} ({top_vendor_count:,} records)
+"""
+
+ZONE_BRIEF = """
+## Zone {location_id} Brief
+
+- Q1 drop-offs: {count_before:,} ({prev_year}) → {count_after:,} ({year}), {pct_change:+.1f}%
+- Anomalies picked up here: {anomaly_count:,} (flagged value {leakage_short})
+- Surcharge leakage: {leakage_note}
+"""
+
+ASSET_TEMPLATES = {
+    'white_paper.md': CompiledTemplate(MEDIUM_ARTICLE, 'white_paper.md'),
+    'summary_post.md': CompiledTemplate(LINKEDIN_POST, 'summary_post.md'),
+    'micro_thread.md': CompiledTemplate(TWITTER_THREAD, 'micro_thread.md'),
+}
+CAROUSEL_TEMPLATES = [
+    {key: CompiledTemplate(value, f"slide {slide['slide']}.{key}") if isinstance(value, str) else value
+     for key, value in slide.items()}
+    for slide in LINKEDIN_CAROUSEL
+]
+BRIEF_TEMPLATES = {
+    'year': CompiledTemplate(YEAR_BRIEF, 'year brief'),
+    'taxi': CompiledTemplate(TAXI_BRIEF, 'taxi brief'),
+    'zone': CompiledTemplate(ZONE_BRIEF, 'zone brief'),
+}
+
+# ============================================================================
+# CONTEXT (engine outputs, loaded once)
+# ============================================================================
+
+def _short(value, prefix=""):
+    """147300000 -> '147.3M', 237000000 -> '$237.0M' with prefix='$'."""
+    for threshold, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= threshold:
+            return f"{prefix}{value / threshold:.1f}{suffix}"
+    return f"{prefix}{value:,.0f}"
+
+
+def _read_output(stem, columns=None, tables=None):
+    """
+    An engine output table, or None if missing: from `tables` (the engine's
+    in-memory results) when given, else Arrow IPC, Parquet, then CSV.
+    """
+    import pandas as pd
+    if tables and stem in tables:
+        return arrow_io.to_pandas(arrow_io.select(tables[stem], columns))
+    ipc = arrow_io.ipc_path(OUTPUT_DIR, stem)
+    if os.path.exists(ipc):
+        return arrow_io.read_pandas(ipc, columns)
+    parquet = os.path.join(OUTPUT_DIR, f"{stem}.parquet")
+    if os.path.exists(parquet):
+        return pd.read_parquet(parquet, columns=columns)
+    path = os.path.join(OUTPUT_DIR, f"{stem}.csv")
+    if os.path.exists(path):
+        return pd.read_csv(path, usecols=columns)
+    return None
+
+
+def load_outputs(tables=None):
+    """Reads every engine output the templates use (see _read_output for `tables`)."""
+    stats = {}
+    stats_file = os.path.join(OUTPUT_DIR, "market_stats.json")
+    if os.path.exists(stats_file):
+        with open(stats_file, encoding='utf-8') as f:
+            stats = json.load(f)
+    correlation = 0.0
+    corr_file = os.path.join(OUTPUT_DIR, "correlation_summary.txt")
+    if os.path.exists(corr_file):
+        with open(corr_file, encoding='utf-8') as f:
+            for line in f:
+                if line.startswith("Correlation:"):
+                    correlation = float(line.split(":", 1)[1])
+    return {
+        'stats': stats,
+        'correlation': correlation,
+        'momentum_2024': _read_output("momentum_2024", ['dow', 'hour', 'avg_momentum'], tables),
+        'momentum_2025': _read_output("momentum_2025", ['dow', 'hour', 'avg_momentum'], tables),
+        'engagement': _read_output("engagement_metrics", ['month', 'avg_engagement_score'], tables),
+        'transactions': _read_output("daily_transactions_2025", ['transactions'], tables),
+        'volatility': _read_output("regional_volatility", ['location_id', 'count_2024', 'count_2025', 'pct_change'], tables),
+        'leakage': _read_output("leakage_report", ['pickup_loc', 'leakage_rate'], tables),
+        'anomalies': _read_output("anomaly_audit", ['VendorID', 'type', 'pickup_loc', 'total_amount', 'anomaly_flag'], tables),
     }
-    
-    for filepath, content in output_files.items():
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"✅ Generated: {filepath}")
-    
-    # Generate carousel slides as JSON
-    carousel_path = os.path.join(output_dir, 'presentation_slides.json')
-    with open(carousel_path, 'w', encoding='utf-8') as f:
-        json.dump(LINKEDIN_CAROUSEL, f, indent=2)
-    print(f"✅ Generated: {carousel_path}")
-    
-    # Create README for blog content
-    readme = """
+
+
+def _mean(df, column):
+    return float(df[column].mean()) if df is not None and len(df) else 0.0
+
+
+def _pct(after, before):
+    return (after - before) * 100.0 / before if before else 0.0
+
+
+def _anomaly_summary(audit, total=None):
+    """Counts per flag type, flagged value and top source for a slice of the audit."""
+    counts = audit['anomaly_flag'].value_counts()
+    vendors = audit['VendorID'].value_counts()
+    flagged = float(audit['total_amount'].sum())
+    summary = {name: int(counts.get(flag, 0)) for flag, name in ANOMALY_TYPES.items()}
+    summary.update({
+        'anomaly_count': int(len(audit)),
+        'leakage': flagged,
+        'leakage_short': _short(flagged, "$"),
+        'top_vendor': int(vendors.index[0]) if len(vendors) else "n/a",
+        'top_vendor_count': int(vendors.iloc[0]) if len(vendors) else 0,
+    })
+    if total is not None:
+        summary['anomaly_share'] = len(audit) * 100.0 / total if total else 0.0
+    return summary
+
+
+def build_context(outputs, year=2025):
+    """Flat context for the main assets."""
+    import pandas as pd
+    stats = outputs['stats']
+    records = int(outputs['transactions']['transactions'].sum()) if outputs['transactions'] is not None else 0
+    m_before = _mean(outputs['momentum_2024'], 'avg_momentum')
+    m_after = _mean(outputs['momentum_2025'], 'avg_momentum')
+    m_change = _pct(m_after, m_before)
+    engagement = outputs['engagement']
+    if engagement is not None and len(engagement):
+        engagement = engagement.sort_values('month')
+        e_before = float(engagement['avg_engagement_score'].iloc[0])
+        e_after = float(engagement['avg_engagement_score'].iloc[-1])
+    else:
+        e_before = e_after = 0.0
+    audit = outputs['anomalies']
+    if audit is None:
+        audit = pd.DataFrame(columns=['VendorID', 'type', 'pickup_loc', 'total_amount', 'anomaly_flag'])
+    anomaly_count = int(stats.get('anomaly_count', len(audit)))
+    revenue = float(stats.get('revenue_2025', 0.0))
+    correlation = outputs['correlation']
+
+    context = {
+        'year': year,
+        'prev_year': year - 1,
+        'records': records,
+        'records_short': _short(records),
+        'revenue': revenue,
+        'revenue_short': _short(revenue, "$"),
+        'momentum_before': m_before,
+        'momentum_after': m_after,
+        'momentum_change': m_change,
+        'momentum_change_abs': abs(m_change),
+        'momentum_trend': "up" if m_change >= 0 else "down",
+        'momentum_verb': "rose" if m_change >= 0 else "fell",
+        'momentum_moved': "rose to" if m_change >= 0 else "fell to",
+        'engagement_before': e_before,
+        'engagement_after': e_after,
+        'engagement_change': e_after - e_before,
+        'engagement_change_abs': abs(e_after - e_before),
+        'engagement_direction': "increase" if e_after >= e_before else "decline",
+        'q1_before': int(stats.get('q1_2024_vol', 0)),
+        'q1_after': int(stats.get('q1_2025_vol', 0)),
+        'q1_change': float(stats.get('q1_pct_change', 0.0)),
+        'correlation': correlation,
+        'demand': "inelastic" if abs(correlation) < 0.3 else "elastic",
+    }
+    context.update(_anomaly_summary(audit))
+    context['anomaly_count'] = anomaly_count
+    context['anomaly_share'] = anomaly_count * 100.0 / records if records else 0.0
+    return context
+
+
+def variant_contexts(outputs, year=2025):
+    """(variant id, brief kind, context) for every year, taxi type and zone in the outputs."""
+    import pandas as pd
+    variants = []
+    stats = outputs['stats']
+
+    # Per year: momentum profile
+    previous = None
+    for y in (year - 1, year):
+        df = outputs.get(f'momentum_{y}')
+        if df is None or df.empty:
+            continue
+        peak, low = df.loc[df['avg_momentum'].idxmax()], df.loc[df['avg_momentum'].idxmin()]
+        momentum = float(df['avg_momentum'].mean())
+        variants.append((f"year_{y}", 'year', {
+            'year': y,
+            'momentum': momentum,
+            'momentum_vs': f"{_pct(momentum, previous):+.1f}% vs {y - 1}" if previous else "baseline year",
+            'peak_day': DAYS[int(peak['dow']) % 7], 'peak_hour': int(peak['hour']), 'peak': float(peak['avg_momentum']),
+            'low_day': DAYS[int(low['dow']) % 7], 'low_hour': int(low['hour']), 'low': float(low['avg_momentum']),
+            'q1_volume': int(stats.get(f'q1_{y}_vol', 0)),
+        }))
+        previous = momentum
+
+    # Per taxi type: integrity
+    audit = outputs['anomalies']
+    if audit is not None and len(audit):
+        for taxi, group in audit.groupby('type', sort=True):
+            context = _anomaly_summary(group, total=len(audit))
+            context['taxi_label'] = str(taxi).title()
+            variants.append((f"taxi_{taxi}", 'taxi', context))
+
+    # Per zone: volume change, anomalies and leakage, joined once
+    volatility = outputs['volatility']
+    if volatility is not None and len(volatility):
+        zones = volatility.rename(columns={'count_2024': 'count_before', 'count_2025': 'count_after'})
+        if audit is not None and len(audit):
+            per_zone = audit.groupby('pickup_loc').agg(anomaly_count=('total_amount', 'size'),
+                                                       leakage=('total_amount', 'sum'))
+            zones = zones.merge(per_zone, left_on='location_id', right_index=True, how='left')
+        else:
+            zones = zones.assign(anomaly_count=0, leakage=0.0)
+        leakage = outputs['leakage']
+        if leakage is not None and len(leakage):
+            zones = zones.merge(leakage.rename(columns={'pickup_loc': 'location_id'}), on='location_id', how='left')
+        else:
+            zones = zones.assign(leakage_rate=float('nan'))
+        zones = zones.fillna({'anomaly_count': 0, 'leakage': 0.0, 'pct_change': 0.0})
+        for row in zones.to_dict('records'):
+            rate = row['leakage_rate']
+            variants.append((f"zone_{int(row['location_id'])}", 'zone', {
+                'location_id': int(row['location_id']),
+                'year': year, 'prev_year': year - 1,
+                'count_before': int(row['count_before']),
+                'count_after': int(row['count_after']),
+                'pct_change': float(row['pct_change']),
+                'anomaly_count': int(row['anomaly_count']),
+                'leakage_short': _short(float(row['leakage']), "$"),
+                'leakage_note': (f"{rate:.1%} of inbound trips unpaid" if pd.notna(rate)
+                                 else "not among the highest-leakage zones"),
+            }))
+    return variants
+
+
+def render_briefs(variants):
+    """Renders every variant with its compiled brief template."""
+    return {variant_id: BRIEF_TEMPLATES[kind].render(context).strip() + "\n"
+            for variant_id, kind, context in variants}
+
+
+# ============================================================================
+# FILE GENERATION
+# ============================================================================
+
+CONTENT_README = """
 # Market Analysis - Content Assets
 
 This directory contains public-facing content generated from the analysis.
@@ -189,16 +506,90 @@ This directory contains public-facing content generated from the analysis.
 2. **summary_post.md** - Professional summary
 3. **micro_thread.md** - Social media thread
 4. **presentation_slides.json** - Slide deck data
+5. **content_briefs.json** - Per-year, per-taxi-type and per-zone briefs
+
+Every figure is rendered from the engine outputs of the last run.
 
 ## Usage
 
 Review and publish to relevant internal or external channels.
 """
-    
-    with open(os.path.join(output_dir, 'CONTENT_README.md'), 'w', encoding='utf-8') as f:
-        f.write(readme)
-    print(f"✅ Generated: output/CONTENT_README.md")
+
+
+def input_fingerprint():
+    """
+    Fingerprint of the engine outputs the assets use, plus the template
+    version. The tables can be large, so they are not read for this.
+    """
+    return fingerprints.value_digest([
+        fingerprints.content_digest(CONTENT_SUMMARIES, base_dir=OUTPUT_DIR),
+        fingerprints.stat_fingerprint(CONTENT_TABLES, base_dir=OUTPUT_DIR),
+    ], extra=TEMPLATE_VERSION)
+
+
+def _write_asset(filepath, text, fingerprint, force=False):
+    """
+    Writes one asset unless it was already built from the same inputs.
+    `text` may be a callable so unchanged assets are never rendered.
+    Returns True if written.
+    """
+    if not force and fingerprints.artifact_current(filepath, fingerprint):
+        print(f"⏭️  Unchanged: {filepath}")
+        return False
+    if callable(text):
+        text = text()
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(text)
+    fingerprints.record_artifact(filepath, fingerprint)
+    print(f"✅ Generated: {filepath}")
+    return True
+
+
+def generate_blog_files(force=False, tables=None):
+    """
+    Generate content asset files. Returns the paths actually rewritten.
+    `tables` are the engine's in-memory results when run in the pipeline.
+    """
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    fingerprint = input_fingerprint()
+    names = list(ASSET_TEMPLATES) + ['presentation_slides.json', BRIEFS_FILE, 'CONTENT_README.md']
+    if not force and all(fingerprints.artifact_current(os.path.join(OUTPUT_DIR, n), fingerprint) for n in names):
+        print("⏭️  Content inputs unchanged, keeping all assets.")
+        return []
+
+    # One load of the engine outputs serves every asset and variant
+    start = time.perf_counter()
+    outputs = load_outputs(tables)
+    context = build_context(outputs)
+    variants = variant_contexts(outputs)
+
+    output_files = {
+        os.path.join(OUTPUT_DIR, name): (lambda t=template: t.render(context))
+        for name, template in ASSET_TEMPLATES.items()
+    }
+    # Carousel slides as JSON
+    output_files[os.path.join(OUTPUT_DIR, 'presentation_slides.json')] = lambda: json.dumps([
+        {key: value.render(context) if isinstance(value, CompiledTemplate) else value
+         for key, value in slide.items()}
+        for slide in CAROUSEL_TEMPLATES
+    ], indent=2, ensure_ascii=False)
+    output_files[os.path.join(OUTPUT_DIR, BRIEFS_FILE)] = lambda: json.dumps(
+        render_briefs(variants), indent=1, ensure_ascii=False)
+    output_files[os.path.join(OUTPUT_DIR, 'CONTENT_README.md')] = CONTENT_README
+
+    written = [filepath for filepath, content in output_files.items()
+               if _write_asset(filepath, content, fingerprint, force)]
+    print(f"  -> {len(written)} assets, {len(variants)} brief variants in {time.perf_counter() - start:.2f}s")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate content assets from the engine outputs.")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+    generate_blog_files(force=args.force)
+    return 0
 
 
 if __name__ == "__main__":
-    generate_blog_files()
+    sys.exit(main())
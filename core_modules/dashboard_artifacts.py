@@ -0,0 +1,214 @@
+"""
+Dashboard Artifacts
+===================
+Post-engine stage that turns the engine outputs into ready-to-render
+dashboard artifacts, so tabs do no pandas reshaping on a Streamlit rerun.
+
+Written to output/dashboard/:
+- momentum_heatmaps.json   dow x hour matrices per year (+ overall mean)
+- factors_merged.parquet   daily transactions joined with the external factor
+- factors_trendline.json   OLS fit (slope, intercept, r2) and correlation
+- fig_<name>.json          serialized Plotly figure specs
+
+Large series are reduced to the chart's pixel width before they reach a
+figure (downsampling.py): LTTB for lines, hexbin density for scatters.
+
+The figure builders are shared with the dashboard's live-filter path, so a
+live and a precomputed chart look the same. The trendline is fitted here
+with numpy rather than through Plotly Express (which needs statsmodels).
+
+Usage:
+    python core_modules/dashboard_artifacts.py
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+import dashboard_data
+import downsampling
+from lazy_imports import lazy_import, module_available
+
+go = lazy_import("plotly.graph_objects")
+plotly_utils = lazy_import("plotly.utils")
+PLOTLY_AVAILABLE = module_available("plotly")
+
+DAYS = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+MOMENTUM_YEARS = (2024, 2025)
+MOMENTUM_PERIOD = "Q1"
+
+# Rendered chart widths in the wide layout; they set the downsampling budget
+FULL_WIDTH_PX = 1400
+FACTOR_WIDTH_PX = 930  # 2/3 column
+
+# ============================================================================
+# BUILDERS (shared with the dashboard's live path)
+# ============================================================================
+
+def momentum_matrix(df):
+    """dow x hour matrix of avg_momentum as plain lists (gaps are None)."""
+    pivot = df.pivot_table(index='dow', columns='hour', values='avg_momentum')
+    z = pivot.to_numpy(dtype=float)
+    return {
+        'x': [int(h) for h in pivot.columns],
+        'y': [DAYS[int(d)] if 0 <= d < 7 else str(d) for d in pivot.index],
+        'z': [[None if np.isnan(v) else round(float(v), 6) for v in row] for row in z],
+        'mean': float(df['avg_momentum'].mean()),
+    }
+
+
+def momentum_figure(matrix, title):
+    fig = go.Figure(go.Heatmap(
+        z=matrix['z'], x=matrix['x'], y=matrix['y'],
+        colorscale='Viridis', colorbar=dict(title="Momentum Index"),
+    ))
+    fig.update_layout(title=title, xaxis_title="Hour of Day", yaxis_title="Day of Week")
+    fig.update_yaxes(autorange="reversed")
+    return fig
+
+
+def factor_frame(trans, factors):
+    """Daily transactions joined with the external factor on date."""
+    trans = trans.assign(date=pd.to_datetime(trans['date']))
+    factors = factors.assign(date=pd.to_datetime(factors['date']))
+    return pd.merge(trans, factors, on='date')[['date', 'transactions', 'factor_value']]
+
+
+def fit_trendline(merged):
+    """Least-squares fit of transactions on factor_value, or None if too few points."""
+    data = merged[['factor_value', 'transactions']].dropna()
+    if len(data) < 2 or data['factor_value'].nunique() < 2:
+        return None
+    x = data['factor_value'].to_numpy(dtype=float)
+    y = data['transactions'].to_numpy(dtype=float)
+    slope, intercept = np.polyfit(x, y, 1)
+    residual = y - (slope * x + intercept)
+    total = ((y - y.mean()) ** 2).sum()
+    return {
+        'slope': float(slope),
+        'intercept': float(intercept),
+        'r2': float(1 - (residual ** 2).sum() / total) if total else 0.0,
+        'correlation': float(np.corrcoef(x, y)[0, 1]),
+        'n': int(len(data)),
+        'x_range': [float(x.min()), float(x.max())],
+    }
+
+
+def factor_figure(merged, fit, title, width_px=FACTOR_WIDTH_PX):
+    # Past MAX_SCATTER_POINTS the points become a hexagonal density grid sized
+    # to the chart width; the trendline is still fitted on every point
+    cells, binned = downsampling.downsample_scatter(merged, 'factor_value', 'transactions', width_px)
+    if binned:
+        fig = go.Figure(go.Scatter(
+            x=cells['x'], y=cells['y'], mode='markers', name="Density",
+            marker=dict(symbol='hexagon', size=downsampling.HEX_SIZE_PX, color=cells['count'],
+                        colorscale='Blues', colorbar=dict(title="Days")),
+            customdata=cells['count'],
+            hovertemplate="Factor %{x}<br>Transactions %{y}<br>%{customdata} points<extra></extra>",
+        ))
+    else:
+        fig = go.Figure(go.Scatter(
+            x=merged['factor_value'], y=merged['transactions'], mode='markers', name="Daily",
+            customdata=merged['date'].dt.strftime('%Y-%m-%d'),
+            hovertemplate="%{customdata}<br>Factor %{x}<br>Transactions %{y}<extra></extra>",
+        ))
+    if fit:
+        x0, x1 = fit['x_range']
+        fig.add_trace(go.Scatter(
+            x=[x0, x1], y=[fit['slope'] * x0 + fit['intercept'], fit['slope'] * x1 + fit['intercept']],
+            mode='lines', name=f"OLS (R² {fit['r2']:.2f})",
+        ))
+    fig.update_layout(title=title, xaxis_title="Factor Intensity", yaxis_title="Transaction Volume")
+    return fig
+
+
+def transactions_figure(trans, title, width_px=FULL_WIDTH_PX):
+    """Transactions over time, LTTB-reduced to ~2 points per pixel (peaks kept)."""
+    trans = trans.assign(date=pd.to_datetime(trans['date'])).dropna(subset=['transactions'])
+    line = downsampling.downsample_line(trans, 'date', 'transactions', width_px)
+    fig = go.Figure(go.Scatter(x=line['date'], y=line['transactions'], mode='lines', name="Transactions"))
+    fig.update_layout(title=title, xaxis_title="Date", yaxis_title="Transaction Volume")
+    return fig
+
+
+# ============================================================================
+# STAGE
+# ============================================================================
+
+def _write_json(name, payload):
+    with open(dashboard_data.artifact_path(name), 'w') as f:
+        json.dump(payload, f)
+
+
+def _write_figure(name, fig):
+    # The default template is most of the spec and dominates the cost of
+    # rebuilding the figure on load; Streamlit applies its own theme anyway
+    spec = fig.to_plotly_json()
+    spec['layout'].pop('template', None)
+    with open(dashboard_data.artifact_path(f"fig_{name}.json"), 'w') as f:
+        json.dump(spec, f, cls=plotly_utils.PlotlyJSONEncoder)
+
+
+def build_artifacts(tables=None):
+    """
+    Writes every artifact whose inputs exist. Returns the names written.
+    `tables` are the engine's in-memory results when run in the pipeline;
+    otherwise the outputs are read from disk.
+    """
+    os.makedirs(dashboard_data.artifact_path(), exist_ok=True)
+    if not PLOTLY_AVAILABLE:
+        print("  -> Plotly not installed: writing data artifacts only.")
+    written = []
+
+    # 1. Momentum heatmaps
+    heatmaps = {}
+    for year in MOMENTUM_YEARS:
+        df = dashboard_data.load_dataset(f'momentum_{year}', tables=tables)
+        if df is not None and not df.empty:
+            heatmaps[str(year)] = momentum_matrix(df)
+    if heatmaps:
+        _write_json("momentum_heatmaps.json", heatmaps)
+        written.append("momentum_heatmaps.json")
+        if PLOTLY_AVAILABLE:
+            for year, matrix in heatmaps.items():
+                _write_figure(f"momentum_{year}",
+                              momentum_figure(matrix, f"{MOMENTUM_PERIOD} {year} Momentum Profile"))
+                written.append(f"fig_momentum_{year}.json")
+        print(f"  -> Momentum heatmaps: {', '.join(heatmaps)}")
+
+    # 2. External factors: merged frame, trendline, scatter
+    trans = dashboard_data.load_dataset('transactions', tables=tables)
+    factors = dashboard_data.load_dataset('factors')
+    if trans is not None and factors is not None:
+        merged = factor_frame(trans, factors)
+        merged.to_parquet(dashboard_data.artifact_path("factors_merged.parquet"), index=False)
+        fit = fit_trendline(merged)
+        _write_json("factors_trendline.json", fit)
+        written += ["factors_merged.parquet", "factors_trendline.json"]
+        if PLOTLY_AVAILABLE:
+            _write_figure("factors", factor_figure(merged, fit, "Daily Transactions vs External Factor (2025)"))
+            _write_figure("transactions", transactions_figure(trans, "Daily Transactions (2025)"))
+            written += ["fig_factors.json", "fig_transactions.json"]
+        print(f"  -> Factor frame: {len(merged)} days" +
+              (f", trendline slope {fit['slope']:.2f} (R² {fit['r2']:.3f})" if fit else ""))
+
+    print(f"  -> {len(written)} dashboard artifacts written to {dashboard_data.artifact_path()}")
+    return written
+
+
+def main():
+    print("\n[ARTIFACTS] Precomputing dashboard artifacts...")
+    build_artifacts()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Dashboard Data Access
+=====================
+Per-tab, on-demand loading of the engine outputs for analytics_dashboard.py.
+Kept free of Streamlit so it can be benchmarked and reused headless.
+
+- Each tab declares the datasets it needs (TAB_DATASETS); nothing is read
+  until a tab is first shown.
+- Only the columns a tab plots are read (DATASETS): memory-mapped from the
+  engine's Arrow IPC file (arrow_io.py, numeric columns not copied), else
+  from a Parquet copy, else from a CSV (usecols).
+- Row counts come from market_stats.json or the Parquet footer / IPC batch
+  headers, never from loading a table.
+- Heatmap matrices, the merged factor frame, the trendline fit and Plotly
+  figure specs are precomputed per engine run (dashboard_artifacts.py) and
+  read from output/dashboard/ as-is.
+- Every dataset has a cheap stamp (path, size, mtime_ns); callers key their
+  caches on it so a new engine run reloads only the files it rewrote.
+- The anomaly explorer filters, sorts and pages the audit Parquet in DuckDB
+  with keyset pagination; only the requested page reaches pandas.
+"""
+
+import os
+import json
+import threading
+
+import pandas as pd
+
+import arrow_io
+from lazy_imports import lazy_import
+from fingerprints import file_stat
+
+duckdb = lazy_import("duckdb")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+ARTIFACT_SUBDIR = "dashboard"  # under OUTPUT_DIR
+
+# key -> (directory attribute, file stem, columns read; None = all)
+DATASETS = {
+    'leakage': ("OUTPUT_DIR", "leakage_report", None),
+    'volatility': ("OUTPUT_DIR", "regional_volatility", ['location_id', 'count_2024', 'count_2025', 'pct_change']),
+    'momentum_2024': ("OUTPUT_DIR", "momentum_2024", ['dow', 'hour', 'avg_momentum']),
+    'momentum_2025': ("OUTPUT_DIR", "momentum_2025", ['dow', 'hour', 'avg_momentum']),
+    'engagement': ("OUTPUT_DIR", "engagement_metrics", ['month', 'avg_fee', 'avg_engagement_score']),
+    'transactions': ("OUTPUT_DIR", "daily_transactions_2025", ['date', 'transactions']),
+    'factors': ("CACHE_DIR", "external_factors_2025", ['date', 'factor_value']),
+    'anomalies': ("OUTPUT_DIR", "anomaly_audit", None),
+}
+
+TAB_DATASETS = {
+    "Overview": ['leakage'],
+    "Volatility": ['volatility'],
+    "Momentum": ['momentum_2024', 'momentum_2025'],
+    "Engagement": ['engagement'],
+    "External Factors": ['transactions', 'factors'],
+}
+
+
+def dataset_path(key):
+    """(path, format) of the best available copy of a dataset, or (None, None)."""
+    dir_attr, stem, _ = DATASETS[key]
+    directory = globals()[dir_attr]
+    for ext in ("arrow", "parquet", "csv"):
+        path = os.path.join(directory, f"{stem}.{ext}")
+        if os.path.exists(path):
+            return path, ext
+    return None, None
+
+
+def dataset_stamp(key):
+    """(path, (size, mtime_ns)) of a dataset's current copy; changes when it is rewritten."""
+    path, _ = dataset_path(key)
+    return (path, file_stat(path)) if path else None
+
+
+def output_stamp(name):
+    """Same as dataset_stamp for a named file in OUTPUT_DIR (market_stats.json, ...)."""
+    path = os.path.join(OUTPUT_DIR, name)
+    return (path, file_stat(path))
+
+
+def load_dataset(key, columns=None, tables=None):
+    """
+    Reads one dataset (projected to its declared columns), or None if missing.
+    `tables` ({file stem: Arrow table}, the pipeline's in-memory engine
+    results) is used before the files.
+    """
+    _, stem, declared = DATASETS[key]
+    columns = columns or declared
+    if tables and stem in tables:
+        return arrow_io.to_pandas(arrow_io.select(tables[stem], columns))
+    path, fmt = dataset_path(key)
+    if path is None:
+        return None
+    if fmt == "arrow":
+        return arrow_io.read_pandas(path, columns)
+    if fmt == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if columns is None:
+        return pd.read_csv(path)
+    return pd.read_csv(path, usecols=lambda c: c in columns)
+
+
+def load_stats():
+    path = os.path.join(OUTPUT_DIR, "market_stats.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_correlation_text():
+    path = os.path.join(OUTPUT_DIR, "correlation_summary.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def artifact_path(name=""):
+    return os.path.join(OUTPUT_DIR, ARTIFACT_SUBDIR, name)
+
+
+def artifact_stamp(name):
+    path = artifact_path(name)
+    return (path, file_stat(path))
+
+
+def load_artifact(name):
+    """A precomputed artifact: parsed JSON, a DataFrame for .parquet, or None if missing."""
+    path = artifact_path(name)
+    if not os.path.exists(path):
+        return None
+    if name.endswith(".parquet"):
+        return pd.read_parquet(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_figure(name):
+    """Serialized Plotly figure spec (dict, renderable as-is) or None."""
+    return load_artifact(f"fig_{name}.json")
+
+
+def row_count(key):
+    """Row count from the Parquet footer or IPC batch headers (no data pages read), or None."""
+    path, fmt = dataset_path(key)
+    if fmt == "arrow":
+        return arrow_io.num_rows(path)
+    if fmt != "parquet":
+        return None
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def anomaly_count(stats=None):
+    """Flagged-anomaly count: market_stats.json first, then the Parquet footer."""
+    stats = load_stats() if stats is None else stats
+    if 'anomaly_count' in stats:
+        return stats['anomaly_count']
+    return row_count('anomalies')
+
+
+def load_tab(tab):
+    """{key: DataFrame or None} for every dataset a tab uses."""
+    return {key: load_dataset(key) for key in TAB_DATASETS.get(tab, [])}
+
+
+# ============================================================================
+# ANOMALY EXPLORER
+# ============================================================================
+# Keyset pagination over the audit Parquet. The first time a sort column is
+# used (per audit file version) a narrow index table is built in DuckDB:
+# the filter columns plus `pos`, the row's position in that sort order. A
+# page is then `WHERE pos > cursor AND <filters> ORDER BY pos LIMIT n`,
+# which DuckDB answers from the table's zone maps without sorting, so page
+# 1000 costs the same as page 1. Full rows are read from the Parquet file
+# by row number for the page only.
+
+ANOMALY_PAGE_SIZE = 50
+ANOMALY_COLUMNS = ['VendorID', 'type', 'pickup_time', 'dropoff_time', 'pickup_loc', 'dropoff_loc',
+                   'trip_distance', 'fare', 'total_amount', 'duration_min', 'speed_mph', 'anomaly_flag']
+ANOMALY_SORTS = ['pickup_time', 'fare', 'total_amount', 'trip_distance', 'duration_min', 'speed_mph']
+# Columns the explorer filters on, kept in every index table
+_INDEX_COLUMNS = ['anomaly_flag', 'VendorID', 'pickup_loc', 'dropoff_loc', 'pickup_time']
+
+_duck = None
+_duck_lock = threading.Lock()
+_indexes = {}  # sort column -> audit file fingerprint it was built from
+
+
+def _cursor_unlocked():
+    global _duck
+    if _duck is None:
+        _duck = duckdb.connect()
+    return _duck.cursor()
+
+
+def _cursor():
+    """Cursor on a shared in-memory DuckDB connection (one per call: thread-safe)."""
+    with _duck_lock:
+        return _cursor_unlocked()
+
+
+def _anomaly_source():
+    """read_parquet() over the audit, or None (runs before the Parquet audit existed)."""
+    path, fmt = dataset_path('anomalies')
+    if fmt != "parquet":
+        return None
+    return f"read_parquet('{path.replace(chr(92), '/')}', file_row_number = true)"
+
+
+def _anomaly_index(sort):
+    """Name of the (re)built index table for a sort column."""
+    path, _ = dataset_path('anomalies')
+    stamp = (path, file_stat(path))
+    table = f"anomaly_idx_{sort}"
+    with _duck_lock:
+        if _indexes.get(sort) != stamp:
+            cur = _cursor_unlocked()
+            try:
+                columns = ', '.join(dict.fromkeys(_INDEX_COLUMNS + [sort]))
+                cur.execute(f"CREATE OR REPLACE TEMP TABLE _sorted AS SELECT file_row_number, {columns} "
+                            f"FROM {_anomaly_source()} ORDER BY {sort} NULLS LAST, file_row_number")
+                # Insertion order is kept, so rowid is the position in sort order
+                cur.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT rowid AS pos, * FROM _sorted")
+                cur.execute("DROP TABLE _sorted")
+            finally:
+                cur.close()
+            _indexes[sort] = stamp
+    return table
+
+
+def _anomaly_where(filters):
+    """SQL conditions and parameters for the explorer filters."""
+    filters = filters or {}
+    clauses, params = [], []
+    if filters.get('flags'):
+        clauses.append(f"anomaly_flag IN ({', '.join('?' * len(filters['flags']))})")
+        params += list(filters['flags'])
+    if filters.get('vendors'):
+        clauses.append(f"VendorID IN ({', '.join('?' * len(filters['vendors']))})")
+        params += [int(v) for v in filters['vendors']]
+    if filters.get('zones'):
+        marks = ', '.join('?' * len(filters['zones']))
+        clauses.append(f"(pickup_loc IN ({marks}) OR dropoff_loc IN ({marks}))")
+        params += [int(z) for z in filters['zones']] * 2
+    if filters.get('start'):
+        clauses.append("pickup_time >= ?::TIMESTAMP")
+        params.append(str(filters['start']))
+    if filters.get('end'):
+        # Inclusive end date
+        clauses.append("pickup_time < ?::TIMESTAMP + INTERVAL 1 DAY")
+        params.append(str(filters['end']))
+    return clauses, params
+
+
+def anomaly_facets():
+    """Distinct rules and vendors for the explorer's filter widgets."""
+    source = _anomaly_source()
+    if source is None:
+        return {'flags': [], 'vendors': []}
+    cur = _cursor()
+    try:
+        flags = [r[0] for r in cur.execute(
+            f"SELECT DISTINCT anomaly_flag FROM {source} WHERE anomaly_flag IS NOT NULL ORDER BY 1").fetchall()]
+        vendors = [r[0] for r in cur.execute(
+            f"SELECT DISTINCT VendorID FROM {source} WHERE VendorID IS NOT NULL ORDER BY 1").fetchall()]
+    finally:
+        cur.close()
+    return {'flags': flags, 'vendors': vendors}
+
+
+def anomaly_match_count(filters=None):
+    """Number of audit rows matching the filters (counted in DuckDB)."""
+    source = _anomaly_source()
+    if source is None:
+        return 0
+    clauses, params = _anomaly_where(filters)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    cur = _cursor()
+    try:
+        return cur.execute(f"SELECT COUNT(*) FROM {source}{where}", params).fetchone()[0]
+    finally:
+        cur.close()
+
+
+def anomaly_page(filters=None, sort='pickup_time', descending=False, after=None,
+                 page_size=ANOMALY_PAGE_SIZE):
+    """
+    One page of the anomaly audit, sorted by `sort` (NULLs last; descending
+    is the exact reverse).
+
+    Returns (DataFrame, next_cursor); pass next_cursor back as `after` for the
+    following page. next_cursor is None on the last page.
+    """
+    if sort not in ANOMALY_SORTS:
+        raise ValueError(f"Cannot sort by {sort!r}; choose from {', '.join(ANOMALY_SORTS)}")
+    source = _anomaly_source()
+    if source is None:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS), None
+
+    index = _anomaly_index(sort)
+    clauses, params = _anomaly_where(filters)
+    if after is not None:
+        clauses.append("pos < ?" if descending else "pos > ?")
+        params.append(int(after))
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    order = "DESC" if descending else "ASC"
+
+    cur = _cursor()
+    try:
+        # One extra row tells us whether another page exists
+        keys = cur.execute(f"SELECT pos, file_row_number FROM {index}{where} ORDER BY pos {order} LIMIT ?",
+                           params + [page_size + 1]).fetchall()
+        rows = [row for _, row in keys[:page_size]]
+        if not rows:
+            return pd.DataFrame(columns=ANOMALY_COLUMNS), None
+        page = cur.execute(
+            f"SELECT {', '.join(ANOMALY_COLUMNS)}, file_row_number FROM {source} "
+            f"WHERE file_row_number IN ({', '.join('?' * len(rows))})", rows).df()
+    finally:
+        cur.close()
+
+    page = page.set_index('file_row_number').loc[rows].reset_index(drop=True)
+    next_cursor = keys[page_size - 1][0] if len(keys) > page_size else None
+    return page, next_cursor
@@ -1,9 +1,31 @@
 import os
-import requests
-import polars as pl
+import sys
+import json
+from datetime import datetime
+
+from lazy_imports import lazy_import
+from resource_monitor import ResourceMonitor, MemoryBudgetExceeded
+from execution_backends import rename_map as trip_rename_map
+from execution_backends import (
+    ANALYSIS_ROW_GROUP,
+    DERIVED_COLUMNS,
+    FIXED_POINT_COLUMNS,
+    FIXED_POINT_SCALE,
+    TAXI_CODES,
+    analysis_current,
+    analysis_fingerprint,
+    analysis_path,
+    derived_columns_pl,
+)
+from fingerprints import record_artifact
+
+# Loaded on first use so importing this module stays cheap
+requests = lazy_import("requests")
+pl = lazy_import("polars")
 
 # --- CONFIGURATION ---
-BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data" 
+# TLC_BASE_URL points ingestion at a mirror or a local stand-in (python -m http.server)
+BASE_URL = os.environ.get("TLC_BASE_URL", "https://d37ci6vzurychx.cloudfront.net/trip-data")
 #Below are the months we want to download for each year. Adjust as needed. All 12 were available at the time of writing, but this allows for flexibility if some months are missing or if you want to limit the scope.
 DATA_NEEDS = {
     2025: range(1, 12),       
@@ -12,33 +34,197 @@ DATA_NEEDS = {
 }
 TAXI_TYPES = ['yellow', 'green']
 OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_downloads")
+# Run metrics are shared with the processing engine (output/run_metrics.json)
+METRICS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "output")
+
+MANIFEST_FILE = ".download_manifest.json"
+DOWNLOAD_TIMEOUT_S = 60
+
+# ============================================================================
+# DOWNLOADS
+# ============================================================================
+# Each download records the validators the server sent (ETag, Last-Modified,
+# Content-Length) in data_downloads/.download_manifest.json. A revalidation
+# pass sends them back as If-None-Match / If-Modified-Since: unchanged months
+# cost one 304 response, and only republished months are fetched again.
+
+def load_manifest(data_dir=None):
+    path = os.path.join(data_dir or OUTPUT_DIR, MANIFEST_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(manifest, data_dir=None):
+    """Writes the manifest; left untouched if nothing changed (the pipeline fingerprints it)."""
+    data_dir = data_dir or OUTPUT_DIR
+    if manifest == load_manifest(data_dir):
+        return
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def manifest_key(save_path, data_dir=None):
+    return os.path.relpath(save_path, data_dir or OUTPUT_DIR).replace(os.sep, "/")
+
 
-def download_file(url, save_path):      
-    """Downloads a file if it doesn't exist."""
-    if os.path.exists(save_path):
+def _validators(response):
+    length = response.headers.get("Content-Length")
+    return {
+        'etag': response.headers.get("ETag"),
+        'last_modified': response.headers.get("Last-Modified"),
+        'content_length': int(length) if length and length.isdigit() else None,
+    }
+
+
+def _same_remote(entry, response):
+    """True if a 200 response describes the version recorded in entry (server ignored the condition)."""
+    remote = _validators(response)
+    if remote['etag'] and entry.get('etag'):
+        return remote['etag'] == entry['etag']
+    if remote['last_modified'] and entry.get('last_modified'):
+        return remote['last_modified'] == entry['last_modified'] and remote['content_length'] == entry.get('content_length')
+    return False
+
+
+def _record(manifest, key, url, validators, save_path):
+    size, mtime_ns = os.stat(save_path).st_size, os.stat(save_path).st_mtime_ns
+    manifest[key] = dict(validators, url=url, size=size, mtime_ns=mtime_ns,
+                         checked=datetime.now().isoformat(timespec="seconds"))
+
+
+def _save_body(response, save_path):
+    """Streams the body to <file>.part and swaps it in atomically."""
+    part = save_path + ".part"
+    try:
+        with open(part, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                if chunk:
+                    f.write(chunk)
+        os.replace(part, save_path)
+    finally:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def fetch(url, save_path, manifest, data_dir=None, revalidate=False, timeout=DOWNLOAD_TIMEOUT_S):
+    """
+    Brings one month up to date. Returns one of:
+    'downloaded' (new), 'updated' (republished), 'unchanged', 'skipped'
+    (exists, not revalidated), 'missing' (not published) or 'failed'.
+    Network errors propagate to the caller.
+    """
+    key = manifest_key(save_path, data_dir)
+    entry = manifest.get(key)
+    exists = os.path.exists(save_path)
+    if exists and os.path.getsize(save_path) < 1024:
         # simple check: if file is too small (<1KB), it's likely corrupt.
-        if os.path.getsize(save_path) < 1024:
-            print(f"Removing corrupt file: {save_path}")
-            os.remove(save_path)
-        else:
-            print(f"Skipping {save_path} (exists)")
-            return True
-            
-    print(f"Ingesting {url}...")
-    try:  
-        response = requests.get(url, stream=True) 
-        if response.status_code == 200:  
-            with open(save_path, 'wb') as f: 
-                for chunk in response.iter_content(chunk_size=1024):
-                    if chunk: f.write(chunk)
-            print(f"Saved to {save_path}")
-            return True
-        else:
-            print(f"Failed {url} (Status: {response.status_code})")
-            return False
+        print(f"Removing corrupt file: {save_path}")
+        os.remove(save_path)
+        exists, entry = False, None
+    if exists and not revalidate:
+        return 'skipped'
+
+    headers = {}
+    local_intact = exists and entry and (entry.get('size'), entry.get('mtime_ns')) == \
+        (os.stat(save_path).st_size, os.stat(save_path).st_mtime_ns)
+    if local_intact:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    elif exists:
+        # Downloaded before validators were recorded: a HEAD decides whether
+        # the local copy matches what is published now
+        head = requests.head(url, timeout=timeout, allow_redirects=True)
+        if head.status_code != 200:
+            return 'missing' if head.status_code in (403, 404) else 'failed'
+        remote = _validators(head)
+        if remote['content_length'] == os.path.getsize(save_path):
+            _record(manifest, key, url, remote, save_path)
+            return 'unchanged'
+
+    with requests.get(url, stream=True, headers=headers, timeout=timeout) as response:
+        if response.status_code == 304 or (local_intact and response.status_code == 200
+                                           and _same_remote(entry, response)):
+            manifest[key]['checked'] = datetime.now().isoformat(timespec="seconds")
+            return 'unchanged'
+        if response.status_code != 200:
+            return 'missing' if response.status_code in (403, 404) else 'failed'
+        _save_body(response, save_path)
+        _record(manifest, key, url, _validators(response), save_path)
+    return 'updated' if exists else 'downloaded'
+
+
+def download_file(url, save_path, manifest=None, data_dir=None, revalidate=False):
+    """
+    Downloads a file if it doesn't exist (or, with revalidate, if it was
+    republished). Returns the fetch() status.
+    """
+    own_manifest = manifest is None
+    if own_manifest:
+        manifest = load_manifest(data_dir)
+    try:
+        status = fetch(url, save_path, manifest, data_dir, revalidate)
     except Exception as e:
         print(f"Error: {e}")
-        return False
+        return 'failed'
+    if own_manifest and status in ('downloaded', 'updated', 'unchanged'):
+        save_manifest(manifest, data_dir)
+
+    if status == 'skipped':
+        print(f"Skipping {save_path} (exists)")
+    elif status == 'unchanged':
+        print(f"Unchanged {save_path}")
+    elif status in ('downloaded', 'updated'):
+        print(f"{'Updated' if status == 'updated' else 'Saved to'} {save_path}")
+    else:
+        print(f"Failed {url} ({status})")
+    return status
+
+
+def month_files(data_dir=None):
+    """(year, taxi, url, save_path) for every month in DATA_NEEDS."""
+    data_dir = data_dir or OUTPUT_DIR
+    for year, months in DATA_NEEDS.items():
+        for taxi in TAXI_TYPES:
+            for month in months:
+                file_name = f"{taxi}_tripdata_{year}-{month:02d}.parquet"
+                yield year, taxi, f"{BASE_URL}/{file_name}", os.path.join(data_dir, str(year), taxi, file_name)
+
+
+def download_all(data_dir=None, revalidate=False):
+    """
+    Downloads every month in DATA_NEEDS; with revalidate, existing months are
+    checked with conditional requests and re-fetched only if republished.
+    Returns {status: [save_path, ...]}.
+    """
+    data_dir = data_dir or OUTPUT_DIR
+    manifest = load_manifest(data_dir)
+    results = {}
+    try:
+        for year, taxi, url, save_path in month_files(data_dir):
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            status = download_file(url, save_path, manifest, data_dir, revalidate)
+            results.setdefault(status, []).append(save_path)
+    finally:
+        save_manifest(manifest, data_dir)
+    return results
+
+
+def changed_streams(paths):
+    """Sorted (year, taxi) streams that contain any of the given month files."""
+    streams = set()
+    for path in paths:
+        taxi_dir = os.path.dirname(path)
+        streams.add((int(os.path.basename(os.path.dirname(taxi_dir))), os.path.basename(taxi_dir)))
+    return sorted(streams)
 
 def standardize_and_select(lf, taxi_type):
     """
@@ -47,22 +233,8 @@ def standardize_and_select(lf, taxi_type):
     and handles missing surcharge columns.
     """
     
-    if taxi_type == 'yellow':
-        rename_map = {
-            'tpep_pickup_datetime': 'pickup_time',
-            'tpep_dropoff_datetime': 'dropoff_time',
-            'PULocationID': 'pickup_loc',
-            'DOLocationID': 'dropoff_loc',
-            'fare_amount': 'fare'
-        }
-    else: # green
-        rename_map = {
-            'lpep_pickup_datetime': 'pickup_time',
-            'lpep_dropoff_datetime': 'dropoff_time',
-            'PULocationID': 'pickup_loc',
-            'DOLocationID': 'dropoff_loc',
-            'fare_amount': 'fare'
-        }
+    # Shared TLC -> engine column mapping (also used by the engine backends)
+    rename_map = trip_rename_map(taxi_type)
     
     # Apply rename if columns exist
     current_cols = lf.collect_schema().names()
@@ -86,7 +258,7 @@ def standardize_and_select(lf, taxi_type):
         pl.col('congestion_surcharge').fill_null(0.0).cast(pl.Float64)
     ])
 
-def process_and_unify(year, taxi_type):
+def process_and_unify(year, taxi_type, monitor=None):
     """
     Reads files INDIVIDUALLY to handle schema drifts, then concatenates.
     """
@@ -116,28 +288,237 @@ def process_and_unify(year, taxi_type):
         # We perform collect() here to write to CSV
         print(f"Aggregating & Writing to {output_csv}...")
         df = combined_q.collect() 
+        if monitor is not None:
+            monitor.note_polars(f"{year}_{taxi_type}", df)
         df.write_csv(output_csv)
         print(f"Success! ({df.shape[0]} records)")
 
     except Exception as e:
         print(f"CRITICAL ERROR processing {year} {taxi_type}: {e}")
 
+# ============================================================================
+# ANALYSIS PROJECTION
+# ============================================================================
+# The engine reads data_downloads/analysis/{year}/{taxi}/ instead of the raw
+# ~19-column TLC files: only the columns it queries, UInt8 vendor / taxi
+# codes, UInt16 location IDs and money / distance as Int32 hundredths, plus
+# the per-trip derived columns (duration, momentum, anomaly code, zone
+# flags, hour / dow / month / date keys) so queries never recompute them;
+# sorted by pickup time and written with zstd (dictionary-encoded codes and
+# amounts, delta-encoded timestamps). One file per raw month, rebuilt only
+# when that month's raw file changes. A month with an amount outside the
+# Int32 range gets no projection, so its stream is read from the raw files.
+
+def project_month(raw_path, taxi_type, data_dir=None):
+    """
+    Writes the analysis projection of one raw monthly file. Returns its row
+    count, or None if an amount does not fit the fixed-point column.
+    """
+    import pyarrow.parquet as pq
+
+    data_dir = data_dir or OUTPUT_DIR
+    lf = pl.scan_parquet(raw_path)
+    names = lf.collect_schema().names()
+    lf = lf.rename({k: v for k, v in trip_rename_map(taxi_type).items() if k in names})
+    if 'congestion_surcharge' not in lf.collect_schema().names():
+        lf = lf.with_columns(pl.lit(0.0).alias('congestion_surcharge'))
+
+    def fixed_point(c):
+        return (pl.col(c) * FIXED_POINT_SCALE).round().cast(pl.Int32).alias(f"{c}_x100")
+
+    # Derived columns are computed from the same Float64 values the raw path sees
+    query = lf.select([
+        pl.col('VendorID').cast(pl.UInt8, strict=False),
+        pl.col('pickup_time').cast(pl.Datetime('us')),
+        pl.col('dropoff_time').cast(pl.Datetime('us')),
+        pl.col('pickup_loc').cast(pl.UInt16, strict=False),
+        pl.col('dropoff_loc').cast(pl.UInt16, strict=False),
+        *[pl.col(c).cast(pl.Float64) for c in FIXED_POINT_COLUMNS],
+    ]).with_columns(
+        pl.col('congestion_surcharge').fill_null(0.0),
+    ).with_columns(derived_columns_pl()).select([
+        'VendorID',
+        pl.lit(TAXI_CODES[taxi_type], dtype=pl.UInt8).alias('taxi_code'),
+        'pickup_time', 'dropoff_time', 'pickup_loc', 'dropoff_loc',
+        *[fixed_point(c) for c in FIXED_POINT_COLUMNS],
+        *DERIVED_COLUMNS,
+    ]).sort('pickup_time')
+    try:
+        df = query.collect()
+    except pl.exceptions.InvalidOperationError:
+        print(f"   [!] {os.path.basename(raw_path)}: amount out of Int32 range, stream stays on the raw files")
+        return None
+
+    out = analysis_path(data_dir, raw_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = str(out) + ".part"
+    # Dictionary pages for the low-cardinality codes, IDs and amounts; the
+    # (sorted) timestamps are nearly unique, so they are delta-encoded instead
+    timestamps = {'pickup_time': 'DELTA_BINARY_PACKED', 'dropoff_time': 'DELTA_BINARY_PACKED'}
+    pq.write_table(df.to_arrow(), tmp, compression='zstd',
+                   use_dictionary=[c for c in df.columns if c not in timestamps],
+                   column_encoding=timestamps, row_group_size=ANALYSIS_ROW_GROUP)
+    os.replace(tmp, out)
+    record_artifact(str(out), analysis_fingerprint(raw_path))
+    return df.height
+
+
+def build_analysis(data_dir=None, streams=None, force=False):
+    """
+    Brings the analysis projection up to date for the given (year, taxi)
+    streams (default: every stream on disk). Months whose projection is
+    current are skipped. Returns a summary with on-disk sizes.
+    """
+    data_dir = data_dir or OUTPUT_DIR
+    if streams is None:
+        streams = sorted((int(y), t) for y in os.listdir(data_dir) if y.isdigit()
+                         for t in TAXI_TYPES if os.path.isdir(os.path.join(data_dir, y, t)))
+    summary = {'written': 0, 'current': 0, 'raw': 0, 'rows': 0, 'raw_bytes': 0, 'analysis_bytes': 0}
+    for year, taxi in streams:
+        directory = os.path.join(data_dir, str(year), taxi)
+        raw_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.parquet')) \
+            if os.path.isdir(directory) else []
+        for raw in raw_files:
+            if not force and analysis_current(data_dir, raw):
+                summary['current'] += 1
+            else:
+                rows = project_month(raw, taxi, data_dir)
+                if rows is None:
+                    summary['raw'] += 1
+                    continue
+                summary['rows'] += rows
+                summary['written'] += 1
+            summary['raw_bytes'] += os.path.getsize(raw)
+            summary['analysis_bytes'] += os.path.getsize(analysis_path(data_dir, raw))
+    return summary
+
+
+def print_analysis_summary(summary):
+    ratio = summary['raw_bytes'] / summary['analysis_bytes'] if summary['analysis_bytes'] else 0
+    skipped = f", {summary['raw']} left on raw files" if summary['raw'] else ""
+    print(f"Analysis projection: {summary['written']} month(s) written, {summary['current']} current{skipped}; "
+          f"{summary['raw_bytes'] / 1e6:,.1f} MB raw -> {summary['analysis_bytes'] / 1e6:,.1f} MB ({ratio:.1f}x smaller)")
+
+
+def _wide_nbytes(table):
+    """In-memory size of the same rows in the previous normalized schema (Int64 / Float64 / type string)."""
+    rows = table.num_rows
+    codes = table.column('taxi_code').to_numpy()
+    type_bytes = rows * 4 + sum(len(name) * int((codes == code).sum()) for name, code in TAXI_CODES.items())
+    ints = rows * 8 * 3  # VendorID, pickup_loc, dropoff_loc
+    floats = rows * 8 * len(FIXED_POINT_COLUMNS)
+    return ints + floats + type_bytes + table.column('pickup_time').nbytes + table.column('dropoff_time').nbytes
+
+
+def projection_report(data_dir=None, repeats=3):
+    """
+    On-disk and in-memory size of raw vs projected trips, and per-operation
+    scan time of the engine's queries (DuckDB) reading raw vs projected data,
+    with a result parity check. Builds the projection first if needed.
+    """
+    import time
+    import pyarrow.parquet as pq
+    from execution_backends import DuckDBBackend, RESULT_KEYS, compare_tables
+
+    data_dir = data_dir or OUTPUT_DIR
+    build_analysis(data_dir)
+    report = {'disk': {'raw': 0, 'analysis': 0}, 'memory': {'raw': 0, 'normalized': 0, 'analysis': 0}}
+    for year in sorted(y for y in os.listdir(data_dir) if y.isdigit()):
+        for taxi in TAXI_TYPES:
+            directory = os.path.join(data_dir, year, taxi)
+            if not os.path.isdir(directory):
+                continue
+            for f in sorted(os.listdir(directory)):
+                if not f.endswith('.parquet'):
+                    continue
+                raw = os.path.join(directory, f)
+                projected = pq.read_table(analysis_path(data_dir, raw))
+                report['disk']['raw'] += os.path.getsize(raw)
+                report['disk']['analysis'] += os.path.getsize(analysis_path(data_dir, raw))
+                report['memory']['raw'] += pq.read_table(raw).nbytes
+                report['memory']['normalized'] += _wide_nbytes(projected)
+                report['memory']['analysis'] += projected.nbytes
+
+    raw_backend = DuckDBBackend(data_dir, use_analysis=False)
+    fast_backend = DuckDBBackend(data_dir, conn=raw_backend.conn)
+    report['scan'] = {}
+    try:
+        for op in RESULT_KEYS:
+            timings = {}
+            tables = {}
+            for name, backend in (('raw', raw_backend), ('analysis', fast_backend)):
+                best = float('inf')
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    tables[name] = backend.fetch(op)
+                    best = min(best, time.perf_counter() - start)
+                timings[name] = round(best, 4)
+            timings['parity'] = not compare_tables(tables['raw'], tables['analysis'], RESULT_KEYS[op])
+            report['scan'][op] = timings
+    finally:
+        raw_backend.close()
+    return report
+
+
+def print_projection_report(report):
+    disk, mem = report['disk'], report['memory']
+    print(f"  On disk:   raw {disk['raw'] / 1e6:>9.2f} MB -> analysis {disk['analysis'] / 1e6:>9.2f} MB "
+          f"({disk['raw'] / max(disk['analysis'], 1):.1f}x)")
+    print(f"  In memory: raw {mem['raw'] / 1e6:>9.2f} MB, normalized {mem['normalized'] / 1e6:>9.2f} MB -> "
+          f"analysis {mem['analysis'] / 1e6:>9.2f} MB ({mem['normalized'] / max(mem['analysis'], 1):.1f}x vs normalized)")
+    print(f"  {'operation':<22} {'raw (s)':>9} {'analysis (s)':>13} {'speedup':>8}  parity")
+    total_raw = total_fast = 0.0
+    for op, t in report['scan'].items():
+        total_raw += t['raw']
+        total_fast += t['analysis']
+        print(f"  {op:<22} {t['raw']:>9.4f} {t['analysis']:>13.4f} {t['raw'] / max(t['analysis'], 1e-9):>7.2f}x  "
+              f"{'OK' if t['parity'] else 'MISMATCH'}")
+    print(f"  {'total':<22} {total_raw:>9.4f} {total_fast:>13.4f} {total_raw / max(total_fast, 1e-9):>7.2f}x")
+
+
 # --- MAIN EXECUTION ---
-if __name__ == "__main__":
+def main(revalidate=False):
+    """
+    revalidate: check already-downloaded months against the source and
+    re-unify only the streams whose months were (re)downloaded.
+    """
     if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
+    monitor = ResourceMonitor("ingestion")
 
-    for year, months in DATA_NEEDS.items():
-        for taxi in TAXI_TYPES:
-            year_dir = f"{OUTPUT_DIR}/{year}/{taxi}"
-            if not os.path.exists(year_dir): os.makedirs(year_dir)
-            for month in months:
-                file_name = f"{taxi}_tripdata_{year}-{month:02d}.parquet"
-                download_file(f"{BASE_URL}/{file_name}", f"{year_dir}/{file_name}")
+    try:
+        # 1. Download
+        with monitor.phase("download"):
+            results = download_all(OUTPUT_DIR, revalidate=revalidate)
+        fetched = results.get('downloaded', []) + results.get('updated', [])
+        print(f"\nDownloads: {len(results.get('downloaded', []))} new, {len(results.get('updated', []))} republished, "
+              f"{len(results.get('unchanged', []))} unchanged, {len(results.get('skipped', []))} skipped")
 
-    # 2. Process & Unify
-    print("\nStarting Stream Unification...")
-    for year in DATA_NEEDS.keys():
-        for taxi in TAXI_TYPES:
-            process_and_unify(year, taxi)
+        # 2. Process & Unify
+        if revalidate:
+            streams = changed_streams(fetched)
+            streams += [(year, taxi) for year in DATA_NEEDS for taxi in TAXI_TYPES
+                        if not os.path.exists(f"{OUTPUT_DIR}/{year}_{taxi}_unified.csv") and (year, taxi) not in streams]
+        else:
+            streams = [(year, taxi) for year in DATA_NEEDS for taxi in TAXI_TYPES]
+        print("\nStarting Stream Unification...")
+        if not streams:
+            print("All streams current.")
+        for year, taxi in streams:
+            with monitor.phase(f"unify_{year}_{taxi}"):
+                process_and_unify(year, taxi, monitor)
+
+        # 3. Analysis-ready projection (only months whose raw file changed)
+        with monitor.phase("analysis_projection"):
+            print_analysis_summary(build_analysis(OUTPUT_DIR))
+    except MemoryBudgetExceeded as e:
+        print(f"\nMEMORY BUDGET EXCEEDED: {e}")
+        return 1
+    finally:
+        monitor.print_summary()
+        monitor.save(METRICS_DIR)
             
     print("\nDONE.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Chart Downsampling
+==================
+Keeps dashboard chart payloads proportional to the chart's pixel width
+instead of the data size.
+
+- Lines: Largest-Triangle-Three-Buckets (LTTB) picks ~2 points per pixel
+  column, preserving the visual shape; the global min/max are always kept
+  so peaks survive.
+- Scatters: above MAX_SCATTER_POINTS the points are aggregated into a
+  hexagonal density grid whose cell count follows the chart width.
+
+Pure numpy/pandas; the Plotly traces are built by the callers
+(dashboard_artifacts.py). `main` benchmarks 10^6-point inputs.
+
+Usage:
+    python core_modules/downsampling.py [--points 1000000] [--width 1200]
+"""
+
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+DEFAULT_WIDTH_PX = 1200
+POINTS_PER_PIXEL = 2
+MAX_SCATTER_POINTS = 5000
+HEX_SIZE_PX = 12
+
+# ============================================================================
+# LINES
+# ============================================================================
+
+def _numeric(values):
+    """Float view of a numeric or datetime column (datetimes as epoch ns)."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def line_budget(width_px=DEFAULT_WIDTH_PX, points_per_pixel=POINTS_PER_PIXEL):
+    return max(int(width_px * points_per_pixel), 3)
+
+
+def lttb(x, y, n_out, keep_extremes=True):
+    """
+    Indices of the points Largest-Triangle-Three-Buckets keeps (sorted).
+
+    x must be increasing. First and last points are always kept; with
+    keep_extremes the global min and max of y are added too.
+    """
+    x, y = _numeric(x), _numeric(y)
+    n = len(x)
+    if n_out >= n or n < 3:
+        return np.arange(n)
+    n_out = max(n_out, 3)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if end <= start:
+            end = start + 1
+        # Average of the next bucket (the last point for the final bucket)
+        nxt_start = edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+
+    if keep_extremes:
+        finite = np.isfinite(y)
+        if finite.any():
+            keep = np.union1d(keep, [np.nanargmin(y), np.nanargmax(y)])
+    return np.unique(keep)
+
+
+def downsample_line(df, x, y, width_px=DEFAULT_WIDTH_PX, keep_extremes=True):
+    """Rows of df (sorted by x) reduced to the line budget for the chart width."""
+    budget = line_budget(width_px)
+    if len(df) <= budget:
+        return df
+    df = df.sort_values(x)
+    return df.iloc[lttb(df[x].to_numpy(), df[y].to_numpy(), budget, keep_extremes)]
+
+
+# ============================================================================
+# SCATTERS
+# ============================================================================
+
+def hex_gridsize(width_px=DEFAULT_WIDTH_PX, hex_px=HEX_SIZE_PX):
+    return max(int(width_px / hex_px), 10)
+
+
+def hexbin(x, y, gridsize, extent=None):
+    """
+    Counts of (x, y) points in a hexagonal grid, gridsize cells across.
+    Returns a DataFrame of occupied cells: x, y (cell centres), count.
+    Same lattice construction as matplotlib's hexbin.
+    """
+    x, y = _numeric(x), _numeric(y)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+    if len(x) == 0:
+        return pd.DataFrame({'x': [], 'y': [], 'count': []})
+    xmin, xmax, ymin, ymax = extent or (x.min(), x.max(), y.min(), y.max())
+    nx = gridsize
+    ny = max(int(round(gridsize / np.sqrt(3))), 1)
+    sx = (xmax - xmin) / nx or 1.0
+    sy = (ymax - ymin) / ny or 1.0
+
+    u = (x - xmin) / sx
+    v = (y - ymin) / sy
+    # Two offset rectangular lattices; each point goes to the nearer centre
+    i1, j1 = np.round(u), np.round(v)
+    i2, j2 = np.floor(u), np.floor(v)
+    d1 = (u - i1) ** 2 + 3.0 * (v - j1) ** 2
+    d2 = (u - i2 - 0.5) ** 2 + 3.0 * (v - j2 - 0.5) ** 2
+    first = d1 < d2
+
+    cx = np.where(first, i1, i2 + 0.5)
+    cy = np.where(first, j1, j2 + 0.5)
+    # Cell key on a half-integer grid
+    keys = (2 * cx).astype(np.int64) * (4 * ny + 8) + (2 * cy).astype(np.int64)
+    uniq, inverse, counts = np.unique(keys, return_index=False, return_inverse=True, return_counts=True)
+    centres_x = np.zeros(len(uniq))
+    centres_y = np.zeros(len(uniq))
+    centres_x[inverse] = cx
+    centres_y[inverse] = cy
+    return pd.DataFrame({
+        'x': xmin + centres_x * sx,
+        'y': ymin + centres_y * sy,
+        'count': counts,
+    })
+
+
+def downsample_scatter(df, x, y, width_px=DEFAULT_WIDTH_PX, max_points=MAX_SCATTER_POINTS):
+    """
+    (frame, binned): df itself when small enough, otherwise hexbin cells
+    with columns x, y, count sized to the chart width.
+    """
+    if len(df) <= max_points:
+        return df, False
+    return hexbin(df[x].to_numpy(), df[y].to_numpy(), hex_gridsize(width_px)), True
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _figure_cost(build):
+    """(seconds, payload bytes) to build a Plotly figure and serialize it as Streamlit does."""
+    start = time.perf_counter()
+    fig = build()
+    payload = fig.to_json()
+    return time.perf_counter() - start, len(payload.encode())
+
+
+def benchmark(points=1_000_000, width_px=DEFAULT_WIDTH_PX, seed=42):
+    """
+    Payload size and server-side render time (figure build + JSON) for a
+    `points`-long line and scatter, raw vs downsampled.
+    """
+    import plotly.graph_objects as go
+
+    rng = np.random.default_rng(seed)
+    t = pd.date_range("2024-01-01", periods=points, freq="min")
+    series = np.cumsum(rng.normal(0, 1, points)) + 10 * np.sin(np.arange(points) / 5000)
+    series[points // 3] += 400  # an isolated spike that must survive
+    line = pd.DataFrame({'t': t, 'value': series})
+    scatter = pd.DataFrame({'factor': rng.gamma(2.0, 3.0, points),
+                            'transactions': rng.normal(500, 80, points)})
+    results = {}
+
+    results['line.raw'] = _figure_cost(lambda: go.Figure(go.Scattergl(x=line['t'], y=line['value'], mode='lines')))
+    start = time.perf_counter()
+    small = downsample_line(line, 't', 'value', width_px)
+    reduce_s = time.perf_counter() - start
+    secs, size = _figure_cost(lambda: go.Figure(go.Scatter(x=small['t'], y=small['value'], mode='lines')))
+    results['line.lttb'] = (reduce_s + secs, size)
+    peak_kept = bool(small['value'].max() == line['value'].max())
+
+    results['scatter.raw'] = _figure_cost(lambda: go.Figure(go.Scattergl(
+        x=scatter['factor'], y=scatter['transactions'], mode='markers')))
+    start = time.perf_counter()
+    cells, _ = downsample_scatter(scatter, 'factor', 'transactions', width_px)
+    reduce_s = time.perf_counter() - start
+    secs, size = _figure_cost(lambda: go.Figure(go.Scatter(
+        x=cells['x'], y=cells['y'], mode='markers',
+        marker=dict(symbol='hexagon', color=cells['count'], size=HEX_SIZE_PX))))
+    results['scatter.hexbin'] = (reduce_s + secs, size)
+
+    return {
+        'points': points,
+        'width_px': width_px,
+        'line_points_kept': int(len(small)),
+        'hex_cells': int(len(cells)),
+        'peak_kept': peak_kept,
+        'results': {k: {'seconds': round(s, 4), 'payload_kb': round(b / 1024, 1)} for k, (s, b) in results.items()},
+    }
+
+
+def print_benchmark(report):
+    print(f"{report['points']:,} points, {report['width_px']} px chart: "
+          f"LTTB keeps {report['line_points_kept']:,} points (peak kept: {report['peak_kept']}), "
+          f"hexbin {report['hex_cells']:,} cells")
+    print(f"  {'chart':<16} {'render (s)':>11} {'payload (KB)':>14}")
+    for name, r in report['results'].items():
+        print(f"  {name:<16} {r['seconds']:>11.3f} {r['payload_kb']:>14,.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Downsampling benchmark")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH_PX, help="Chart width in pixels")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args(argv)
+    report = benchmark(args.points, args.width)
+    print_benchmark(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
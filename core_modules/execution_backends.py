@@ -0,0 +1,860 @@
+"""
+Execution Backends
+==================
+One interface for the engine's analytical operations, with a DuckDB (SQL) and
+a Polars (lazy) implementation.
+
+The trip normalization (TLC column -> engine column) lives here once, in
+TRIP_COLUMNS, and is used by both backends and by data_ingestion.
+
+Trips are read from the analysis-ready projection that ingestion writes to
+data_downloads/analysis/{year}/{taxi}/ (only the engine's columns, narrowed
+types, see ANALYSIS_*) whenever it is current for every month of a
+year/taxi stream; otherwise from the raw TLC files. Both sources give the
+same normalized schema: UInt8 VendorID, UInt16 location IDs, microsecond
+timestamps and DOUBLE amounts, plus the DERIVED_COLUMNS (duration,
+momentum, anomaly code, zone flags, calendar keys) that the operations
+filter and group on.
+
+Operations (all return pyarrow Tables):
+- anomalies            flagged trips with duration / speed / rule
+- anomaly_vendors      top vendors by flagged trips
+- revenue              surcharge revenue touching the core zone
+- leakage              per-pickup-zone surcharge compliance into the zone
+- q1_zone_volume       Q1 drop-offs inside the zone for a year
+- momentum             yellow Q1 speed profile by day-of-week / hour
+- regional_volatility  yellow Q1 drop-off volume change 2024 -> 2025
+- daily_transactions   trips per day
+- engagement           monthly surcharge and tip proxy
+
+Selection:
+    ENGINE_BACKEND=duckdb|polars, else cache/backend_choice.json (written by
+    `benchmark_suite.py --backends`), else DuckDB.
+
+Parity:
+    python core_modules/execution_backends.py --parity [--data DIR]
+"""
+
+import os
+import sys
+import json
+import math
+import glob
+import argparse
+from pathlib import Path
+
+import fingerprints
+from lazy_imports import lazy_import, module_available
+
+# Heavy engines load on first use (see lazy_imports.py)
+DUCKDB_AVAILABLE = module_available("duckdb")
+POLARS_AVAILABLE = module_available("polars")
+PYARROW_AVAILABLE = module_available("pyarrow")
+
+if DUCKDB_AVAILABLE:
+    duckdb = lazy_import("duckdb")
+if POLARS_AVAILABLE:
+    pl = lazy_import("polars")
+if PYARROW_AVAILABLE:
+    pa = lazy_import("pyarrow")
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BASE_DIR = Path(__file__).parent.parent
+BACKEND_CHOICE_FILE = BASE_DIR / "cache" / "backend_choice.json"
+DEFAULT_BACKEND = 'duckdb'
+
+TAXI_TYPES = ['yellow', 'green']
+
+# Engine column -> TLC source column, per taxi type. Single source of truth for
+# the normalization shared by ingestion (Polars) and the engine (DuckDB).
+TRIP_COLUMNS = {
+    'yellow': {
+        'VendorID': 'VendorID',
+        'pickup_time': 'tpep_pickup_datetime',
+        'dropoff_time': 'tpep_dropoff_datetime',
+        'pickup_loc': 'PULocationID',
+        'dropoff_loc': 'DOLocationID',
+        'trip_distance': 'trip_distance',
+        'fare': 'fare_amount',
+        'total_amount': 'total_amount',
+        'congestion_surcharge': 'congestion_surcharge',
+    },
+    'green': {
+        'VendorID': 'VendorID',
+        'pickup_time': 'lpep_pickup_datetime',
+        'dropoff_time': 'lpep_dropoff_datetime',
+        'pickup_loc': 'PULocationID',
+        'dropoff_loc': 'DOLocationID',
+        'trip_distance': 'trip_distance',
+        'fare': 'fare_amount',
+        'total_amount': 'total_amount',
+        'congestion_surcharge': 'congestion_surcharge',
+    },
+}
+
+# Analysis-ready projection written at ingest (data_ingestion.build_analysis).
+# Money and distance are stored as fixed-point hundredths (Int32 <col>_x100),
+# which is exact for TLC's two-decimal values and compresses far better than
+# Float64; readers divide by FIXED_POINT_SCALE.
+ANALYSIS_SUBDIR = "analysis"
+ANALYSIS_VERSION = 2
+TAXI_CODES = {'yellow': 1, 'green': 2}
+FIXED_POINT_SCALE = 100
+FIXED_POINT_COLUMNS = ['trip_distance', 'fare', 'total_amount', 'congestion_surcharge']
+ANALYSIS_ROW_GROUP = 256 * 1024
+
+# Target Region: Core Economic Zone (Manhattan South of 60th St)
+CONGESTION_ZONE_IDS = (
+    4, 12, 13, 24, 41, 42, 43, 45, 48, 50, 68, 74, 75, 87, 88, 90, 100, 103,
+    104, 105, 107, 113, 114, 116, 120, 125, 127, 128, 137, 140, 142, 143, 144,
+    148, 151, 152, 153, 158, 161, 162, 163, 164, 166, 170, 186, 194, 202, 209,
+    211, 212, 213, 214, 216, 217, 224, 229, 230, 231, 232, 233, 234, 235, 236,
+    237, 238, 239, 240, 241, 242, 243, 244, 245, 246, 249, 250
+)
+
+# Anomaly Thresholds
+ANOMALY_SPEED_LIMIT = 65.0  # Momentum Index
+ANOMALY_TIME_DELTA = 1.0  # Minutes
+ANOMALY_VALUE = 20.0  # Value
+ANOMALY_DIST = 0.0  # Distance
+
+ANOMALY_FLAGS = {1: 'Impossible Physics', 2: 'Value Mismatch', 3: 'Stationary Transaction'}
+
+# Normalized trip columns, and the per-trip values derived from them once at
+# ingest (stored in the projection; computed on the fly for raw files):
+# duration in date_diff minutes, momentum index (speed with the duration
+# clamped to >= 1 min), anomaly rule code (ANOMALY_FLAGS, 0 = none),
+# core-zone membership and calendar keys of the pickup / drop-off.
+BASE_COLUMNS = ['VendorID', 'type', 'pickup_time', 'dropoff_time', 'pickup_loc', 'dropoff_loc',
+                'trip_distance', 'fare', 'total_amount', 'congestion_surcharge']
+DERIVED_COLUMNS = ['duration_min', 'momentum', 'anomaly_code', 'pickup_in_zone', 'dropoff_in_zone',
+                   'pickup_hour', 'pickup_dow', 'pickup_month', 'dropoff_month', 'pickup_date']
+
+# Trips that count towards average momentum
+MOMENTUM_VALID = "duration_min > 1 AND trip_distance > 0.1 AND momentum < 100"
+
+SURCHARGE_START = '2025-01-05'
+LEAKAGE_MIN_TRIPS = 100
+LEAKAGE_TOP_N = 20
+
+# Row order of Parquet exports: a time-ordered audit lets readers (the
+# dashboard's anomaly explorer) skip row groups on pickup_time
+EXPORT_ORDER = {
+    'anomalies': 'pickup_time',
+}
+
+# Sort keys used to compare backend outputs row-for-row
+RESULT_KEYS = {
+    'anomalies': ['pickup_time', 'dropoff_time', 'pickup_loc', 'dropoff_loc', 'fare', 'type'],
+    'anomaly_vendors': ['VendorID'],
+    'revenue': [],
+    'leakage': ['pickup_loc'],
+    'q1_zone_volume': [],
+    'momentum': ['dow', 'hour'],
+    'regional_volatility': ['location_id'],
+    'daily_transactions': ['date'],
+    'engagement': ['month'],
+}
+
+
+def rename_map(taxi_type):
+    """TLC source column -> engine column for a taxi type."""
+    return {src: dst for dst, src in TRIP_COLUMNS[taxi_type].items()}
+
+
+def _sql_path(path):
+    return str(path).replace('\\', '/')
+
+
+def analysis_path(data_dir, raw_path):
+    """Projection file for a raw monthly file: analysis/{year}/{taxi}/<same name>."""
+    raw_path = Path(raw_path)
+    return Path(data_dir) / ANALYSIS_SUBDIR / raw_path.parent.parent.name / raw_path.parent.name / raw_path.name
+
+
+def analysis_fingerprint(raw_path):
+    """
+    What a projection file was built from: the raw file's stat, the layout
+    version, and the zone / threshold settings baked into the derived columns.
+    """
+    settings = {'analysis': ANALYSIS_VERSION, 'zones': CONGESTION_ZONE_IDS,
+                'anomaly': [ANOMALY_SPEED_LIMIT, ANOMALY_TIME_DELTA, ANOMALY_VALUE, ANOMALY_DIST]}
+    return fingerprints.value_digest(fingerprints.file_stat(raw_path), extra=settings)
+
+
+def analysis_current(data_dir, raw_path):
+    return fingerprints.artifact_current(str(analysis_path(data_dir, raw_path)), analysis_fingerprint(raw_path))
+
+
+def in_zones_sql(col, zones=CONGESTION_ZONE_IDS):
+    """SQL zone-membership test; a typed list probe is much faster than IN (...) on USMALLINT."""
+    return f"list_contains([{', '.join(map(str, zones))}]::USMALLINT[], {col})"
+
+
+def _arrow(result):
+    """DuckDB result -> pyarrow.Table across DuckDB versions."""
+    if hasattr(result, 'to_arrow_table'):
+        return result.to_arrow_table()
+    return result.fetch_arrow_table()
+
+
+# ============================================================================
+# BACKEND INTERFACE
+# ============================================================================
+
+class AnalyticsBackend:
+    """
+    Base class: subclasses implement `_build(op, **params)` returning a
+    backend-native plan (SQL string or LazyFrame), plus `fetch` / `export_csv`.
+    """
+
+    name = None
+
+    def __init__(self, data_dir, monitor=None, use_analysis=True):
+        self.data_dir = Path(data_dir)
+        self.monitor = monitor
+        self.use_analysis = use_analysis
+
+    def trip_files(self, year, taxi_type):
+        return sorted(glob.glob(str(self.data_dir / str(year) / taxi_type / "*.parquet")))
+
+    def uses_analysis(self, year, taxi_type):
+        """True if every raw month of the stream has a current analysis projection."""
+        if not self.use_analysis:
+            return False
+        files = self.trip_files(year, taxi_type)
+        return bool(files) and all(analysis_current(self.data_dir, f) for f in files)
+
+    def fetch(self, op, **params):
+        """Runs an operation and returns a pyarrow Table."""
+        raise NotImplementedError
+
+    def export_csv(self, op, path, **params):
+        """Runs an operation and writes it to CSV (with header)."""
+        raise NotImplementedError
+
+    def export_parquet(self, op, path, **params):
+        """Runs an operation and writes it to Parquet (zstd)."""
+        raise NotImplementedError
+
+    def scalar(self, op, **params):
+        """First value of a single-row operation (0 if empty / NULL)."""
+        table = self.fetch(op, **params)
+        if table.num_rows == 0:
+            return 0
+        value = table.column(0)[0].as_py()
+        return value if value is not None else 0
+
+    def close(self):
+        pass
+
+
+# ============================================================================
+# DUCKDB BACKEND
+# ============================================================================
+
+class DuckDBBackend(AnalyticsBackend):
+    """SQL implementation; runs on the engine's DuckDB connection."""
+
+    name = 'duckdb'
+
+    def __init__(self, data_dir, conn=None, monitor=None, use_analysis=True):
+        super().__init__(data_dir, monitor, use_analysis)
+        self._owns_conn = conn is None
+        self.conn = conn if conn is not None else duckdb.connect(database=':memory:')
+
+    def _execute(self, name, sql):
+        if self.monitor is None:
+            return self.conn.execute(sql)
+        return self.monitor.query(name, sql, conn=self.conn)
+
+    # --- Sources ---
+
+    @staticmethod
+    def derived_sql():
+        """The DERIVED_COLUMNS computed from the normalized columns (raw-file path)."""
+        duration = "date_diff('minute', pickup_time, dropoff_time)"
+        speed_check = f"(trip_distance / (GREATEST({duration}, 0.1) / 60.0))"
+        return f"""
+                CAST({duration} AS INTEGER) as duration_min,
+                CAST(trip_distance / (GREATEST({duration}, 1) / 60.0) AS FLOAT) as momentum,
+                CAST(CASE
+                    WHEN {speed_check} > {ANOMALY_SPEED_LIMIT} THEN 1
+                    WHEN {duration} < {ANOMALY_TIME_DELTA} AND fare > {ANOMALY_VALUE} THEN 2
+                    WHEN trip_distance = {ANOMALY_DIST} AND fare > 0 THEN 3
+                    ELSE 0
+                END AS UTINYINT) as anomaly_code,
+                {in_zones_sql('pickup_loc')} as pickup_in_zone,
+                {in_zones_sql('dropoff_loc')} as dropoff_in_zone,
+                CAST(hour(pickup_time) AS UTINYINT) as pickup_hour,
+                CAST(dayofweek(pickup_time) AS UTINYINT) as pickup_dow,
+                CAST(month(pickup_time) AS UTINYINT) as pickup_month,
+                CAST(month(dropoff_time) AS UTINYINT) as dropoff_month,
+                CAST(pickup_time AS DATE) as pickup_date"""
+
+    def source_sql(self, taxi, src, projected):
+        """Normalized select (plus DERIVED_COLUMNS) of one taxi type's files matching `src`."""
+        if projected:
+            amounts = ",\n                ".join(
+                f"CAST({c}_x100 AS DOUBLE) / {FIXED_POINT_SCALE} as {c}" for c in FIXED_POINT_COLUMNS)
+            return f"""
+            SELECT
+                VendorID,
+                '{taxi}' as type,
+                pickup_time,
+                dropoff_time,
+                pickup_loc,
+                dropoff_loc,
+                {amounts},
+                {', '.join(DERIVED_COLUMNS)}
+            FROM read_parquet('{_sql_path(src)}')"""
+        cols = TRIP_COLUMNS[taxi]
+        return f"""
+            SELECT *, {self.derived_sql()}
+            FROM (
+                SELECT
+                    CAST({cols['VendorID']} AS UTINYINT) as VendorID,
+                    '{taxi}' as type,
+                    CAST({cols['pickup_time']} AS TIMESTAMP) as pickup_time,
+                    CAST({cols['dropoff_time']} AS TIMESTAMP) as dropoff_time,
+                    CAST({cols['pickup_loc']} AS USMALLINT) as pickup_loc,
+                    CAST({cols['dropoff_loc']} AS USMALLINT) as dropoff_loc,
+                    CAST({cols['trip_distance']} AS DOUBLE) as trip_distance,
+                    CAST({cols['fare']} AS DOUBLE) as fare,
+                    CAST({cols['total_amount']} AS DOUBLE) as total_amount,
+                    CAST(COALESCE({cols['congestion_surcharge']}, 0) AS DOUBLE) as congestion_surcharge
+                FROM read_parquet('{_sql_path(src)}', union_by_name=True)
+            )"""
+
+    def trips_sql(self, year, taxi_types=TAXI_TYPES):
+        """UNION ALL of normalized per-taxi selects (plus DERIVED_COLUMNS) for a year."""
+        parts = []
+        for taxi in taxi_types:
+            if self.uses_analysis(year, taxi):
+                parts.append(self.source_sql(taxi, self.data_dir / ANALYSIS_SUBDIR / f"{year}/{taxi}/*.parquet", True))
+            else:
+                parts.append(self.source_sql(taxi, self.data_dir / f"{year}/{taxi}/*.parquet", False))
+        return "\nUNION ALL\n".join(parts)
+
+    def month_sql(self, raw_path, taxi):
+        """Trips of one raw monthly file, from its projection when that is current."""
+        if self.use_analysis and analysis_current(self.data_dir, raw_path):
+            return self.source_sql(taxi, analysis_path(self.data_dir, raw_path), True)
+        return self.source_sql(taxi, raw_path, False)
+
+    def register_trips(self, year):
+        """Creates the all_trips_{year} view used by the engine's queries."""
+        view = f"all_trips_{year}"
+        self._execute(f"create_view_{year}", f"CREATE OR REPLACE VIEW {view} AS {self.trips_sql(year)}")
+        return view
+
+    # --- Operations ---
+
+    def _build(self, op, year=2025, start_date=SURCHARGE_START):
+        # Durations, speeds, zone membership and calendar keys are columns of
+        # the trip source (DERIVED_COLUMNS), so every operation is a filtered
+        # aggregate over them.
+        trips = f"({self.trips_sql(year)})"
+
+        if op == 'anomalies':
+            flags = "\n                    ".join(f"WHEN {code} THEN '{label}'" for code, label in ANOMALY_FLAGS.items())
+            return f"""
+            SELECT
+                {', '.join(BASE_COLUMNS)},
+                duration_min,
+                CASE
+                    WHEN duration_min <= 0 THEN 0
+                    ELSE (trip_distance / (duration_min / 60.0))
+                END as speed_mph,
+                CASE anomaly_code
+                    {flags}
+                    ELSE 'OK'
+                END as anomaly_flag
+            FROM {trips}
+            WHERE anomaly_code > 0"""
+
+        if op == 'anomaly_vendors':
+            return f"""
+            SELECT VendorID, COUNT(*) as anomaly_count
+            FROM {trips}
+            WHERE anomaly_code > 0
+            GROUP BY VendorID
+            ORDER BY anomaly_count DESC, VendorID
+            LIMIT 5"""
+
+        if op == 'revenue':
+            return f"""
+            SELECT SUM(congestion_surcharge) as revenue
+            FROM {trips}
+            WHERE pickup_time >= '{start_date}'
+              AND (pickup_in_zone OR dropoff_in_zone)"""
+
+        if op == 'leakage':
+            compliant = "COUNT(*) FILTER (WHERE congestion_surcharge > 0)"
+            return f"""
+            SELECT
+                pickup_loc,
+                COUNT(*) as total_trans,
+                {compliant} as compliant_trans,
+                CAST({compliant} AS FLOAT) / COUNT(*) as compliance_rate,
+                1.0 - (CAST({compliant} AS FLOAT) / COUNT(*)) as leakage_rate
+            FROM {trips}
+            WHERE pickup_time >= '{start_date}'
+              AND NOT pickup_in_zone
+              AND dropoff_in_zone
+            GROUP BY pickup_loc
+            HAVING COUNT(*) > {LEAKAGE_MIN_TRIPS}
+            ORDER BY leakage_rate DESC, pickup_loc
+            LIMIT {LEAKAGE_TOP_N}"""
+
+        if op == 'q1_zone_volume':
+            return f"""
+            SELECT COUNT(*) as volume
+            FROM {trips}
+            WHERE dropoff_month IN (1, 2, 3)
+              AND dropoff_time >= '{year}-01-01' AND dropoff_time < '{year}-04-01'
+              AND dropoff_in_zone"""
+
+        if op == 'momentum':
+            yellow = f"({self.trips_sql(year, ['yellow'])})"
+            return f"""
+            SELECT
+                pickup_dow as dow,
+                pickup_hour as hour,
+                AVG(momentum) as avg_momentum
+            FROM {yellow}
+            WHERE pickup_month IN (1, 2, 3)
+              AND dropoff_in_zone
+              AND {MOMENTUM_VALID}
+            GROUP BY 1, 2"""
+
+        if op == 'regional_volatility':
+            y24 = f"({self.trips_sql(2024, ['yellow'])})"
+            y25 = f"({self.trips_sql(2025, ['yellow'])})"
+            return f"""
+            WITH q1_2024 AS (
+                SELECT dropoff_loc as loc, COUNT(*) as cnt
+                FROM {y24}
+                WHERE dropoff_month IN (1,2,3)
+                GROUP BY 1
+            ),
+            q1_2025 AS (
+                SELECT dropoff_loc as loc, COUNT(*) as cnt
+                FROM {y25}
+                WHERE dropoff_month IN (1,2,3)
+                GROUP BY 1
+            )
+            SELECT
+                COALESCE(a.loc, b.loc) as location_id,
+                COALESCE(a.cnt, 0) as count_2024,
+                COALESCE(b.cnt, 0) as count_2025,
+                (COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0)) as diff,
+                CASE WHEN COALESCE(a.cnt, 0) > 0
+                     THEN (COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0)) * 100.0 / a.cnt
+                     ELSE 0 END as pct_change
+            FROM q1_2024 a
+            FULL OUTER JOIN q1_2025 b ON a.loc = b.loc"""
+
+        if op == 'daily_transactions':
+            return f"""
+            SELECT
+                pickup_date as date,
+                COUNT(*) as transactions
+            FROM {trips}
+            GROUP BY 1
+            ORDER BY 1"""
+
+        if op == 'engagement':
+            return f"""
+            SELECT
+                pickup_month as month,
+                AVG(congestion_surcharge) as avg_fee,
+                AVG(CASE WHEN fare > 0 THEN (total_amount - fare)/fare ELSE 0 END) * 100 as avg_engagement_score
+            FROM {trips}
+            GROUP BY 1
+            ORDER BY 1"""
+
+        raise ValueError(f"Unknown operation: {op}")
+
+    @staticmethod
+    def _label(op, params):
+        """Per-query metrics name: the operation and its year (momentum_2024)."""
+        return f"{op}_{params['year']}" if 'year' in params else op
+
+    def fetch(self, op, **params):
+        return _arrow(self._execute(self._label(op, params), self._build(op, **params)))
+
+    def export_csv(self, op, path, **params):
+        sql = self._build(op, **params)
+        self._execute(self._label(op, params), f"COPY ({sql}) TO '{_sql_path(path)}' (HEADER, FORMAT CSV)")
+
+    def export_parquet(self, op, path, **params):
+        sql = self._build(op, **params)
+        if op in EXPORT_ORDER:
+            sql = f"SELECT * FROM ({sql}) ORDER BY {EXPORT_ORDER[op]}"
+        self._execute(self._label(op, params), f"COPY ({sql}) TO '{_sql_path(path)}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+
+    def close(self):
+        if self._owns_conn:
+            self.conn.close()
+
+
+# ============================================================================
+# POLARS BACKEND
+# ============================================================================
+
+def derived_columns_pl():
+    """
+    Polars expressions for DERIVED_COLUMNS over the normalized columns. Used by
+    the Polars backend on raw files and by ingestion to write the projection.
+    """
+    # DuckDB date_diff('minute') counts minute boundaries crossed, not elapsed time
+    duration = (pl.col('dropoff_time').dt.truncate('1m') - pl.col('pickup_time').dt.truncate('1m')).dt.total_minutes()
+    distance, fare = pl.col('trip_distance'), pl.col('fare')
+    speed_check = distance / (pl.max_horizontal(duration, pl.lit(0.1)) / 60.0)
+    zones = list(CONGESTION_ZONE_IDS)
+    return [
+        duration.cast(pl.Int32).alias('duration_min'),
+        (distance / (pl.max_horizontal(duration, pl.lit(1)) / 60.0)).cast(pl.Float32).alias('momentum'),
+        pl.when(speed_check > ANOMALY_SPEED_LIMIT).then(1)
+          .when((duration < ANOMALY_TIME_DELTA) & (fare > ANOMALY_VALUE)).then(2)
+          .when((distance == ANOMALY_DIST) & (fare > 0)).then(3)
+          .otherwise(0).cast(pl.UInt8).alias('anomaly_code'),
+        pl.col('pickup_loc').is_in(zones).alias('pickup_in_zone'),
+        pl.col('dropoff_loc').is_in(zones).alias('dropoff_in_zone'),
+        pl.col('pickup_time').dt.hour().cast(pl.UInt8).alias('pickup_hour'),
+        # DuckDB dayofweek: Sunday = 0 ... Saturday = 6
+        (pl.col('pickup_time').dt.weekday() % 7).cast(pl.UInt8).alias('pickup_dow'),
+        pl.col('pickup_time').dt.month().cast(pl.UInt8).alias('pickup_month'),
+        pl.col('dropoff_time').dt.month().cast(pl.UInt8).alias('dropoff_month'),
+        pl.col('pickup_time').dt.date().alias('pickup_date'),
+    ]
+
+
+class PolarsBackend(AnalyticsBackend):
+    """Lazy Polars implementation mirroring the DuckDB SQL semantics."""
+
+    name = 'polars'
+
+    def trips(self, year, taxi_types=TAXI_TYPES):
+        """
+        Normalized LazyFrame with DERIVED_COLUMNS; raw files are scanned one
+        by one to absorb schema drift.
+        """
+        frames = []
+        for taxi in taxi_types:
+            if self.uses_analysis(year, taxi):
+                src = str(self.data_dir / ANALYSIS_SUBDIR / str(year) / taxi / "*.parquet")
+                frames.append(pl.scan_parquet(src).select([
+                    pl.col('VendorID'),
+                    pl.lit(taxi).alias('type'),
+                    pl.col('pickup_time'),
+                    pl.col('dropoff_time'),
+                    pl.col('pickup_loc'),
+                    pl.col('dropoff_loc'),
+                    *[(pl.col(f"{c}_x100").cast(pl.Float64) / FIXED_POINT_SCALE).alias(c) for c in FIXED_POINT_COLUMNS],
+                    *[pl.col(c) for c in DERIVED_COLUMNS],
+                ]))
+                continue
+            cols = TRIP_COLUMNS[taxi]
+            for path in self.trip_files(year, taxi):
+                lf = pl.scan_parquet(path)
+                names = lf.collect_schema().names()
+                surcharge = (
+                    pl.col(cols['congestion_surcharge']).cast(pl.Float64).fill_null(0.0)
+                    if cols['congestion_surcharge'] in names else pl.lit(0.0)
+                )
+                frames.append(lf.select([
+                    pl.col(cols['VendorID']).cast(pl.UInt8).alias('VendorID'),
+                    pl.lit(taxi).alias('type'),
+                    pl.col(cols['pickup_time']).cast(pl.Datetime('us')).alias('pickup_time'),
+                    pl.col(cols['dropoff_time']).cast(pl.Datetime('us')).alias('dropoff_time'),
+                    pl.col(cols['pickup_loc']).cast(pl.UInt16).alias('pickup_loc'),
+                    pl.col(cols['dropoff_loc']).cast(pl.UInt16).alias('dropoff_loc'),
+                    pl.col(cols['trip_distance']).cast(pl.Float64).alias('trip_distance'),
+                    pl.col(cols['fare']).cast(pl.Float64).alias('fare'),
+                    pl.col(cols['total_amount']).cast(pl.Float64).alias('total_amount'),
+                    surcharge.alias('congestion_surcharge'),
+                ]).with_columns(derived_columns_pl()))
+        if not frames:
+            raise FileNotFoundError(f"No trip files for {year} {list(taxi_types)} under {self.data_dir}")
+        return pl.concat(frames, rechunk=False)
+
+    def _build(self, op, year=2025, start_date=SURCHARGE_START):
+        start = pl.lit(start_date).str.to_datetime('%Y-%m-%d', time_unit='us')
+        anomalous = pl.col('anomaly_code') > 0
+
+        if op == 'anomalies':
+            duration = pl.col('duration_min')
+            flag = pl.lit('OK')
+            for code, label in reversed(list(ANOMALY_FLAGS.items())):
+                flag = pl.when(pl.col('anomaly_code') == code).then(pl.lit(label)).otherwise(flag)
+            return (
+                self.trips(year)
+                .filter(anomalous)
+                .select(
+                    *BASE_COLUMNS,
+                    duration,
+                    pl.when(duration <= 0).then(0.0)
+                      .otherwise(pl.col('trip_distance') / (duration / 60.0)).alias('speed_mph'),
+                    flag.alias('anomaly_flag'),
+                )
+            )
+
+        if op == 'anomaly_vendors':
+            return (
+                self.trips(year)
+                .filter(anomalous)
+                .group_by('VendorID')
+                .agg(pl.len().cast(pl.Int64).alias('anomaly_count'))
+                .sort(['anomaly_count', 'VendorID'], descending=[True, False])
+                .head(5)
+            )
+
+        if op == 'revenue':
+            return (
+                self.trips(year)
+                .filter((pl.col('pickup_time') >= start) & (pl.col('pickup_in_zone') | pl.col('dropoff_in_zone')))
+                .select(pl.col('congestion_surcharge').sum().alias('revenue'))
+            )
+
+        if op == 'leakage':
+            compliant = (pl.col('congestion_surcharge') > 0).cast(pl.Int64).sum()
+            return (
+                self.trips(year)
+                .filter((pl.col('pickup_time') >= start) & ~pl.col('pickup_in_zone') & pl.col('dropoff_in_zone'))
+                .group_by('pickup_loc')
+                .agg(
+                    pl.len().cast(pl.Int64).alias('total_trans'),
+                    compliant.alias('compliant_trans'),
+                )
+                .filter(pl.col('total_trans') > LEAKAGE_MIN_TRIPS)
+                .with_columns((pl.col('compliant_trans') / pl.col('total_trans')).alias('compliance_rate'))
+                .with_columns((1.0 - pl.col('compliance_rate')).alias('leakage_rate'))
+                .sort(['leakage_rate', 'pickup_loc'], descending=[True, False])
+                .head(LEAKAGE_TOP_N)
+            )
+
+        if op == 'q1_zone_volume':
+            lo = pl.lit(f"{year}-01-01").str.to_datetime('%Y-%m-%d', time_unit='us')
+            hi = pl.lit(f"{year}-04-01").str.to_datetime('%Y-%m-%d', time_unit='us')
+            return (
+                self.trips(year)
+                .filter(
+                    pl.col('dropoff_month').is_in([1, 2, 3])
+                    & (pl.col('dropoff_time') >= lo) & (pl.col('dropoff_time') < hi)
+                    & pl.col('dropoff_in_zone')
+                )
+                .select(pl.len().cast(pl.Int64).alias('volume'))
+            )
+
+        if op == 'momentum':
+            return (
+                self.trips(year, ['yellow'])
+                .filter(
+                    pl.col('pickup_month').is_in([1, 2, 3])
+                    & pl.col('dropoff_in_zone')
+                    & (pl.col('duration_min') > 1)
+                    & (pl.col('trip_distance') > 0.1)
+                    & (pl.col('momentum') < 100)
+                )
+                .group_by(pl.col('pickup_dow').alias('dow'), pl.col('pickup_hour').alias('hour'))
+                .agg(pl.col('momentum').cast(pl.Float64).mean().alias('avg_momentum'))
+            )
+
+        if op == 'regional_volatility':
+            def q1(y, name):
+                return (
+                    self.trips(y, ['yellow'])
+                    .filter(pl.col('dropoff_month').is_in([1, 2, 3]))
+                    .group_by(pl.col('dropoff_loc').alias('location_id'))
+                    .agg(pl.len().cast(pl.Int64).alias(name))
+                )
+            joined = q1(2024, 'count_2024').join(q1(2025, 'count_2025'), on='location_id', how='full', coalesce=True)
+            return (
+                joined
+                .with_columns(pl.col('count_2024').fill_null(0), pl.col('count_2025').fill_null(0))
+                .with_columns((pl.col('count_2025') - pl.col('count_2024')).alias('diff'))
+                .with_columns(
+                    pl.when(pl.col('count_2024') > 0)
+                      .then(pl.col('diff') * 100.0 / pl.col('count_2024'))
+                      .otherwise(0.0).alias('pct_change')
+                )
+                .select(['location_id', 'count_2024', 'count_2025', 'diff', 'pct_change'])
+            )
+
+        if op == 'daily_transactions':
+            return (
+                self.trips(year)
+                .group_by(pl.col('pickup_date').alias('date'))
+                .agg(pl.len().cast(pl.Int64).alias('transactions'))
+                .sort('date')
+            )
+
+        if op == 'engagement':
+            tip = pl.when(pl.col('fare') > 0).then((pl.col('total_amount') - pl.col('fare')) / pl.col('fare')).otherwise(0.0)
+            return (
+                self.trips(year)
+                .group_by(pl.col('pickup_month').alias('month'))
+                .agg(
+                    pl.col('congestion_surcharge').mean().alias('avg_fee'),
+                    (tip.mean() * 100).alias('avg_engagement_score'),
+                )
+                .sort('month')
+            )
+
+        raise ValueError(f"Unknown operation: {op}")
+
+    def fetch(self, op, **params):
+        return self._build(op, **params).collect().to_arrow()
+
+    def export_csv(self, op, path, **params):
+        lf = self._build(op, **params)
+        if op == 'anomalies':
+            # Row-level output can be large: stream it instead of collecting
+            lf.sink_csv(str(path))
+        else:
+            lf.collect().write_csv(str(path))
+
+    def export_parquet(self, op, path, **params):
+        lf = self._build(op, **params)
+        if op in EXPORT_ORDER:
+            lf = lf.sort(EXPORT_ORDER[op])
+        lf.sink_parquet(str(path), compression='zstd')
+
+
+# ============================================================================
+# SELECTION
+# ============================================================================
+
+BACKENDS = {
+    'duckdb': DuckDBBackend,
+    'polars': PolarsBackend,
+}
+
+
+def preferred_backend():
+    """ENGINE_BACKEND env var, else the benchmarked choice, else DuckDB."""
+    name = os.environ.get("ENGINE_BACKEND")
+    if name:
+        return name.lower()
+    if BACKEND_CHOICE_FILE.exists():
+        try:
+            with open(BACKEND_CHOICE_FILE) as f:
+                return json.load(f).get('backend', DEFAULT_BACKEND)
+        except (OSError, ValueError):
+            pass
+    return DEFAULT_BACKEND
+
+
+def get_backend(data_dir, name=None, conn=None, monitor=None, use_analysis=True):
+    """Instantiates a backend by name (see preferred_backend)."""
+    name = (name or preferred_backend()).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose from {sorted(BACKENDS)}")
+    if name == 'duckdb':
+        if not DUCKDB_AVAILABLE:
+            raise ImportError("DuckDB backend requested but duckdb is not installed")
+        return DuckDBBackend(data_dir, conn=conn, monitor=monitor, use_analysis=use_analysis)
+    if not POLARS_AVAILABLE:
+        raise ImportError("Polars backend requested but polars is not installed")
+    return PolarsBackend(data_dir, monitor=monitor, use_analysis=use_analysis)
+
+
+# ============================================================================
+# PARITY
+# ============================================================================
+
+def _normalize(table, keys):
+    """Sorts by keys and casts to plain Python rows for comparison."""
+    rows = table.to_pylist()
+    if keys:
+        rows.sort(key=lambda r: tuple((v is None, v) for v in (r.get(k) for k in keys)))
+    return rows
+
+
+def _values_match(a, b, rel_tol):
+    if isinstance(a, float) or isinstance(b, float):
+        if a is None or b is None:
+            return a is b
+        if math.isnan(a) and math.isnan(b):
+            return True
+        return math.isclose(a, b, rel_tol=rel_tol, abs_tol=1e-9)
+    return a == b
+
+
+def compare_tables(left, right, keys, rel_tol=1e-6):
+    """Returns a list of human-readable differences (empty when identical)."""
+    diffs = []
+    if left.column_names != right.column_names:
+        diffs.append(f"columns differ: {left.column_names} vs {right.column_names}")
+        return diffs
+    if left.num_rows != right.num_rows:
+        diffs.append(f"row count differs: {left.num_rows} vs {right.num_rows}")
+        return diffs
+    for i, (lr, rr) in enumerate(zip(_normalize(left, keys), _normalize(right, keys))):
+        for col in left.column_names:
+            if not _values_match(lr[col], rr[col], rel_tol):
+                diffs.append(f"row {i} column '{col}': {lr[col]!r} vs {rr[col]!r}")
+                if len(diffs) >= 10:
+                    return diffs
+    return diffs
+
+
+def check_parity(data_dir, ops=None, params=None):
+    """
+    Runs every operation on both backends and compares results.
+    Returns {op: [differences]}; all lists empty means parity holds.
+    """
+    ops = ops or list(RESULT_KEYS)
+    params = params or {}
+    duck = DuckDBBackend(data_dir)
+    polars_backend = PolarsBackend(data_dir)
+    report = {}
+    try:
+        for op in ops:
+            left = duck.fetch(op, **params.get(op, {}))
+            right = polars_backend.fetch(op, **params.get(op, {}))
+            report[op] = compare_tables(left, right, RESULT_KEYS[op])
+    finally:
+        duck.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend parity check.")
+    parser.add_argument("--parity", action="store_true", help="Compare DuckDB and Polars outputs")
+    parser.add_argument("--data", default=None, help="Data directory (default: fresh synthetic data)")
+    parser.add_argument("--scale", type=float, default=0.02, help="Synthetic scale when --data is omitted")
+    args = parser.parse_args(argv)
+
+    if not args.parity:
+        print(f"Preferred backend: {preferred_backend()}")
+        return 0
+
+    data_dir = args.data
+    if data_dir is None:
+        import tempfile
+        import synthetic_data
+        data_dir = tempfile.mkdtemp(prefix="parity_")
+        print(f"Generating synthetic data (scale={args.scale}) in {data_dir}...")
+        synthetic_data.generate_dataset(data_dir, scale=args.scale)
+
+    report = check_parity(data_dir)
+    failed = False
+    for op, diffs in report.items():
+        status = "OK" if not diffs else "MISMATCH"
+        print(f"  {op:<22} {status}")
+        for d in diffs:
+            print(f"      {d}")
+        failed |= bool(diffs)
+
+    print("\nPARITY " + ("FAILED" if failed else "PASSED"))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
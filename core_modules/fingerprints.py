@@ -0,0 +1,106 @@
+"""
+File Fingerprints
+=================
+Cheap change detection for pipeline inputs and cached artifacts.
+
+- stat fingerprint: (size, mtime_ns) per file, hashed together. Costs one
+  stat() call per file, so it is safe to use on multi-GB trees.
+- content digest: SHA-256 of file bytes, for when "byte-identical" matters
+  more than speed (small inputs such as JSON stats).
+- artifact sidecars: a generator stores the fingerprint of what it rendered
+  from (inputs + template version) in a hidden .<name>.fingerprint file
+  next to the artifact, and skips the rebuild while it still matches.
+"""
+
+import os
+import glob
+import json
+import hashlib
+from pathlib import Path
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def expand(patterns, base_dir=None, exclude=()):
+    """
+    Expands paths / glob patterns (relative to base_dir) to sorted existing
+    files, minus anything matched by the exclude patterns.
+    """
+    def matches(patterns):
+        files = set()
+        for pattern in patterns:
+            pattern = str(Path(base_dir) / pattern) if base_dir is not None else str(pattern)
+            if glob.has_magic(pattern):
+                files.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+            elif os.path.isfile(pattern):
+                files.add(pattern)
+        return files
+    return sorted(matches(patterns) - matches(exclude))
+
+
+def file_stat(path):
+    """(size, mtime_ns) for a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def stat_fingerprint(patterns, base_dir=None, extra=None, exclude=()):
+    """
+    Hash of (path, size, mtime_ns) for every file matched by patterns (and
+    not by exclude). `extra` (any JSON-serializable value) is folded in,
+    e.g. a template version.
+    """
+    h = hashlib.sha256()
+    for path in expand(patterns, base_dir, exclude):
+        st = file_stat(path)
+        h.update(f"{path}|{st[0]}|{st[1]}\n".encode())
+    if extra is not None:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def content_digest(patterns, base_dir=None, extra=None):
+    """SHA-256 over the bytes of every matched file (names included)."""
+    h = hashlib.sha256()
+    for path in expand(patterns, base_dir):
+        h.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+    if extra is not None:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def value_digest(value, extra=None):
+    """SHA-256 of a JSON-serializable value (already-loaded inputs)."""
+    h = hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode())
+    if extra is not None:
+        h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def sidecar_path(artifact):
+    """Where the fingerprint of an artifact is kept: .<name>.fingerprint beside it."""
+    folder, name = os.path.split(str(artifact))
+    return os.path.join(folder, f".{name}.fingerprint")
+
+
+def artifact_current(artifact, fingerprint):
+    """True if the artifact exists and was built from inputs with this fingerprint."""
+    if not os.path.exists(artifact):
+        return False
+    try:
+        with open(sidecar_path(artifact)) as f:
+            return f.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+def record_artifact(artifact, fingerprint):
+    """Stores the fingerprint of a freshly written artifact."""
+    with open(sidecar_path(artifact), "w") as f:
+        f.write(fingerprint + "\n")
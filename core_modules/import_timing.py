@@ -0,0 +1,162 @@
+"""
+Import-Time Benchmark
+=====================
+Guards cold-start latency of the toolkit entry points.
+
+Each module is imported in a fresh interpreter under `python -X importtime`;
+the stderr trace is parsed into per-package self/cumulative times. The
+module's own cumulative time is the cold-start cost, and the heaviest
+dependencies are listed so regressions (an eager pandas import creeping back
+in) are easy to spot.
+
+Usage:
+    python core_modules/import_timing.py [--budget-ms 300] [--top 8]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+
+CORE_DIR = Path(__file__).parent
+
+# Entry points whose import must stay cheap
+ENTRY_MODULES = [
+    "toolkit_cli",
+    "system_check",
+    "content_generator",
+    "report_builder",
+    "data_ingestion",
+    "processing_engine",
+    "execution_backends",
+    "pipeline_runner",
+]
+
+DEFAULT_BUDGET_MS = 300
+
+
+def parse_importtime(stderr):
+    """
+    Parses `-X importtime` output into a list of
+    {'module', 'self_us', 'cumulative_us', 'depth'} in trace order.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append({
+            'module': name.strip(),
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': depth,
+        })
+    return rows
+
+
+def profile_module(module, repeats=3):
+    """
+    Imports `module` in fresh interpreters and returns the fastest run:
+    {'module', 'cumulative_ms', 'heaviest': [(package, cumulative_ms), ...]}.
+    """
+    env = dict(os.environ, PYTHONPATH=str(CORE_DIR) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    best = None
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=str(CORE_DIR), env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            return {'module': module, 'error': proc.stderr.strip().splitlines()[-1:]}
+        rows = parse_importtime(proc.stderr)
+        own = [i for i, r in enumerate(rows) if r['module'] == module]
+        if not own:
+            continue
+        end = own[-1]
+        total = rows[end]['cumulative_us']
+        if best is None or total < best[0]:
+            # Children are traced before their parent with deeper indentation;
+            # interpreter start-up imports (site, encodings) are not included
+            start = end
+            while start > 0 and rows[start - 1]['depth'] > rows[end]['depth']:
+                start -= 1
+            best = (total, rows[start:end])
+
+    if best is None:
+        return {'module': module, 'error': ['no importtime trace']}
+    total, subtree = best
+    # Top-level packages pulled in directly or indirectly
+    packages = {}
+    for r in subtree:
+        top = r['module'].split(".")[0]
+        if top == module:
+            continue
+        packages[top] = max(packages.get(top, 0), r['cumulative_us'])
+    heaviest = sorted(packages.items(), key=lambda kv: -kv[1])
+    return {
+        'module': module,
+        'cumulative_ms': round(total / 1000, 1),
+        'heaviest': [(name, round(us / 1000, 1)) for name, us in heaviest],
+    }
+
+
+def run(modules=None, repeats=3):
+    results = []
+    for module in modules or ENTRY_MODULES:
+        results.append(profile_module(module, repeats=repeats))
+    return results
+
+
+def print_results(results, budget_ms=None, top=5):
+    print(f"{'module':<22} {'import (ms)':>12}  heaviest dependencies")
+    print("-" * 78)
+    over = []
+    for r in results:
+        if 'error' in r:
+            print(f"{r['module']:<22} {'ERROR':>12}  {' '.join(r['error'])}")
+            over.append(r['module'])
+            continue
+        deps = ", ".join(f"{n} {ms:.0f}" for n, ms in r['heaviest'][:top])
+        flag = ""
+        if budget_ms is not None and r['cumulative_ms'] > budget_ms:
+            flag = "  <-- over budget"
+            over.append(r['module'])
+        print(f"{r['module']:<22} {r['cumulative_ms']:>12.1f}  {deps}{flag}")
+    return over
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import-time benchmark")
+    parser.add_argument("modules", nargs="*", help="Modules to profile (default: entry points)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Heaviest dependencies to list")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Fail if any module's import exceeds this (0 disables)")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args.modules or None, repeats=args.repeats)
+    budget = args.budget_ms or None
+    over = print_results(results, budget_ms=budget, top=args.top)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if over:
+        print(f"\n❌ Import budget ({args.budget_ms:.0f} ms) exceeded: {', '.join(over)}")
+        return 1
+    print("\n✅ All imports within budget" + (f" ({args.budget_ms:.0f} ms)" if budget else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
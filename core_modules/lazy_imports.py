@@ -0,0 +1,43 @@
+"""
+Lazy Imports
+============
+Defers loading heavy libraries (Polars, DuckDB, pandas, PyArrow, ReportLab)
+until a module attribute is first used, so `--help`, system_check and
+importing a toolkit module for one helper do not pay for the whole stack.
+
+- lazy_import(name): module placeholder backed by importlib's LazyLoader.
+  The real import runs on first attribute access.
+- module_available(name): cheap availability probe (no import), for the
+  *_AVAILABLE flags the modules use to degrade gracefully.
+"""
+
+import sys
+import importlib.util
+
+
+def module_available(name):
+    """True if `name` can be imported. Does not import top-level packages."""
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(name):
+    """
+    Returns `name` as a lazily-loaded module (or the real module if it is
+    already imported). Raises ImportError if the module is not installed.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,380 @@
+"""
+In-Process Pipeline Runner
+==========================
+Runs the toolkit stages inside one Python process instead of launching a
+fresh interpreter per stage.
+
+- Each stage module is imported once (Polars, DuckDB, pandas and ReportLab are
+  loaded a single time).
+- One warm DuckDB connection is shared by every stage that needs it.
+- Engine results are handed to later stages in memory: Arrow tables under
+  context.results['tables'] (by output file stem), which the artifacts and
+  content stages read, plus the market stats dict and correlation text.
+- The same tables are written to output/ as Arrow IPC files that the
+  dashboard and standalone scripts memory-map (arrow_io.py), and that the
+  stages fall back to when the engine was skipped; CSV copies only with
+  ENGINE_CSV=1.
+
+Orchestration:
+- Every Stage declares its inputs, outputs and the stages it depends on.
+- Stages whose dependencies are met run concurrently in a thread pool
+  (report building and content generation only need the engine outputs).
+- A stage is skipped when the stat fingerprint of its inputs matches the
+  last successful run (output/.pipeline_state.json) and its outputs exist.
+  The engine rewrites its outputs on every run, so report and content also
+  check content fingerprints per artifact and keep byte-identical results.
+- A per-stage timing table is printed at the end.
+
+The dashboard is a Streamlit server and stays a separate process; its stage
+only launches it (see run_analysis.py).
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+import fingerprints
+
+BASE_DIR = CORE_DIR.parent
+OUTPUT_DIR = BASE_DIR / "output"
+STATE_FILE = ".pipeline_state.json"
+MAX_PARALLEL_STAGES = 4
+
+
+# ============================================================================
+# CONTEXT
+# ============================================================================
+
+class PipelineContext:
+    """State shared between in-process stages."""
+
+    def __init__(self):
+        self.conn = None
+        self.results = {'tables': {}, 'stats': None, 'correlation_text': None}
+        self.timings = {}
+        self.report = {}
+        self.dashboard = None
+        self.force = False
+
+    def connection(self):
+        """Lazily opens the shared DuckDB connection (engine settings)."""
+        if self.conn is None:
+            import processing_engine
+            self.conn = processing_engine.get_duckdb_conn()
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def stage_ingest(ctx):
+    import data_ingestion
+    return data_ingestion.main()
+
+
+def stage_engine(ctx):
+    import processing_engine
+    return processing_engine.main(conn=ctx.connection(), results=ctx.results)
+
+
+def stage_report(ctx):
+    import report_builder
+    report_builder.generate_pdf(
+        stats=ctx.results['stats'],
+        correlation_text=ctx.results['correlation_text'],
+        force=ctx.force,
+    )
+    return 0
+
+
+def stage_artifacts(ctx):
+    import dashboard_artifacts
+    dashboard_artifacts.build_artifacts(tables=ctx.results['tables'])
+    return 0
+
+
+def stage_content(ctx):
+    import content_generator
+    content_generator.generate_blog_files(force=ctx.force, tables=ctx.results['tables'])
+    return 0
+
+
+def stage_dashboard(ctx):
+    """Starts the Streamlit server in the background; run_analysis waits on it."""
+    print("Press Ctrl+C to stop the dashboard server.")
+    dashboard_path = os.path.join(str(CORE_DIR), "analytics_dashboard.py")
+    # Use python -m streamlit to ensure we use the correct environment
+    ctx.dashboard = subprocess.Popen([sys.executable, "-m", "streamlit", "run", dashboard_path])
+    return 0
+
+
+class Stage:
+    """
+    A pipeline step.
+
+    inputs / outputs are paths or glob patterns relative to the project root;
+    files matched by exclude are left out of the inputs. depends_on names
+    the stages that must succeed (or be skipped as up-to-date) first.
+    always_run stages are never skipped.
+    """
+
+    def __init__(self, name, banner, func, inputs=(), outputs=(), depends_on=(), always_run=False, exclude=()):
+        self.name = name
+        self.banner = banner
+        self.func = func
+        self.inputs = list(inputs)
+        self.exclude = list(exclude)
+        self.outputs = list(outputs)
+        self.depends_on = list(depends_on)
+        self.always_run = always_run
+
+    def input_fingerprint(self):
+        return fingerprints.stat_fingerprint(self.inputs, base_dir=BASE_DIR, exclude=self.exclude)
+
+    def outputs_exist(self):
+        return all(fingerprints.expand([o], base_dir=BASE_DIR) for o in self.outputs)
+
+
+ENGINE_OUTPUTS = [
+    "output/market_stats.json",
+    "output/anomaly_audit.parquet",
+    "output/leakage_report.arrow",
+    "output/regional_volatility.arrow",
+    "output/momentum_2024.arrow",
+    "output/momentum_2025.arrow",
+    "output/daily_transactions_2025.arrow",
+    "output/engagement_metrics.arrow",
+    "output/rollup/*/*/*.parquet",
+]
+
+STAGES = [
+    # Ingestion downloads missing months itself, so it always runs.
+    Stage("ingest", "Ingesting Market Data Streams...", stage_ingest,
+          outputs=["data_downloads/*_unified.csv", "data_downloads/analysis/*/*/*.parquet"], always_run=True),
+    # The engine writes the imputed Dec 2025 months into data_downloads itself,
+    # so they are not inputs; a published Dec 2025 file shows up in the
+    # download manifest instead.
+    Stage("engine", "Running Processing Engine...", stage_engine,
+          inputs=["data_downloads/*/*/*.parquet", "data_downloads/.download_manifest.json",
+                  "cache/external_factors_2025.csv",
+                  "core_modules/processing_engine.py", "core_modules/execution_backends.py",
+                  "core_modules/data_ingestion.py", "core_modules/trip_rollup.py"],
+          exclude=["data_downloads/2025/*/*_tripdata_2025-12.parquet"],
+          outputs=ENGINE_OUTPUTS, depends_on=["ingest"]),
+    Stage("report", "Generating Executive Summary...", stage_report,
+          inputs=["output/market_stats.json", "output/correlation_summary.txt",
+                  "core_modules/report_builder.py"],
+          outputs=["output/market_summary.pdf"], depends_on=["engine"]),
+    Stage("artifacts", "Precomputing Dashboard Artifacts...", stage_artifacts,
+          inputs=["output/momentum_2024.arrow", "output/momentum_2025.arrow",
+                  "output/daily_transactions_2025.arrow", "cache/external_factors_2025.csv",
+                  "core_modules/dashboard_artifacts.py"],
+          outputs=["output/dashboard/momentum_heatmaps.json", "output/dashboard/factors_merged.parquet",
+                   "output/dashboard/factors_trendline.json"],
+          depends_on=["engine"]),
+    Stage("content", "Generating Content Assets...", stage_content,
+          inputs=["output/market_stats.json", "output/correlation_summary.txt",
+                  "output/momentum_2024.arrow", "output/momentum_2025.arrow",
+                  "output/engagement_metrics.arrow", "output/daily_transactions_2025.arrow",
+                  "output/regional_volatility.arrow", "output/leakage_report.arrow",
+                  "output/anomaly_audit.*", "core_modules/content_generator.py"],
+          outputs=["output/white_paper.md", "output/summary_post.md",
+                   "output/micro_thread.md", "output/presentation_slides.json",
+                   "output/content_briefs.json"],
+          depends_on=["engine"]),
+]
+
+DASHBOARD_STAGE = Stage("dashboard", "Launching Analytics Dashboard...", stage_dashboard,
+                        depends_on=["engine"], always_run=True)
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def load_state(output_dir=None):
+    path = Path(output_dir or OUTPUT_DIR) / STATE_FILE
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, output_dir=None):
+    path = Path(output_dir or OUTPUT_DIR) / STATE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def _run_stage(stage, ctx):
+    start = time.perf_counter()
+    try:
+        code = stage.func(ctx)
+        status = "ok" if not code else f"exit {code}"
+    except Exception as e:
+        print(f"Error encountered in stage '{stage.name}': {e}. Stopping.")
+        status = "error"
+    return status, time.perf_counter() - start
+
+
+def run_pipeline(stages=None, ctx=None, total_steps=None, parallel=True, force=False):
+    """
+    Runs stages as their dependencies complete; independent stages run
+    concurrently. Nothing new is started after a stage fails.
+    Returns (ok, ctx); the caller owns ctx and should close() it.
+    """
+    stages = stages or STAGES
+    ctx = ctx or PipelineContext()
+    ctx.force = force
+    total_steps = total_steps or len(stages)
+    names = {s.name for s in stages}
+    state = load_state()
+    pipeline_start = time.perf_counter()
+
+    pending = list(stages)
+    done = set()
+    failed = False
+    step = 0
+    workers = MAX_PARALLEL_STAGES if parallel else 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            if not failed:
+                for stage in list(pending):
+                    # Dependencies outside this run are treated as satisfied
+                    if not all(d in done or d not in names for d in stage.depends_on):
+                        continue
+                    pending.remove(stage)
+                    step += 1
+                    print(f"\n[{step}/{total_steps}] {stage.banner}")
+
+                    fp = stage.input_fingerprint() if stage.inputs else None
+                    up_to_date = (
+                        not force and not stage.always_run and fp is not None
+                        and state.get(stage.name, {}).get("inputs") == fp
+                        and stage.outputs_exist()
+                    )
+                    if up_to_date:
+                        print(f"  -> Inputs unchanged, skipping '{stage.name}'.")
+                        ctx.report[stage.name] = {"status": "skipped", "start": 0.0, "seconds": 0.0}
+                        done.add(stage.name)
+                        continue
+
+                    offset = time.perf_counter() - pipeline_start
+                    future = pool.submit(_run_stage, stage, ctx)
+                    running[future] = (stage, fp, offset)
+
+                # Skipped stages may have unblocked others; loop again before waiting
+                if any(all(d in done or d not in names for d in s.depends_on) for s in pending):
+                    continue
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fp, offset = running.pop(future)
+                status, secs = future.result()
+                ctx.timings[stage.name] = secs
+                ctx.report[stage.name] = {"status": status, "start": offset, "seconds": secs}
+                if status == "ok":
+                    done.add(stage.name)
+                    if fp is not None:
+                        # Fingerprint from before the run: inputs that changed
+                        # while the stage ran are picked up next time
+                        state[stage.name] = {"inputs": fp, "finished": time.time()}
+                else:
+                    if status != "error":
+                        print(f"Stage '{stage.name}' exited with {status}. Stopping.")
+                    failed = True
+
+    for stage in pending:
+        ctx.report[stage.name] = {"status": "blocked", "start": 0.0, "seconds": 0.0}
+
+    save_state(state)
+    return not failed and not pending, ctx
+
+
+def print_timings(ctx):
+    """Per-stage timing table: status, start offset and duration."""
+    if not ctx.report:
+        return
+    print("\n" + "=" * 52)
+    print(f"{'Stage':<12} {'Status':<10} {'Start (s)':>12} {'Duration (s)':>14}")
+    print("-" * 52)
+    for name, row in ctx.report.items():
+        print(f"{name:<12} {row['status']:<10} {row['start']:>12.2f} {row['seconds']:>14.2f}")
+    print("=" * 52)
+
+
+# ============================================================================
+# START-UP OVERHEAD
+# ============================================================================
+
+STAGE_MODULES = {
+    "ingest": "data_ingestion",
+    "engine": "processing_engine",
+    "report": "report_builder",
+    "content": "content_generator",
+}
+
+
+def measure_startup_overhead(repeats=3):
+    """
+    Compares the per-stage start-up cost of the old orchestration (a fresh
+    interpreter importing the stage module) with the in-process runner
+    (importing into an already-warm interpreter).
+    Returns {stage: {'subprocess_s': .., 'in_process_s': ..}}.
+    """
+    import importlib
+
+    result = {}
+    env = dict(os.environ, PYTHONPATH=str(CORE_DIR) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    for stage, module in STAGE_MODULES.items():
+        cold = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", f"import {module}"], env=env, cwd=str(CORE_DIR),
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            cold.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        importlib.import_module(module)
+        warm = time.perf_counter() - start
+
+        result[stage] = {'subprocess_s': round(min(cold), 4), 'in_process_s': round(warm, 4)}
+    return result
+
+
+def main():
+    overhead = measure_startup_overhead()
+    print(f"{'stage':<10} {'subprocess':>12} {'in-process':>12}")
+    for stage, t in overhead.items():
+        print(f"{stage:<10} {t['subprocess_s']:>11.3f}s {t['in_process_s']:>11.3f}s")
+    total_sub = sum(t['subprocess_s'] for t in overhead.values())
+    total_in = sum(t['in_process_s'] for t in overhead.values())
+    print(f"{'total':<10} {total_sub:>11.3f}s {total_in:>11.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
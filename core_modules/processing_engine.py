@@ -5,10 +5,17 @@ A robust, memory-efficient ETL engine using DuckDB to process market transaction
 Prioritizes out-of-core processing to prevent system crashes.
 
 Features:
-- Direct Parquet querying (No massive CSV intermediate files).
+- Direct Parquet querying (No massive CSV intermediate files), over the
+  compact analysis projection written at ingest when it is current.
 - DuckDB based "Aggregation First" strategy.
 - Automatic missing data imputation for Dec 2025.
 - Anomaly Detection (Vendor Audit) and Regional Volatility logic.
+- Maintains the hourly per-zone trip rollup (trip_rollup.py) that the query
+  service answers date-range / zone metrics from.
+- Pluggable execution backends (DuckDB SQL / Polars lazy), see execution_backends.py.
+- Results are written as memory-mappable Arrow IPC files (arrow_io.py) that the
+  report, content and dashboard stages read zero-copy; CSV copies are opt-in
+  (ENGINE_CSV=1).
 - Graceful degradation if optional libraries (Pandas, Scipy) are missing.
 
 Author: Internal Dev
@@ -19,31 +26,36 @@ import os
 import sys
 import json
 import time
-import requests
-import duckdb
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import arrow_io
+import fingerprints
+from execution_backends import get_backend
+from lazy_imports import lazy_import, module_available
+from resource_monitor import ResourceMonitor, MemoryBudgetExceeded
+
 # --- Robust Imports ---
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
+# Availability is probed without importing; the libraries themselves load on
+# first use so `--help` and light callers do not pay their import time.
+duckdb = lazy_import("duckdb")
+requests = lazy_import("requests")
+
+PANDAS_AVAILABLE = module_available("pandas")
+if PANDAS_AVAILABLE:
+    pd = lazy_import("pandas")
+else:
     print("WARNING: Pandas not found. Some analysis steps will be skipped.")
 
-try:
-    import numpy as np
-    NUMPY_AVAILABLE = True
-except ImportError:
-    NUMPY_AVAILABLE = False
+NUMPY_AVAILABLE = module_available("numpy")
+if NUMPY_AVAILABLE:
+    np = lazy_import("numpy")
+else:
     print("WARNING: Numpy not found.")
 
-try:
-    from scipy import stats
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
+# scipy.stats is only needed for the regression; imported there
+SCIPY_AVAILABLE = module_available("scipy")
+if not SCIPY_AVAILABLE:
     print("WARNING: Scipy not found. Regression analysis will be skipped.")
 
 # ============================================================================
@@ -61,24 +73,16 @@ DATA_DIR.mkdir(exist_ok=True, parents=True)
 OUTPUT_DIR.mkdir(exist_ok=True, parents=True)
 CACHE_DIR.mkdir(exist_ok=True, parents=True)
 
-# Data Source
-TLC_BASE_URL = "https://d37ci6vzurychx.cloudfront.net/trip-data"
+# Data Source (trip files come from data_ingestion.BASE_URL / TLC_BASE_URL)
+ZONE_LOOKUP_URL = "https://d37ci6vzurychx.cloudfront.net/misc/taxi+_zone_lookup.csv"
 TAXI_TYPES = ['yellow', 'green']
 
-# Target Region: Core Economic Zone (Manhattan South of 60th St)
-CONGESTION_ZONE_IDS = (
-    4, 12, 13, 24, 41, 42, 43, 45, 48, 50, 68, 74, 75, 87, 88, 90, 100, 103,
-    104, 105, 107, 113, 114, 116, 120, 125, 127, 128, 137, 140, 142, 143, 144,
-    148, 151, 152, 153, 158, 161, 162, 163, 164, 166, 170, 186, 194, 202, 209,
-    211, 212, 213, 214, 216, 217, 224, 229, 230, 231, 232, 233, 234, 235, 236,
-    237, 238, 239, 240, 241, 242, 243, 244, 245, 246, 249, 250
-)
-
-# Anomaly Thresholds
-ANOMALY_SPEED_LIMIT = 65.0  # Momentum Index
-ANOMALY_TIME_DELTA = 1.0  # Minutes
-ANOMALY_VALUE = 20.0  # Value
-ANOMALY_DIST = 0.0  # Distance
+# Target Region (Core Economic Zone, Manhattan South of 60th St) and Anomaly
+# Thresholds are defined in execution_backends, which runs every query.
+
+# Result tables are handed over as Arrow IPC files; CSV copies (for
+# spreadsheet users) only when ENGINE_CSV is set
+EXPORT_CSV = os.environ.get("ENGINE_CSV", "").lower() in ("1", "true", "yes")
 
 # External Factors API
 CENTRAL_PARK_LAT = 40.7829
@@ -89,25 +93,6 @@ CENTRAL_PARK_LON = -73.9654
 # HELPER FUNCTIONS
 # ============================================================================
 
-def download_file(url: str, dest_path: Path):
-    """Downloads a file if it doesn't exist, with progress printing."""
-    if dest_path.exists() and dest_path.stat().st_size > 1024:
-        return
-
-    print(f"Acquiring {url} to {dest_path.name}...")
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        with open(dest_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        print(f"  -> Acquired {dest_path.name}")
-    except Exception as e:
-        print(f"  -> Failed to acquire {url}: {e}")
-        # Remove partial file
-        if dest_path.exists():
-            dest_path.unlink()
-
 def get_duckdb_conn():
     """Creates a memory-optimized DuckDB connection."""
     conn = duckdb.connect(database=':memory:')
@@ -115,20 +100,58 @@ def get_duckdb_conn():
     conn.execute("SET threads=4")
     return conn
 
+def run_query(conn, sql, monitor=None, name=None):
+    """Executes SQL, recording per-query resource usage when a monitor is given."""
+    if monitor is None:
+        return conn.execute(sql)
+    return monitor.query(name, sql, conn=conn)
+
+def export_csv_copy(conn, table, name):
+    """output/<name>.csv from an Arrow table when EXPORT_CSV is set; otherwise drops a stale copy."""
+    path = OUTPUT_DIR / f"{name}.csv"
+    if EXPORT_CSV:
+        conn.from_arrow(table).write_csv(str(path))
+    elif path.exists():
+        path.unlink()
+
+def export_result(conn, backend, op, name, results=None, **params):
+    """
+    Fetches a backend operation once as an Arrow table and writes it to
+    output/<name>.arrow (plus the optional CSV copy). In-process callers
+    passing a `results` dict also get it under results['tables'][name].
+    """
+    table = backend.fetch(op, **params)
+    arrow_io.write_table(table, arrow_io.ipc_path(OUTPUT_DIR, name))
+    export_csv_copy(conn, table, name)
+    if results is not None:
+        results.setdefault('tables', {})[name] = table
+    return table
+
 # ============================================================================
 # PHASE 1: INGESTION & IMPUTATION
 # ============================================================================
 
-def ensure_data_available():
+def ensure_data_available(conn=None, revalidate=False):
     """
     Ensures that Parquet files for Analysis are present.
-    Downloads missing files and Imputes December 2025 if missing.
+    Downloads missing files and Imputes December 2025 if missing. Downloads
+    are recorded in data_ingestion's manifest; with revalidate, existing
+    files are re-checked with conditional requests and refetched if
+    republished.
     """
+    import data_ingestion
+
     print("\n[PHASE 1] Checking Core Data Availability...")
-    
+    manifest = data_ingestion.load_manifest(str(DATA_DIR))
+
+    def download(url, dest_path):
+        data_ingestion.download_file(url, str(dest_path), manifest, str(DATA_DIR), revalidate=revalidate)
+
     # 1. Zone Lookup
-    lookup_ur = "https://d37ci6vzurychx.cloudfront.net/misc/taxi+_zone_lookup.csv"
-    download_file(lookup_ur, DATA_DIR / "taxi_zone_lookup.csv")
+    download(ZONE_LOOKUP_URL, DATA_DIR / "taxi_zone_lookup.csv")
+    # Zone shapes for the dashboard maps (simplified and cached by zone_geometry)
+    import zone_geometry
+    zone_geometry.ensure_source(DATA_DIR)
 
     # 2. Standard Data (Jan-Nov 2025 and comparison year 2024, source 2023)
     required_downloads = []
@@ -149,38 +172,69 @@ def ensure_data_available():
 
     for year, month, taxi in required_downloads:
         file_name = f"{taxi}_tripdata_{year}-{month:02d}.parquet"
-        url = f"{TLC_BASE_URL}/{file_name}"
+        url = f"{data_ingestion.BASE_URL}/{file_name}"
         dest_dir = DATA_DIR / str(year) / taxi
         dest_dir.mkdir(parents=True, exist_ok=True)
-        download_file(url, dest_dir / file_name)
+        download(url, dest_dir / file_name)
+    data_ingestion.save_manifest(manifest, str(DATA_DIR))
 
     # Impute December 2025
     print("  -> Checking for December 2025 Data (Imputation Step)...")
-    impute_december_data()
+    impute_december_data(conn, manifest)
+
+    # Analysis-ready projection for months that are new or changed (incl. the imputed one)
+    summary = data_ingestion.build_analysis(DATA_DIR)
+    raw = f", {summary['raw']} on raw files" if summary['raw'] else ""
+    print(f"  -> Analysis projection: {summary['written']} month(s) rebuilt, {summary['current']} current{raw}.")
 
-def impute_december_data():
+def imputation_fingerprint(sources):
+    """
+    (size, mtime) of the imputation sources. A republished source is swapped
+    in by data_ingestion.fetch (and its manifest entry updated), which
+    changes both; revalidating an unchanged source changes neither.
+    """
+    return fingerprints.value_digest([fingerprints.file_stat(src) for src in sources])
+
+def impute_december_data(conn=None, manifest=None):
     """
     Imputes Dec 2025 data if missing, using weighted average of Dec 2023 (30%) and Dec 2024 (70%).
+    An imputed file is rebuilt when either source was republished; a
+    downloaded (published) Dec 2025 is left alone.
+    Reuses the caller's connection when one is given.
     """
-    conn = get_duckdb_conn()
+    import data_ingestion
+
+    conn = conn or get_duckdb_conn()
+    if manifest is None:
+        manifest = data_ingestion.load_manifest(str(DATA_DIR))
     
     for taxi in TAXI_TYPES:
         target_dir = DATA_DIR / "2025" / taxi
         target_file = target_dir / f"{taxi}_tripdata_2025-12.parquet"
-        
-        if target_file.exists():
-            print(f"  -> {target_file.name} already exists.")
-            continue
-            
-        print(f"  -> Generating imputed data for {taxi} Dec 2025...")
-        
         src_2023 = DATA_DIR / "2023" / taxi / f"{taxi}_tripdata_2023-12.parquet"
         src_2024 = DATA_DIR / "2024" / taxi / f"{taxi}_tripdata_2024-12.parquet"
-        
+
+        if target_file.exists() and data_ingestion.manifest_key(str(target_file), str(DATA_DIR)) in manifest:
+            print(f"  -> {target_file.name} already exists (published).")
+            continue
+
         if not src_2023.exists() or not src_2024.exists():
-            print(f"  -> WARNING: Missing source data for imputation. Skipping {taxi}")
+            if not target_file.exists():
+                print(f"  -> WARNING: Missing source data for imputation. Skipping {taxi}")
             continue
 
+        sources_fp = imputation_fingerprint([src_2023, src_2024])
+        if fingerprints.artifact_current(str(target_file), sources_fp):
+            print(f"  -> {target_file.name} already exists.")
+            continue
+
+        if target_file.exists():
+            print(f"  -> Dec 2023 / Dec 2024 source changed; re-imputing {taxi} Dec 2025...")
+        else:
+            print(f"  -> Generating imputed data for {taxi} Dec 2025...")
+
+        target_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = str(target_file) + ".part"
         try:
             print("     - Sampling 2023 (30%) & 2024 (70%)...")
             
@@ -189,7 +243,7 @@ def impute_december_data():
             
             q_src_2023 = str(src_2023).replace('\\', '/')
             q_src_2024 = str(src_2024).replace('\\', '/')
-            q_target = str(target_file).replace('\\', '/')
+            q_target = tmp_file.replace('\\', '/')
 
             query = f"""
             COPY (
@@ -211,96 +265,58 @@ def impute_december_data():
             ) TO '{q_target}' (FORMAT PARQUET)
             """
             conn.execute(query)
+            os.replace(tmp_file, target_file)
+            fingerprints.record_artifact(str(target_file), sources_fp)
             print(f"  -> Imputed file created: {target_file.name}")
             
         except Exception as e:
             print(f"  -> Error imputing data for {taxi}: {e}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+def update_rollup(conn=None):
+    """Rebuilds the hourly trip rollup for months whose trips changed."""
+    import trip_rollup
+    print("\n[PHASE 1b] Updating Hourly Trip Rollup...")
+    summary = trip_rollup.build_rollup(DATA_DIR, OUTPUT_DIR, conn=conn)
+    trip_rollup.print_rollup_summary(summary)
+    return summary
 
 # ============================================================================
 # PHASE 2: DATA INTEGRITY & ANOMALY DETECTION
 # ============================================================================
 
-def run_anomaly_audit(conn):
+def run_anomaly_audit(conn, monitor=None, backend=None):
     print("\n[PHASE 2] Auditing for Data Anomalies...")
-    
-    yellow_glob = str(DATA_DIR / "2025/yellow/*.parquet").replace('\\', '/')
-    green_glob = str(DATA_DIR / "2025/green/*.parquet").replace('\\', '/')
-    
-    query_view = f"""
-    CREATE OR REPLACE VIEW all_trips_2025 AS
-    SELECT 
-        VendorID,
-        'yellow' as type,
-        tpep_pickup_datetime as pickup_time,
-        tpep_dropoff_datetime as dropoff_time,
-        PULocationID as pickup_loc,
-        DOLocationID as dropoff_loc,
-        trip_distance,
-        fare_amount as fare,
-        total_amount,
-        COALESCE(congestion_surcharge, 0) as congestion_surcharge
-    FROM read_parquet('{yellow_glob}', union_by_name=True)
-    UNION ALL
-    SELECT 
-        VendorID,
-        'green' as type,
-        lpep_pickup_datetime as pickup_time,
-        lpep_dropoff_datetime as dropoff_time,
-        PULocationID as pickup_loc,
-        DOLocationID as dropoff_loc,
-        trip_distance,
-        fare_amount as fare,
-        total_amount,
-        COALESCE(congestion_surcharge, 0) as congestion_surcharge
-    FROM read_parquet('{green_glob}', union_by_name=True)
-    """
-    try:
-        conn.execute(query_view)
-    except Exception as e:
-        print(f"  -> Error creating view: {e}. Are files downloaded?")
+    backend = backend or get_backend(DATA_DIR, conn=conn, monitor=monitor)
+    print(f"  -> Execution backend: {backend.name}")
+
+    if not any(backend.trip_files(2025, taxi) for taxi in TAXI_TYPES):
+        print("  -> Error: no 2025 trip files found. Are files downloaded?")
         return 0, []
     
     audit_file = str(OUTPUT_DIR / 'anomaly_audit.csv').replace('\\', '/')
-    
-    audit_query = f"""
-    COPY (
-        SELECT 
-            *,
-            date_diff('minute', pickup_time, dropoff_time) as duration_min,
-            CASE 
-                WHEN date_diff('minute', pickup_time, dropoff_time) <= 0 THEN 0 
-                ELSE (trip_distance / (date_diff('minute', pickup_time, dropoff_time) / 60.0)) 
-            END as speed_mph,
-            CASE
-                WHEN (trip_distance / (GREATEST(date_diff('minute', pickup_time, dropoff_time), 0.1) / 60.0)) > {ANOMALY_SPEED_LIMIT} THEN 'Impossible Physics'
-                WHEN date_diff('minute', pickup_time, dropoff_time) < {ANOMALY_TIME_DELTA} AND fare > {ANOMALY_VALUE} THEN 'Value Mismatch'
-                WHEN trip_distance = {ANOMALY_DIST} AND fare > 0 THEN 'Stationary Transaction'
-                ELSE 'OK'
-            END as anomaly_flag
-        FROM all_trips_2025
-        WHERE 
-            (trip_distance / (GREATEST(date_diff('minute', pickup_time, dropoff_time), 0.1) / 60.0)) > {ANOMALY_SPEED_LIMIT}
-            OR (date_diff('minute', pickup_time, dropoff_time) < {ANOMALY_TIME_DELTA} AND fare > {ANOMALY_VALUE})
-            OR (trip_distance = {ANOMALY_DIST} AND fare > 0)
-    ) TO '{audit_file}' (HEADER, FORMAT CSV)
-    """
+    audit_parquet = str(OUTPUT_DIR / 'anomaly_audit.parquet').replace('\\', '/')
     
     print("  -> Executing Audit Query...")
-    conn.execute(audit_query)
+    # Parquet is the primary copy (the dashboard reads only the columns and
+    # row groups it needs); the optional CSV is derived from it.
+    backend.export_parquet('anomalies', audit_parquet, year=2025)
+    if EXPORT_CSV:
+        run_query(conn, f"COPY (SELECT * FROM read_parquet('{audit_parquet}')) TO '{audit_file}' (HEADER, FORMAT CSV)",
+                  monitor, "audit_csv")
+    elif os.path.exists(audit_file):
+        os.remove(audit_file)
     
-    count = conn.execute(f"SELECT COUNT(*) FROM '{audit_file}'").fetchone()[0]
+    # Row count straight from the Parquet footer
+    count = run_query(conn, f"SELECT SUM(num_rows) FROM parquet_file_metadata('{audit_parquet}')",
+                      monitor, "audit_count").fetchone()[0] or 0
     print(f"  -> {count} anomalies flagged.")
     
     # Vendor Audit
     print("  -> Auditing Vendors...")
-    vendor_query = f"""
-    SELECT VendorID, COUNT(*) as anomaly_count
-    FROM '{audit_file}'
-    GROUP BY VendorID
-    ORDER BY anomaly_count DESC
-    LIMIT 5
-    """
-    vendors = conn.execute(vendor_query).fetchall()
+    vendor_table = backend.fetch('anomaly_vendors', year=2025)
+    vendors = list(zip(vendor_table.column('VendorID').to_pylist(), vendor_table.column('anomaly_count').to_pylist()))
     print(f"  -> Top anomalous vendor code: {vendors[0][0] if vendors else 'None'}")
     
     return count, vendors
@@ -309,68 +325,29 @@ def run_anomaly_audit(conn):
 # PHASE 3: TREND ANALYSIS & AGGREGATIONS
 # ============================================================================
 
-def run_trend_analysis(conn, anomaly_count, suspicious_vendors):
+def run_trend_analysis(conn, anomaly_count, suspicious_vendors, monitor=None, backend=None, results=None):
     print("\n[PHASE 3] Analyzing Market Trends...")
+    backend = backend or get_backend(DATA_DIR, conn=conn, monitor=monitor)
     
     start_date = '2025-01-05'
-    zone_ids_str = ', '.join(map(str, CONGESTION_ZONE_IDS))
     
     # 1. Revenue
     try:
-        rev_query = f"""
-            SELECT SUM(congestion_surcharge) 
-            FROM all_trips_2025 
-            WHERE pickup_time >= '{start_date}'
-            AND (pickup_loc IN ({zone_ids_str}) OR dropoff_loc IN ({zone_ids_str}))
-        """
-        revenue = conn.execute(rev_query).fetchone()[0]
+        revenue = backend.scalar('revenue', year=2025, start_date=start_date)
         revenue = revenue if revenue else 0.0
         print(f"  -> Estimated 2025 Surcharge Revenue: ${revenue:,.2f}")
     except:
         revenue = 0.0
 
     # 2. Leakage
-    leakage_file = str(OUTPUT_DIR / 'leakage_report.csv').replace('\\', '/')
-    leakage_query = f"""
-    COPY (
-        SELECT 
-            pickup_loc,
-            COUNT(*) as total_trans,
-            SUM(CASE WHEN congestion_surcharge > 0 THEN 1 ELSE 0 END) as compliant_trans,
-            CAST(SUM(CASE WHEN congestion_surcharge > 0 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*) as compliance_rate,
-            1.0 - (CAST(SUM(CASE WHEN congestion_surcharge > 0 THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*)) as leakage_rate
-        FROM all_trips_2025
-        WHERE pickup_time >= '{start_date}'
-          AND pickup_loc NOT IN ({zone_ids_str})
-          AND dropoff_loc IN ({zone_ids_str})
-        GROUP BY pickup_loc
-        HAVING COUNT(*) > 100
-        ORDER BY leakage_rate DESC
-        LIMIT 20
-    ) TO '{leakage_file}' (HEADER, FORMAT CSV)
-    """
-    conn.execute(leakage_query)
+    export_result(conn, backend, 'leakage', 'leakage_report', results, year=2025, start_date=start_date)
     print("  -> Leakage analysis saved.")
     
     # 3. Q1 Decline
     print("  -> Calculating Q1 Volume Delta...")
     def get_q1_count(year):
-        yg = str(DATA_DIR / f"{year}/yellow/*.parquet").replace('\\', '/')
-        gg = str(DATA_DIR / f"{year}/green/*.parquet").replace('\\', '/')
-        # Careful with union_by_name if schemas drift massively, but VendorID/dates usually stable
-        q_zone = f"""
-        SELECT COUNT(*)
-        FROM (
-            SELECT tpep_dropoff_datetime as t, DOLocationID as loc FROM read_parquet('{yg}', union_by_name=True)
-            UNION ALL
-            SELECT lpep_dropoff_datetime as t, DOLocationID as loc FROM read_parquet('{gg}', union_by_name=True)
-        )
-        WHERE month(t) IN (1, 2, 3) 
-          AND t >= '{year}-01-01' AND t < '{year}-04-01'
-          AND loc IN ({zone_ids_str})
-        """
         try:
-            return conn.execute(q_zone).fetchone()[0]
+            return backend.scalar('q1_zone_volume', year=year)
         except:
             return 0
 
@@ -389,29 +366,14 @@ def run_trend_analysis(conn, anomaly_count, suspicious_vendors):
     }
     with open(OUTPUT_DIR / "market_stats.json", "w") as f:
         json.dump(stats, f)
+    if results is not None:
+        results['stats'] = stats
         
     # 4. Momentum Heatmap (Velocity)
     print("  -> Generating Momentum Data...")
     def export_velocity(year):
-        yg = str(DATA_DIR / f"{year}/yellow/*.parquet").replace('\\', '/')
-        out_file = str(OUTPUT_DIR / f'momentum_{year}.csv').replace('\\', '/')
-        q = f"""
-        COPY (
-            SELECT 
-                dayofweek(tpep_pickup_datetime) as dow,
-                hour(tpep_pickup_datetime) as hour,
-                AVG(trip_distance / (GREATEST(date_diff('minute', tpep_pickup_datetime, tpep_dropoff_datetime), 1) / 60.0)) as avg_momentum
-            FROM read_parquet('{yg}', union_by_name=True)
-            WHERE month(tpep_pickup_datetime) IN (1, 2, 3)
-              AND DOLocationID IN ({zone_ids_str})
-              AND date_diff('minute', tpep_pickup_datetime, tpep_dropoff_datetime) > 1
-              AND trip_distance > 0.1
-              AND (trip_distance / (GREATEST(date_diff('minute', tpep_pickup_datetime, tpep_dropoff_datetime), 1) / 60.0)) < 100
-            GROUP BY 1, 2
-        ) TO '{out_file}' (HEADER, FORMAT CSV)
-        """
         try:
-            conn.execute(q)
+            export_result(conn, backend, 'momentum', f'momentum_{year}', results, year=year)
         except Exception as e:
             print(f"     Warning: Momentum query failed for {year}: {e}")
 
@@ -420,38 +382,8 @@ def run_trend_analysis(conn, anomaly_count, suspicious_vendors):
     
     # 5. Regional Volatility (Border Effect)
     print("  -> Generating Regional Volatility Data...")
-    border_file = str(OUTPUT_DIR / 'regional_volatility.csv').replace('\\', '/')
-    yg_2024 = str(DATA_DIR / "2024/yellow/*.parquet").replace('\\', '/')
-    yg_2025 = str(DATA_DIR / "2025/yellow/*.parquet").replace('\\', '/')
-    
-    border_query = f"""
-    COPY (
-        WITH q1_2024 AS (
-            SELECT DOLocationID as loc, COUNT(*) as cnt 
-            FROM read_parquet('{yg_2024}', union_by_name=True)
-            WHERE month(tpep_dropoff_datetime) IN (1,2,3)
-            GROUP BY 1
-        ),
-        q1_2025 AS (
-            SELECT DOLocationID as loc, COUNT(*) as cnt 
-            FROM read_parquet('{yg_2025}', union_by_name=True)
-            WHERE month(tpep_dropoff_datetime) IN (1,2,3)
-            GROUP BY 1
-        )
-        SELECT 
-            COALESCE(a.loc, b.loc) as location_id,
-            COALESCE(a.cnt, 0) as count_2024,
-            COALESCE(b.cnt, 0) as count_2025,
-            (COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0)) as diff,
-            CASE WHEN COALESCE(a.cnt, 0) > 0 
-                 THEN (COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0)) * 100.0 / a.cnt 
-                 ELSE 0 END as pct_change
-        FROM q1_2024 a
-        FULL OUTER JOIN q1_2025 b ON a.loc = b.loc
-    ) TO '{border_file}' (HEADER, FORMAT CSV)
-    """
     try:
-        conn.execute(border_query)
+        export_result(conn, backend, 'regional_volatility', 'regional_volatility', results)
     except Exception as e:
         print(f"    Warning: Volatility query failed: {e}")
 
@@ -459,9 +391,10 @@ def run_trend_analysis(conn, anomaly_count, suspicious_vendors):
 # PHASE 4: EXTERNAL FACTORS & ENGAGEMENT
 # ============================================================================
 
-def fetch_factors_and_analyze(conn):
+def fetch_factors_and_analyze(conn, monitor=None, backend=None, results=None):
     print("\n[PHASE 4] External Factors & Engagement...")
-    
+    backend = backend or get_backend(DATA_DIR, conn=conn, monitor=monitor)
+
     # 1. Fetch External Factors (Weather)
     factor_file = CACHE_DIR / "external_factors_2025.csv"
     if not factor_file.exists():
@@ -498,50 +431,33 @@ def fetch_factors_and_analyze(conn):
             print(f"  -> Failed to fetch factors: {e}")
             
     # 2. Daily Transactions
-    out_trans = str(OUTPUT_DIR / 'daily_transactions_2025.csv').replace('\\', '/')
-    daily_trans_query = f"""
-    COPY (
-        SELECT 
-            CAST(pickup_time AS DATE) as date,
-            COUNT(*) as transactions
-        FROM all_trips_2025
-        GROUP BY 1
-        ORDER BY 1
-    ) TO '{out_trans}' (HEADER, FORMAT CSV)
-    """
-    conn.execute(daily_trans_query)
+    trans_table = export_result(conn, backend, 'daily_transactions', 'daily_transactions_2025', results, year=2025)
     
     # 3. Engagement Metrics (Tips)
-    out_engagement = str(OUTPUT_DIR / 'engagement_metrics.csv').replace('\\', '/')
-    engagement_query = f"""
-    COPY (
-        SELECT 
-            month(pickup_time) as month,
-            AVG(congestion_surcharge) as avg_fee,
-            AVG(CASE WHEN fare > 0 THEN (total_amount - fare)/fare ELSE 0 END) * 100 as avg_engagement_score
-        FROM all_trips_2025
-        GROUP BY 1
-        ORDER BY 1
-    ) TO '{out_engagement}' (HEADER, FORMAT CSV)
-    """
-    conn.execute(engagement_query)
+    export_result(conn, backend, 'engagement', 'engagement_metrics', results, year=2025)
 
     # 4. Correlation Analysis
     if PANDAS_AVAILABLE and SCIPY_AVAILABLE:
         try:
-            df_trans = pd.read_csv(OUTPUT_DIR / "daily_transactions_2025.csv")
+            # Straight from the Arrow result; numeric columns are not copied
+            df_trans = arrow_io.to_pandas(trans_table)
+            df_trans['date'] = df_trans['date'].astype(str)
             df_factors = pd.read_csv(factor_file)
             df_merge = pd.merge(df_trans, df_factors, on='date')
             df_merge = df_merge.dropna()
             
             if len(df_merge) > 10:
+                from scipy import stats
                 correlation = df_merge['transactions'].corr(df_merge['factor_value'])
                 slope, intercept, r_value, p_value, std_err = stats.linregress(
                     df_merge['factor_value'], df_merge['transactions']
                 )
                 print(f"  -> Factor Correlation: {correlation:.4f}")
+                correlation_text = f"Correlation: {correlation}\nSlope: {slope}\n"
                 with open(OUTPUT_DIR / "correlation_summary.txt", "w") as f:
-                    f.write(f"Correlation: {correlation}\nSlope: {slope}\n")
+                    f.write(correlation_text)
+                if results is not None:
+                    results['correlation_text'] = correlation_text
         except Exception as e:
             print(f"  -> Correlation analysis error: {e}")
 
@@ -549,28 +465,57 @@ def fetch_factors_and_analyze(conn):
 # MAIN ORCHESTRATOR
 # ============================================================================
 
-def main():
+def main(conn=None, results=None, revalidate=False):
+    """
+    Runs every engine phase. In-process callers (pipeline_runner) may pass a
+    warm DuckDB connection, which is left open, and a `results` dict that
+    receives the Arrow tables, market stats and correlation text.
+    revalidate re-checks the downloaded lookup and source months first.
+    """
     print("="*60)
     print("Starting Market Trend Analysis Engine")
     print("="*60)
     
-    ensure_data_available()
-    print("\nInitializing Query Engine...")
-    conn = get_duckdb_conn()
-    
+    monitor = ResourceMonitor("engine")
+    exit_code = 0
+    owns_conn = conn is None
+
     try:
-        count, vendors = run_anomaly_audit(conn)
-        run_trend_analysis(conn, count, vendors)
-        fetch_factors_and_analyze(conn)
-        
+        print("\nInitializing Query Engine...")
+        if owns_conn:
+            conn = get_duckdb_conn()
+        monitor.attach(conn)
+
+        with monitor.phase("data_availability"):
+            ensure_data_available(conn, revalidate=revalidate)
+        with monitor.phase("trip_rollup"):
+            update_rollup(conn)
+
+        backend = get_backend(DATA_DIR, conn=conn, monitor=monitor)
+
+        with monitor.phase("anomaly_audit"):
+            count, vendors = run_anomaly_audit(conn, monitor, backend)
+        with monitor.phase("trend_analysis"):
+            run_trend_analysis(conn, count, vendors, monitor, backend, results)
+        with monitor.phase("external_factors"):
+            fetch_factors_and_analyze(conn, monitor, backend, results)
+
+    except MemoryBudgetExceeded as e:
+        print(f"\nMEMORY BUDGET EXCEEDED: {e}")
+        exit_code = 1
     except Exception as e:
         print(f"\nCRITICAL ENGINE ERROR: {e}")
         import traceback
         traceback.print_exc()
+        exit_code = 1
     finally:
-        conn.close()
+        if owns_conn and conn is not None:
+            conn.close()
+        monitor.print_summary()
+        monitor.save(OUTPUT_DIR)
         
     print("\nProcessing Completed.")
+    return exit_code
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
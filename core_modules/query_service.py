@@ -0,0 +1,1011 @@
+"""
+Local Query Service
+===================
+A small HTTP service that keeps the engine outputs and the trip store open
+and answers parameterized metric queries, so consumers stop re-parsing the
+CSV/JSON files in output/.
+
+- One DuckDB connection holds a trips_{year} view per year in
+  data_downloads/ and an out_{name} table per engine output in output/
+  (Arrow IPC outputs are memory-mapped and copied in, nothing is parsed).
+- Metric queries (revenue by date range, leakage for a zone, momentum
+  heatmap for a year, ...) are answered from an in-memory LRU result cache.
+- Uncached metrics aggregate the engine's hourly trip rollup (rollup_{year}_{taxi}
+  tables, see trip_rollup.py) when it covers the requested range and zones,
+  and scan the trips otherwise.
+- The cache is dropped and the outputs reloaded when a new engine run (or
+  new trip data) changes the stat fingerprint of those files. Cache keys
+  carry that generation, and a reload waits for in-flight queries, so a
+  result computed before a reload is never served after it.
+- Responses are JSON by default, or Arrow IPC streams with ?format=arrow
+  (or Accept: application/vnd.apache.arrow.stream).
+
+Endpoints:
+    GET  /health                     generation + cache counters
+    GET  /metrics                    available metrics and their parameters
+    GET  /metrics/<name>?k=v         run a metric
+    GET  /stats                      market_stats.json
+    GET  /outputs/<name>?limit=&offset=
+    POST /invalidate                 drop the cache and reload outputs
+
+Usage:
+    python run_analysis.py serve [--port 8765] [--cache-size 256]
+    curl 'localhost:8765/metrics/revenue?start=2025-01-05&end=2025-03-31&group=month'
+    curl 'localhost:8765/metrics/leakage?zone=263'
+    curl 'localhost:8765/metrics/momentum?year=2025&format=arrow' > momentum.arrows
+"""
+
+import os
+import sys
+import json
+import calendar
+import contextlib
+import time
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+import arrow_io
+import fingerprints
+import trip_rollup
+from execution_backends import (
+    CONGESTION_ZONE_IDS,
+    SURCHARGE_START,
+    LEAKAGE_MIN_TRIPS,
+    LEAKAGE_TOP_N,
+    MOMENTUM_VALID,
+    TAXI_TYPES,
+    DuckDBBackend,
+    in_zones_sql,
+    _arrow,
+    _sql_path,
+)
+
+BASE_DIR = CORE_DIR.parent
+DATA_DIR = BASE_DIR / "data_downloads"
+OUTPUT_DIR = BASE_DIR / "output"
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_CACHE_MB = 256
+FINGERPRINT_CHECK_S = 1.0   # how often requests re-stat the outputs
+MAX_JSON_ROWS = 100_000
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Engine outputs exposed as out_{name} tables
+OUTPUT_TABLES = [
+    "leakage_report",
+    "regional_volatility",
+    "momentum_2024",
+    "momentum_2025",
+    "daily_transactions_2025",
+    "engagement_metrics",
+    "anomaly_audit",
+]
+# Large outputs stay as views over the file instead of being loaded
+OUTPUT_VIEWS = {"anomaly_audit"}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+# ============================================================================
+# RESULT CACHE
+# ============================================================================
+
+class ResultCache:
+    """
+    Thread-safe LRU of query results (pyarrow Tables) keyed by metric + params.
+    Bounded by entry count and by total Arrow buffer size; a single result
+    larger than the byte cap is returned but not cached.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(name, params, generation=None):
+        return (generation, name, tuple(sorted(params.items())))
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        size = getattr(value, "nbytes", 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._sizes.pop(key)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self.bytes > self.max_bytes):
+                old, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(old)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'mb': round(self.bytes / (1024 * 1024), 2),
+                    'max_mb': round(self.max_bytes / (1024 * 1024), 2) if self.max_bytes else None,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class ReadWriteLock:
+    """
+    Shared by queries, exclusive for reload(). A waiting writer holds back
+    new readers, so a reload is not starved by steady traffic.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+# ============================================================================
+# PARAMETERS
+# ============================================================================
+
+# Parsers accept query-string text and, for in-process callers such as the
+# dashboard, already-typed values.
+
+def _date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise BadRequest(f"invalid date '{value}' (expected YYYY-MM-DD)")
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"invalid integer '{value}'")
+
+
+def _zones(value):
+    """'core' -> the congestion zone, 'all' -> None (no filter), '4,12,13' or a list -> those IDs."""
+    if value is None or value == "all":
+        return None
+    if value == "core":
+        return tuple(CONGESTION_ZONE_IDS)
+    items = value.split(",") if isinstance(value, str) else value
+    zones = tuple(sorted({_int(v) for v in items if str(v).strip()}))
+    if not zones:
+        raise BadRequest("empty zone list")
+    return zones
+
+
+def _choice(*options):
+    def parse(value):
+        if value not in options:
+            raise BadRequest(f"'{value}' is not one of {', '.join(options)}")
+        return value
+    return parse
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def _is_core(zones):
+    return zones is not None and sorted(set(zones)) == sorted(CONGESTION_ZONE_IDS)
+
+
+def _in(column, zones):
+    """
+    SQL membership test for validated integer zone IDs. The core zone set is
+    answered from the persisted pickup_in_zone / dropoff_in_zone flags.
+    """
+    if column in ("pickup_loc", "dropoff_loc") and _is_core(zones):
+        return column.replace("_loc", "_in_zone")
+    return in_zones_sql(column, zones)
+
+
+def _year_earlier(d):
+    try:
+        return d.replace(year=d.year - 1)
+    except ValueError:  # 29 Feb
+        return d.replace(year=d.year - 1, day=28)
+
+
+def _trips_between(service, start, end, taxi):
+    """
+    Trips picked up in [start, end]. Only the year/taxi partitions the range
+    touches are scanned (trips_{year}_{taxi} views).
+    """
+    taxis = service.taxis if taxi == "all" else [taxi]
+    parts = [f"SELECT * FROM trips_{y}_{t}"
+             for y in range(start.year, end.year + 1) for t in taxis
+             if (y, t) in service.partitions]
+    if not parts:
+        raise BadRequest(f"no {taxi} trip data between {start} and {end}")
+    where = "pickup_time >= ? AND pickup_time < CAST(? AS DATE) + INTERVAL 1 DAY"
+    return f"(SELECT * FROM ({' UNION ALL '.join(parts)}) WHERE {where})", [start, end]
+
+
+def metric_revenue(service, start, end, group, taxi, zones):
+    trips, params = _trips_between(service, start, end, taxi)
+    bucket = {"total": None, "day": "pickup_date",
+              "month": "CAST(date_trunc('month', pickup_time) AS DATE)"}[group]
+    select = f"{bucket} as period, " if bucket else ""
+    sql = f"""
+        SELECT {select}SUM(congestion_surcharge) as revenue, COUNT(*) as zone_trips
+        FROM {trips}"""
+    if zones:
+        sql += f" WHERE {_in('pickup_loc', zones)} OR {_in('dropoff_loc', zones)}"
+    if bucket:
+        sql += " GROUP BY 1 ORDER BY 1"
+    return sql, params
+
+
+def metric_leakage(service, zone, start, end, taxi):
+    trips, params = _trips_between(service, start, end, taxi)
+    compliant = "COUNT(*) FILTER (WHERE congestion_surcharge > 0)"
+    sql = f"""
+        SELECT
+            pickup_loc,
+            COUNT(*) as total_trans,
+            {compliant} as compliant_trans,
+            CAST({compliant} AS FLOAT) / COUNT(*) as compliance_rate,
+            1.0 - (CAST({compliant} AS FLOAT) / COUNT(*)) as leakage_rate
+        FROM {trips}
+        WHERE NOT {_in('pickup_loc', CONGESTION_ZONE_IDS)} AND {_in('dropoff_loc', CONGESTION_ZONE_IDS)}"""
+    if zone is not None:
+        sql += " AND pickup_loc = ? GROUP BY pickup_loc"
+        params.append(zone)
+    else:
+        sql += f"""
+        GROUP BY pickup_loc
+        HAVING COUNT(*) > {LEAKAGE_MIN_TRIPS}
+        ORDER BY leakage_rate DESC, pickup_loc
+        LIMIT {LEAKAGE_TOP_N}"""
+    return sql, params
+
+
+def metric_momentum(service, year, start_month, end_month, taxi, zones):
+    """Momentum heatmap (dow x hour); defaults match the engine (Q1, yellow, core zone)."""
+    if not 1 <= start_month <= end_month <= 12:
+        raise BadRequest("expected 1 <= start_month <= end_month <= 12")
+    last_day = calendar.monthrange(year, end_month)[1]
+    trips, params = _trips_between(service, date(year, start_month, 1), date(year, end_month, last_day), taxi)
+    zone_filter = f"AND {_in('dropoff_loc', zones)}" if zones else ""
+    sql = f"""
+        SELECT
+            pickup_dow as dow,
+            pickup_hour as hour,
+            AVG(momentum) as avg_momentum,
+            COUNT(*) as trips
+        FROM {trips}
+        WHERE {MOMENTUM_VALID}
+          {zone_filter}
+        GROUP BY 1, 2
+        ORDER BY 1, 2"""
+    return sql, params
+
+
+def metric_zone_momentum(service, start, end, taxi, min_count):
+    """Average momentum per pickup zone in [start, end] and the same dates a year earlier."""
+    before, before_params = _trips_between(service, _year_earlier(start), _year_earlier(end), taxi)
+    after, after_params = _trips_between(service, start, end, taxi)
+    sql = f"""
+        WITH a AS (SELECT pickup_loc as loc, AVG(momentum) as m, COUNT(*) as cnt FROM {before} WHERE {MOMENTUM_VALID} GROUP BY 1),
+             b AS (SELECT pickup_loc as loc, AVG(momentum) as m, COUNT(*) as cnt FROM {after} WHERE {MOMENTUM_VALID} GROUP BY 1)
+        SELECT
+            b.loc as location_id,
+            a.m as momentum_before,
+            b.m as momentum_after,
+            b.cnt as trips,
+            CASE WHEN a.m > 0 THEN (b.m - a.m) * 100.0 / a.m END as pct_change
+        FROM b LEFT JOIN a ON a.loc = b.loc
+        WHERE b.cnt > ?
+        ORDER BY location_id"""
+    return sql, before_params + after_params + [min_count]
+
+
+def metric_daily_transactions(service, start, end, taxi):
+    trips, params = _trips_between(service, start, end, taxi)
+    sql = f"""
+        SELECT pickup_date as date, COUNT(*) as transactions
+        FROM {trips}
+        GROUP BY 1 ORDER BY 1"""
+    return sql, params
+
+
+def metric_zone_daily(service, start, end, taxi, zones):
+    """Per pickup zone and day: volume, revenue and surcharge compliance (batch report input)."""
+    trips, params = _trips_between(service, start, end, taxi)
+    zone_filter = f"WHERE {_in('pickup_loc', zones)}" if zones else ""
+    sql = f"""
+        SELECT
+            pickup_loc as location_id,
+            pickup_date as date,
+            COUNT(*) as trips,
+            SUM(total_amount) as revenue,
+            SUM(congestion_surcharge) as surcharge,
+            COUNT(*) FILTER (WHERE congestion_surcharge > 0) as compliant_trips,
+            AVG(trip_distance) as avg_distance,
+            AVG(CASE WHEN duration_min > 0 THEN duration_min END) as avg_duration_min
+        FROM {trips}
+        {zone_filter}
+        GROUP BY 1, 2 ORDER BY 1, 2"""
+    return sql, params
+
+
+def metric_engagement(service, start, end, taxi, zones):
+    trips, params = _trips_between(service, start, end, taxi)
+    zone_filter = f"WHERE {_in('pickup_loc', zones)} OR {_in('dropoff_loc', zones)}" if zones else ""
+    sql = f"""
+        SELECT
+            pickup_month as month,
+            AVG(congestion_surcharge) as avg_fee,
+            AVG(CASE WHEN fare > 0 THEN (total_amount - fare)/fare ELSE 0 END) * 100 as avg_engagement_score,
+            COUNT(*) as trips
+        FROM {trips}
+        {zone_filter}
+        GROUP BY 1 ORDER BY 1"""
+    return sql, params
+
+
+def metric_zone_volume_change(service, start, end, taxi, min_count):
+    """Drop-off volume per zone in [start, end] against the same dates a year earlier."""
+    before, before_params = _trips_between(service, _year_earlier(start), _year_earlier(end), taxi)
+    after, after_params = _trips_between(service, start, end, taxi)
+    sql = f"""
+        WITH a AS (SELECT dropoff_loc as loc, COUNT(*) as cnt FROM {before} GROUP BY 1),
+             b AS (SELECT dropoff_loc as loc, COUNT(*) as cnt FROM {after} GROUP BY 1)
+        SELECT
+            COALESCE(a.loc, b.loc) as location_id,
+            COALESCE(a.cnt, 0) as count_before,
+            COALESCE(b.cnt, 0) as count_after,
+            COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0) as diff,
+            CASE WHEN COALESCE(a.cnt, 0) > 0
+                 THEN (COALESCE(b.cnt, 0) - COALESCE(a.cnt, 0)) * 100.0 / a.cnt
+                 ELSE 0 END as pct_change
+        FROM a FULL OUTER JOIN b ON a.loc = b.loc
+        WHERE COALESCE(a.cnt, 0) > ?
+        ORDER BY pct_change DESC, location_id"""
+    return sql, before_params + after_params + [min_count]
+
+
+def metric_volatility(service, zone):
+    if "regional_volatility" not in service.outputs:
+        raise BadRequest("regional_volatility output not available")
+    if zone is None:
+        return "SELECT * FROM out_regional_volatility ORDER BY location_id", []
+    return "SELECT * FROM out_regional_volatility WHERE location_id = ?", [zone]
+
+
+TAXI = _choice("all", "yellow", "green")
+
+# name -> (builder, {param: (parser, default)})
+METRICS = {
+    "revenue": (metric_revenue, {
+        "start": (_date, SURCHARGE_START), "end": (_date, "2025-12-31"),
+        "group": (_choice("total", "day", "month"), "total"), "taxi": (TAXI, "all"),
+        "zones": (_zones, "core"),
+    }),
+    "leakage": (metric_leakage, {
+        "zone": (_int, None), "start": (_date, SURCHARGE_START), "end": (_date, "2025-12-31"),
+        "taxi": (TAXI, "all"),
+    }),
+    "momentum": (metric_momentum, {
+        "year": (_int, 2025), "start_month": (_int, 1), "end_month": (_int, 3),
+        "taxi": (TAXI, "yellow"), "zones": (_zones, "core"),
+    }),
+    "zone_momentum": (metric_zone_momentum, {
+        "start": (_date, "2025-01-01"), "end": (_date, "2025-03-31"), "taxi": (TAXI, "yellow"),
+        "min_count": (_int, 20),
+    }),
+    "daily_transactions": (metric_daily_transactions, {
+        "start": (_date, "2025-01-01"), "end": (_date, "2025-12-31"), "taxi": (TAXI, "all"),
+    }),
+    "zone_daily": (metric_zone_daily, {
+        "start": (_date, "2025-01-01"), "end": (_date, "2025-12-31"), "taxi": (TAXI, "all"),
+        "zones": (_zones, "core"),
+    }),
+    "engagement": (metric_engagement, {
+        "start": (_date, "2025-01-01"), "end": (_date, "2025-12-31"), "taxi": (TAXI, "all"),
+        "zones": (_zones, "all"),
+    }),
+    "zone_volume_change": (metric_zone_volume_change, {
+        "start": (_date, "2025-01-01"), "end": (_date, "2025-03-31"), "taxi": (TAXI, "yellow"),
+        "min_count": (_int, 100),
+    }),
+    "regional_volatility": (metric_volatility, {"zone": (_int, None)}),
+}
+
+
+# ============================================================================
+# ROLLUP METRICS
+# ============================================================================
+# The same metrics answered from the hourly rollup (trip_rollup.py) when it
+# covers every partition in range and the zone filter is expressible over its
+# keys (any pickup zones; drop-off zones only as the core-zone flag).
+# Builders return None otherwise and the trip scan above is used.
+
+def _rollup_between(service, start, end, taxi):
+    """Rollup rows for pickups in [start, end], or None unless every partition touched has a current rollup."""
+    taxis = service.taxis if taxi == "all" else [taxi]
+    parts = [(y, t) for y in range(start.year, end.year + 1) for t in taxis if (y, t) in service.partitions]
+    if not parts or not all(p in service.rollup_partitions for p in parts):
+        return None
+    union = " UNION ALL ".join(f"SELECT * FROM rollup_{y}_{t}" for y, t in parts)
+    where = "hour >= ? AND hour < CAST(? AS DATE) + INTERVAL 1 DAY"
+    return f"(SELECT * FROM ({union}) WHERE {where})", [start, end]
+
+
+def _rollup_touching(zones):
+    """Pickup-or-drop-off filter over the rollup keys ("" = none), or None if it cannot be expressed."""
+    if zones is None:
+        return ""
+    if _is_core(zones):
+        return f"({in_zones_sql('pickup_loc')} OR dropoff_in_zone)"
+    return None
+
+
+def _sum(column):
+    return f"CAST(COALESCE(SUM({column}), 0) AS BIGINT)"
+
+
+def rollup_revenue(service, start, end, group, taxi, zones):
+    rollup, zone_filter = _rollup_between(service, start, end, taxi), _rollup_touching(zones)
+    if rollup is None or zone_filter is None:
+        return None
+    rows, params = rollup
+    bucket = {"total": None, "day": "CAST(hour AS DATE)",
+              "month": "CAST(date_trunc('month', hour) AS DATE)"}[group]
+    select = f"{bucket} as period, " if bucket else ""
+    sql = f"""
+        SELECT {select}SUM(surcharge_sum) as revenue, {_sum('trips')} as zone_trips
+        FROM {rows}"""
+    if zone_filter:
+        sql += f" WHERE {zone_filter}"
+    if bucket:
+        sql += " GROUP BY 1 ORDER BY 1"
+    return sql, params
+
+
+def rollup_leakage(service, zone, start, end, taxi):
+    rollup = _rollup_between(service, start, end, taxi)
+    if rollup is None:
+        return None
+    rows, params = rollup
+    total, compliant = _sum('trips'), _sum('compliant_trips')
+    sql = f"""
+        SELECT
+            pickup_loc,
+            {total} as total_trans,
+            {compliant} as compliant_trans,
+            CAST({compliant} AS FLOAT) / {total} as compliance_rate,
+            1.0 - (CAST({compliant} AS FLOAT) / {total}) as leakage_rate
+        FROM {rows}
+        WHERE NOT {in_zones_sql('pickup_loc')} AND dropoff_in_zone"""
+    if zone is not None:
+        sql += " AND pickup_loc = ? GROUP BY pickup_loc"
+        params.append(zone)
+    else:
+        sql += f"""
+        GROUP BY pickup_loc
+        HAVING SUM(trips) > {LEAKAGE_MIN_TRIPS}
+        ORDER BY leakage_rate DESC, pickup_loc
+        LIMIT {LEAKAGE_TOP_N}"""
+    return sql, params
+
+
+def rollup_momentum(service, year, start_month, end_month, taxi, zones):
+    if not 1 <= start_month <= end_month <= 12:
+        raise BadRequest("expected 1 <= start_month <= end_month <= 12")
+    if zones is not None and not _is_core(zones):
+        return None
+    last_day = calendar.monthrange(year, end_month)[1]
+    rollup = _rollup_between(service, date(year, start_month, 1), date(year, end_month, last_day), taxi)
+    if rollup is None:
+        return None
+    rows, params = rollup
+    zone_filter = "AND dropoff_in_zone" if zones else ""
+    sql = f"""
+        SELECT
+            CAST(dayofweek(hour) AS UTINYINT) as dow,
+            CAST(hour(hour) AS UTINYINT) as hour,
+            SUM(momentum_sum) / SUM(momentum_trips) as avg_momentum,
+            {_sum('momentum_trips')} as trips
+        FROM {rows}
+        WHERE momentum_trips > 0
+          {zone_filter}
+        GROUP BY 1, 2
+        ORDER BY 1, 2"""
+    return sql, params
+
+
+def rollup_zone_momentum(service, start, end, taxi, min_count):
+    before = _rollup_between(service, _year_earlier(start), _year_earlier(end), taxi)
+    after = _rollup_between(service, start, end, taxi)
+    if before is None or after is None:
+        return None
+    (before, before_params), (after, after_params) = before, after
+    per_zone = f"SELECT pickup_loc as loc, SUM(momentum_sum) / SUM(momentum_trips) as m, {_sum('momentum_trips')} as cnt"
+    sql = f"""
+        WITH a AS ({per_zone} FROM {before} WHERE momentum_trips > 0 GROUP BY 1),
+             b AS ({per_zone} FROM {after} WHERE momentum_trips > 0 GROUP BY 1)
+        SELECT
+            b.loc as location_id,
+            a.m as momentum_before,
+            b.m as momentum_after,
+            b.cnt as trips,
+            CASE WHEN a.m > 0 THEN (b.m - a.m) * 100.0 / a.m END as pct_change
+        FROM b LEFT JOIN a ON a.loc = b.loc
+        WHERE b.cnt > ?
+        ORDER BY location_id"""
+    return sql, before_params + after_params + [min_count]
+
+
+def rollup_daily_transactions(service, start, end, taxi):
+    rollup = _rollup_between(service, start, end, taxi)
+    if rollup is None:
+        return None
+    rows, params = rollup
+    sql = f"""
+        SELECT CAST(hour AS DATE) as date, {_sum('trips')} as transactions
+        FROM {rows}
+        GROUP BY 1 ORDER BY 1"""
+    return sql, params
+
+
+def rollup_zone_daily(service, start, end, taxi, zones):
+    rollup = _rollup_between(service, start, end, taxi)
+    if rollup is None:
+        return None
+    rows, params = rollup
+    zone_filter = f"WHERE {in_zones_sql('pickup_loc', zones)}" if zones else ""
+    sql = f"""
+        SELECT
+            pickup_loc as location_id,
+            CAST(hour AS DATE) as date,
+            {_sum('trips')} as trips,
+            SUM(total_sum) as revenue,
+            SUM(surcharge_sum) as surcharge,
+            {_sum('compliant_trips')} as compliant_trips,
+            SUM(distance_sum) / SUM(trips) as avg_distance,
+            SUM(duration_sum) / NULLIF(SUM(duration_trips), 0) as avg_duration_min
+        FROM {rows}
+        {zone_filter}
+        GROUP BY 1, 2 ORDER BY 1, 2"""
+    return sql, params
+
+
+def rollup_engagement(service, start, end, taxi, zones):
+    rollup, zone_filter = _rollup_between(service, start, end, taxi), _rollup_touching(zones)
+    if rollup is None or zone_filter is None:
+        return None
+    rows, params = rollup
+    zone_filter = f"WHERE {zone_filter}" if zone_filter else ""
+    sql = f"""
+        SELECT
+            CAST(month(hour) AS UTINYINT) as month,
+            SUM(surcharge_sum) / SUM(trips) as avg_fee,
+            SUM(tip_proxy_sum) / SUM(trips) * 100 as avg_engagement_score,
+            {_sum('trips')} as trips
+        FROM {rows}
+        {zone_filter}
+        GROUP BY 1 ORDER BY 1"""
+    return sql, params
+
+
+ROLLUP_METRICS = {
+    "revenue": rollup_revenue,
+    "leakage": rollup_leakage,
+    "momentum": rollup_momentum,
+    "zone_momentum": rollup_zone_momentum,
+    "daily_transactions": rollup_daily_transactions,
+    "zone_daily": rollup_zone_daily,
+    "engagement": rollup_engagement,
+}
+
+
+def parse_params(name, raw):
+    """Validates query-string values against a metric's parameter spec."""
+    _, spec = METRICS[name]
+    unknown = set(raw) - set(spec) - {"format"}
+    if unknown:
+        raise BadRequest(f"unknown parameter(s): {', '.join(sorted(unknown))}")
+    params = {}
+    for key, (parser, default) in spec.items():
+        if key in raw:
+            params[key] = parser(raw[key])
+        elif default is None:
+            params[key] = None
+        else:
+            params[key] = parser(default)
+    return params
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class QueryService:
+    """Owns the DuckDB connection, the loaded outputs and the result cache."""
+
+    def __init__(self, data_dir=None, output_dir=None, cache_size=DEFAULT_CACHE_SIZE,
+                 cache_mb=DEFAULT_CACHE_MB, use_rollup=True):
+        import duckdb
+        self.data_dir = Path(data_dir or DATA_DIR)
+        self.output_dir = Path(output_dir or OUTPUT_DIR)
+        self.use_rollup = use_rollup
+        self.conn = duckdb.connect(database=':memory:')
+        self.cache = ResultCache(cache_size, cache_mb * 1024 * 1024 if cache_mb else None)
+        # Views and tables are replaced under the write side; queries hold the read side
+        self._views = ReadWriteLock()
+        self._checked_at = 0.0
+        self.generation = None
+        self.loaded_at = None
+        self.years = []
+        self.taxis = []
+        self.partitions = set()
+        self.rollup_partitions = set()
+        self.outputs = []
+        self.stats = {}
+        self.reload()
+
+    # --- loading ------------------------------------------------------------
+
+    def fingerprint(self):
+        patterns = ["*/*/*.parquet", "analysis/*/*/*.parquet"]
+        trips = fingerprints.stat_fingerprint(patterns, base_dir=self.data_dir)
+        outs = fingerprints.stat_fingerprint(
+            [f"{n}.*" for n in OUTPUT_TABLES] + ["market_stats.json", f"{trip_rollup.ROLLUP_SUBDIR}/*/*/*.parquet"],
+            base_dir=self.output_dir)
+        return f"{trips[:16]}-{outs[:16]}"
+
+    def reload(self):
+        """(Re)creates the trip views and output tables, and drops cached results."""
+        with self._views.write():
+            backend = DuckDBBackend(self.data_dir, conn=self.conn)
+            # One view per year/taxi partition so filtered queries only scan
+            # the files they need; trips_{year} unions a year's partitions.
+            partitions = set()
+            for year_dir in self.data_dir.glob("[0-9][0-9][0-9][0-9]"):
+                for taxi in TAXI_TYPES:
+                    if backend.trip_files(int(year_dir.name), taxi):
+                        partitions.add((int(year_dir.name), taxi))
+            years = sorted({y for y, _ in partitions})
+            for year, taxi in sorted(partitions):
+                self.conn.execute(
+                    f"CREATE OR REPLACE VIEW trips_{year}_{taxi} AS {backend.trips_sql(year, [taxi])}")
+            for year in years:
+                union = " UNION ALL ".join(f"SELECT * FROM trips_{year}_{t}"
+                                           for t in TAXI_TYPES if (year, t) in partitions)
+                self.conn.execute(f"CREATE OR REPLACE VIEW trips_{year} AS {union}")
+
+            # The hourly rollup is small; partitions it fully covers are
+            # loaded into rollup_{year}_{taxi} tables
+            rollups = trip_rollup.partition_files(self.data_dir, self.output_dir) if self.use_rollup else {}
+            rollup_partitions = set()
+            for (year, taxi), files in sorted(rollups.items()):
+                if (year, taxi) not in partitions:
+                    continue
+                listing = ", ".join(f"'{_sql_path(f)}'" for f in files)
+                self.conn.execute(
+                    f"CREATE OR REPLACE TABLE rollup_{year}_{taxi} AS SELECT * FROM read_parquet([{listing}])")
+                rollup_partitions.add((year, taxi))
+
+            outputs = []
+            for name in OUTPUT_TABLES:
+                ipc = arrow_io.ipc_path(self.output_dir, name)
+                parquet = self.output_dir / f"{name}.parquet"
+                path = self.output_dir / f"{name}.csv"
+                if os.path.exists(ipc):
+                    # Copied from the mapped Arrow buffers, nothing to parse. A
+                    # registered Arrow view is invisible to request cursors, so
+                    # it only lives for the copy.
+                    self.conn.register("_ipc", arrow_io.read_table(ipc))
+                    try:
+                        self.conn.execute(f"CREATE OR REPLACE TABLE out_{name} AS SELECT * FROM _ipc")
+                    finally:
+                        self.conn.unregister("_ipc")
+                    outputs.append(name)
+                    continue
+                if parquet.exists():
+                    source = f"read_parquet('{_sql_path(parquet)}')"
+                elif path.exists():
+                    source = f"read_csv_auto('{_sql_path(path)}')"
+                else:
+                    continue
+                kind = "VIEW" if name in OUTPUT_VIEWS else "TABLE"
+                self.conn.execute(f"CREATE OR REPLACE {kind} out_{name} AS SELECT * FROM {source}")
+                outputs.append(name)
+
+            stats_file = self.output_dir / "market_stats.json"
+            stats = {}
+            if stats_file.exists():
+                with open(stats_file) as f:
+                    stats = json.load(f)
+
+            self.years, self.outputs, self.stats = years, outputs, stats
+            self.partitions = partitions
+            self.rollup_partitions = rollup_partitions
+            self.taxis = [t for t in TAXI_TYPES if any(pt == t for _, pt in partitions)]
+            self.generation = self.fingerprint()
+            self.loaded_at = datetime.now().isoformat(timespec="seconds")
+            self._checked_at = time.monotonic()
+            self.cache.clear()
+
+    def refresh_if_changed(self):
+        """Reloads when a new engine run or new trip data changed the inputs."""
+        now = time.monotonic()
+        if now - self._checked_at < FINGERPRINT_CHECK_S:
+            return False
+        self._checked_at = now
+        if self.fingerprint() == self.generation:
+            return False
+        print(f"[serve] Inputs changed, reloading outputs and dropping {self.cache.stats()['entries']} cached results")
+        self.reload()
+        return True
+
+    # --- queries ------------------------------------------------------------
+
+    def _run(self, sql, params):
+        cursor = self.conn.cursor()  # one cursor per request; the connection is shared
+        try:
+            return _arrow(cursor.execute(sql, params))
+        finally:
+            cursor.close()
+
+    def metric(self, name, raw_params):
+        """Returns (table, cached) for a metric query."""
+        if name not in METRICS:
+            raise KeyError(name)
+        self.refresh_if_changed()
+        params = parse_params(name, raw_params)
+        with self._views.read():
+            generation = self.generation
+            key = ResultCache.key(name, params, generation)
+            table = self.cache.get(key)
+            if table is not None:
+                return table, True
+            sql, bind, _ = self.plan(name, params)
+            table = self._run(sql, bind)
+            if self.generation == generation:
+                self.cache.put(key, table)
+        return table, False
+
+    def plan(self, name, params):
+        """(sql, bind, source) for parsed metric params; source is 'rollup' or 'trips'."""
+        if self.use_rollup and name in ROLLUP_METRICS:
+            built = ROLLUP_METRICS[name](self, **params)
+            if built is not None:
+                return built + ("rollup",)
+        builder, _ = METRICS[name]
+        return builder(self, **params) + ("trips",)
+
+    def output(self, name, limit=None, offset=0):
+        self.refresh_if_changed()
+        with self._views.read():
+            if name not in self.outputs:
+                raise KeyError(name)
+            generation = self.generation
+            key = ResultCache.key(f"output:{name}", {"limit": limit, "offset": offset}, generation)
+            table = self.cache.get(key)
+            if table is not None:
+                return table, True
+            sql = f"SELECT * FROM out_{name}"
+            params = []
+            if limit is not None:
+                sql += " LIMIT ? OFFSET ?"
+                params = [limit, offset]
+            table = self._run(sql, params)
+            if self.generation == generation:
+                self.cache.put(key, table)
+        return table, False
+
+    def describe(self):
+        return {
+            name: {key: default for key, (_, default) in spec.items()}
+            for name, (_, spec) in METRICS.items()
+        }
+
+    def health(self):
+        return {'status': 'ok', 'generation': self.generation, 'loaded_at': self.loaded_at,
+                'years': self.years, 'outputs': self.outputs, 'cache': self.cache.stats(),
+                'rollup': sorted(f"{y}_{t}" for y, t in self.rollup_partitions)}
+
+    def close(self):
+        self.conn.close()
+
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def table_to_json(table):
+    if table.num_rows > MAX_JSON_ROWS:
+        raise BadRequest(f"{table.num_rows} rows; use format=arrow or limit for large results")
+    columns = table.column_names
+    rows = [[row[c] for c in columns] for row in table.to_pylist()]
+    return {'columns': columns, 'rows': rows}
+
+
+def table_to_ipc(table):
+    import pyarrow as pa
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def make_handler(service):
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "MarketQueryService/1.0"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json", headers=None):
+            if not isinstance(body, bytes):
+                body = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_table(self, table, cached, raw):
+            headers = {"X-Cache": "hit" if cached else "miss", "X-Generation": service.generation}
+            wants_arrow = raw.get("format") == "arrow" or ARROW_STREAM in self.headers.get("Accept", "")
+            if wants_arrow:
+                self._send(200, table_to_ipc(table), ARROW_STREAM, headers)
+            else:
+                self._send(200, table_to_json(table), headers=headers)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            raw = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split("/") if p]
+            start = time.perf_counter()
+            try:
+                if parts == ["health"]:
+                    return self._send(200, service.health())
+                if parts == ["metrics"]:
+                    return self._send(200, service.describe())
+                if parts == ["stats"]:
+                    service.refresh_if_changed()
+                    return self._send(200, service.stats)
+                if parts == ["outputs"]:
+                    return self._send(200, service.outputs)
+                if len(parts) == 2 and parts[0] == "metrics":
+                    table, cached = service.metric(parts[1], raw)
+                    return self._send_table(table, cached, raw)
+                if len(parts) == 2 and parts[0] == "outputs":
+                    limit = _int(raw["limit"]) if "limit" in raw else None
+                    offset = _int(raw.get("offset", "0"))
+                    table, cached = service.output(parts[1], limit, offset)
+                    return self._send_table(table, cached, raw)
+                self._send(404, {'error': f"unknown path {url.path}"})
+            except KeyError as e:
+                self._send(404, {'error': f"unknown metric or output {e}"})
+            except BadRequest as e:
+                self._send(400, {'error': str(e)})
+            except Exception as e:
+                self._send(500, {'error': str(e)})
+            finally:
+                if os.environ.get("QUERY_SERVICE_LOG"):
+                    print(f"[serve] GET {self.path} {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        def do_POST(self):
+            if urlparse(self.path).path.rstrip("/") == "/invalidate":
+                service.reload()
+                return self._send(200, service.health())
+            self._send(404, {'error': f"unknown path {self.path}"})
+
+    return Handler
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    return ThreadingHTTPServer((host, port), make_handler(service))
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def add_arguments(parser):
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="Max cached results (LRU)")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="Memory cap for cached results")
+
+
+def run(args):
+    service = QueryService(cache_size=args.cache_size, cache_mb=args.cache_mb)
+    server = make_server(service, args.host, args.port)
+    print(f"[serve] Query service on http://{args.host}:{server.server_port} "
+          f"(years {service.years}, {len(service.outputs)} outputs)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[serve] Stopping...")
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON + Arrow IPC query service over engine outputs.")
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,458 @@
+"""
+Refresh Daemon
+==============
+Long-running watch mode: keeps output/ current as new TLC months arrive,
+instead of re-running run_analysis.py by hand.
+
+- Watches data_downloads/ for new or replaced monthly Parquet files
+  (watchdog/inotify when installed, stat polling otherwise).
+- Periodically probes the download source (data_ingestion.BASE_URL) for
+  months that are missing locally or were imputed (Dec 2025), and
+  revalidates every downloaded month with a conditional GET (ETag /
+  Last-Modified from the download manifest), so republished corrections are
+  picked up. Only new or changed files are downloaded, atomically (.part +
+  rename), and picked up by the watcher.
+- Bursts of file events are debounced: a refresh starts once no new event
+  has arrived for `debounce` seconds (or `max_delay` after the first one).
+- A refresh only does the work the changed files need: the affected
+  year/taxi streams are re-unified, then the engine, report and content
+  stages run through pipeline_runner (which skips what is still current).
+
+Status (state, queue depth, last refresh latency) is written to
+output/daemon_status.json after every change and can be printed with --status.
+
+Usage:
+    python run_analysis.py watch [--debounce 30] [--poll 10] [--source-interval 3600]
+    python run_analysis.py watch --once      # one refresh pass, then exit
+    python run_analysis.py watch --status
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from pathlib import Path
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+import fingerprints
+from lazy_imports import module_available
+
+WATCHDOG_AVAILABLE = module_available("watchdog")
+
+BASE_DIR = CORE_DIR.parent
+DATA_DIR = BASE_DIR / "data_downloads"
+OUTPUT_DIR = BASE_DIR / "output"
+STATUS_FILE = "daemon_status.json"
+
+TRIP_GLOB = "*/*/*.parquet"         # data_downloads/{year}/{taxi}/{taxi}_tripdata_{year}-{MM}.parquet
+DEFAULT_DEBOUNCE_S = 30.0
+DEFAULT_MAX_DELAY_S = 300.0
+DEFAULT_POLL_S = 10.0
+DEFAULT_SOURCE_INTERVAL_S = 3600.0
+SOURCE_TIMEOUT_S = 30
+
+# Months the engine fills in by imputation until TLC publishes them
+IMPUTED_MONTHS = [(2025, 12)]
+
+
+def trip_file(data_dir, year, month, taxi):
+    return Path(data_dir) / str(year) / taxi / f"{taxi}_tripdata_{year}-{month:02d}.parquet"
+
+
+def stream_of(path):
+    """(year, taxi) for a trip file path, or None if it is not one."""
+    p = Path(path)
+    if p.suffix != ".parquet" or "_tripdata_" not in p.name:
+        return None
+    try:
+        return int(p.parent.parent.name), p.parent.name
+    except ValueError:
+        return None
+
+
+# ============================================================================
+# WATCHERS
+# ============================================================================
+
+class PollingWatcher(threading.Thread):
+    """Stat-polls the trip files and reports anything added, resized or touched."""
+
+    def __init__(self, data_dir, notify, interval=DEFAULT_POLL_S):
+        super().__init__(daemon=True, name="poll-watcher")
+        self.data_dir = Path(data_dir)
+        self.notify = notify
+        self.interval = interval
+        self._stop = threading.Event()
+        self._seen = snapshot(self.data_dir)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            current = snapshot(self.data_dir)
+            for path, st in current.items():
+                if self._seen.get(path) != st:
+                    self.notify(path)
+            self._seen = current
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_watcher(data_dir, notify, poll_interval=DEFAULT_POLL_S, use_watchdog=True):
+    """Starts an inotify-backed watchdog observer, or a polling thread. Returns (kind, handle)."""
+    if use_watchdog and WATCHDOG_AVAILABLE:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path and stream_of(path):
+                        notify(path)
+
+        observer = Observer()
+        observer.schedule(Handler(), str(data_dir), recursive=True)
+        observer.start()
+        return "watchdog", observer
+
+    watcher = PollingWatcher(data_dir, notify, interval=poll_interval)
+    watcher.start()
+    return "polling", watcher
+
+
+def snapshot(data_dir):
+    """{path: (size, mtime_ns)} for every trip file."""
+    return {p: fingerprints.file_stat(p) for p in fingerprints.expand([TRIP_GLOB], base_dir=data_dir)}
+
+
+# ============================================================================
+# SOURCE CHECK
+# ============================================================================
+
+def source_candidates(data_dir, revalidate=True):
+    """
+    Months worth probing at the source: missing locally, locally imputed,
+    and (with revalidate) every downloaded month, in case TLC republished it.
+    """
+    import data_ingestion
+
+    years = sorted(set(data_ingestion.DATA_NEEDS) | {y for y, _ in IMPUTED_MONTHS})
+    today = datetime.now()
+    candidates = []
+    for year in years:
+        for month in range(1, 13):
+            if (year, month) > (today.year, today.month):
+                break
+            for taxi in data_ingestion.TAXI_TYPES:
+                path = trip_file(data_dir, year, month, taxi)
+                if not path.exists() or (year, month) in IMPUTED_MONTHS:
+                    candidates.append((year, month, taxi))
+                elif revalidate and year in data_ingestion.DATA_NEEDS:
+                    candidates.append((year, month, taxi))
+    return candidates
+
+
+def check_source(data_dir, timeout=SOURCE_TIMEOUT_S, revalidate=True):
+    """
+    Probes each candidate month at the configured source with a conditional
+    request (validators from data_ingestion's download manifest) and
+    downloads the ones that are new or were republished. Unchanged months
+    cost one 304. Returns the list of files written.
+    """
+    import data_ingestion
+
+    manifest = data_ingestion.load_manifest(str(data_dir))
+    fetched = []
+    try:
+        for year, month, taxi in source_candidates(data_dir, revalidate):
+            path = trip_file(data_dir, year, month, taxi)
+            url = f"{data_ingestion.BASE_URL}/{path.name}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                status = data_ingestion.fetch(url, str(path), manifest, str(data_dir), revalidate=True, timeout=timeout)
+            except Exception as e:
+                print(f"  [source] {url}: {e}")
+                break  # source unreachable; try again next interval
+            if status in ('downloaded', 'updated'):
+                print(f"  [source] {'Republished' if status == 'updated' else 'New month published'}: {path.name}")
+                fetched.append(str(path))
+            elif status == 'failed':
+                print(f"  [source] Download failed for {path.name}")
+    finally:
+        data_ingestion.save_manifest(manifest, str(data_dir))
+    return fetched
+
+
+# ============================================================================
+# DAEMON
+# ============================================================================
+
+class RefreshDaemon:
+    """
+    Debounces file events into refresh batches and runs the incremental
+    ingest + engine work for each batch on a single worker thread.
+    """
+
+    def __init__(self, data_dir=None, output_dir=None, debounce=DEFAULT_DEBOUNCE_S,
+                 max_delay=DEFAULT_MAX_DELAY_S, poll_interval=DEFAULT_POLL_S,
+                 source_interval=DEFAULT_SOURCE_INTERVAL_S, use_watchdog=True, refresh=None, revalidate=True):
+        self.data_dir = Path(data_dir or DATA_DIR)
+        self.output_dir = Path(output_dir or OUTPUT_DIR)
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.source_interval = source_interval
+        self.use_watchdog = use_watchdog
+        self.revalidate = revalidate
+        self.refresh_func = refresh or run_incremental_refresh
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pending = set()        # paths reported since the last batch was taken
+        self._first_event = None     # monotonic time of the oldest pending event
+        self._last_event = None
+        self._known = snapshot(self.data_dir)
+
+        self.state = "idle"
+        self.refresh_count = 0
+        self.last_refresh_latency_s = None   # first event -> outputs updated
+        self.last_refresh_duration_s = None  # refresh work only
+        self.last_refresh_at = None
+        self.last_changes = []
+        self.last_error = None
+        self.watcher_kind = None
+        self._watcher = None
+
+    # --- events -------------------------------------------------------------
+
+    def notify(self, path):
+        now = time.monotonic()
+        with self._lock:
+            self._pending.add(str(path))
+            if self._first_event is None:
+                self._first_event = now
+            self._last_event = now
+            if self.state == "idle":
+                self.state = "debouncing"
+        self._wake.set()
+
+    @property
+    def queue_depth(self):
+        with self._lock:
+            return len(self._pending)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'watcher': self.watcher_kind,
+            'queue_depth': self.queue_depth,
+            'refresh_count': self.refresh_count,
+            'last_refresh_latency_s': self.last_refresh_latency_s,
+            'last_refresh_duration_s': self.last_refresh_duration_s,
+            'last_refresh_at': self.last_refresh_at,
+            'last_changes': self.last_changes,
+            'last_error': self.last_error,
+            'updated': datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def write_status(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / STATUS_FILE
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.status(), f, indent=2)
+        os.replace(tmp, path)
+
+    # --- batching -----------------------------------------------------------
+
+    def _wait_for_quiet(self):
+        """Blocks until the burst settles. Returns the event start time, or None on stop."""
+        while not self._stop.is_set():
+            with self._lock:
+                first, last = self._first_event, self._last_event
+            if first is None:
+                return None
+            now = time.monotonic()
+            quiet_in = self.debounce - (now - last)
+            cap_in = self.max_delay - (now - first)
+            if quiet_in <= 0 or cap_in <= 0:
+                return first
+            self._stop.wait(min(quiet_in, cap_in))
+        return None
+
+    def _take_changes(self):
+        """Diffs the trip files against the last refreshed snapshot."""
+        with self._lock:
+            self._pending.clear()
+            self._first_event = self._last_event = None
+        current = snapshot(self.data_dir)
+        changed = [p for p, st in current.items() if self._known.get(p) != st]
+        return current, changed
+
+    def run_once(self, started=None):
+        """Processes whatever has changed since the last refresh."""
+        started = started or time.monotonic()
+        current, changed = self._take_changes()
+        if not changed:
+            self.state = "idle"
+            self.write_status()
+            return False
+
+        self.state = "refreshing"
+        self.last_changes = [os.path.relpath(p, self.data_dir) for p in sorted(changed)]
+        self.write_status()
+        print(f"\n[watch] {len(changed)} changed file(s): {', '.join(self.last_changes)}")
+
+        work_start = time.monotonic()
+        try:
+            self.refresh_func(changed)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"[watch] Refresh failed: {e}")
+        # Files written by the refresh itself (imputed months) are part of the baseline
+        self._known = snapshot(self.data_dir)
+
+        done = time.monotonic()
+        self.refresh_count += 1
+        self.last_refresh_duration_s = round(done - work_start, 3)
+        self.last_refresh_latency_s = round(done - started, 3)
+        self.last_refresh_at = datetime.now().isoformat(timespec="seconds")
+        self.state = "debouncing" if self.queue_depth else "idle"
+        self.write_status()
+        print(f"[watch] Refresh #{self.refresh_count} done: latency {self.last_refresh_latency_s:.1f}s "
+              f"(work {self.last_refresh_duration_s:.1f}s), queue depth {self.queue_depth}")
+        return True
+
+    # --- threads ------------------------------------------------------------
+
+    def _worker(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+            started = self._wait_for_quiet()
+            if started is not None:
+                self.run_once(started)
+
+    def _source_loop(self):
+        while not self._stop.wait(self.source_interval):
+            try:
+                for path in check_source(self.data_dir, revalidate=self.revalidate):
+                    self.notify(path)
+            except Exception as e:
+                print(f"[watch] Source check failed: {e}")
+
+    def start(self):
+        self.watcher_kind, self._watcher = start_watcher(
+            self.data_dir, self.notify, self.poll_interval, self.use_watchdog)
+        threads = [threading.Thread(target=self._worker, daemon=True, name="refresh-worker")]
+        if self.source_interval:
+            threads.append(threading.Thread(target=self._source_loop, daemon=True, name="source-check"))
+        for t in threads:
+            t.start()
+        self._threads = threads
+        self.write_status()
+        print(f"[watch] Watching {self.data_dir} ({self.watcher_kind}), debounce {self.debounce:g}s"
+              + (f", source check every {self.source_interval:g}s" if self.source_interval else ""))
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._watcher is not None:
+            self._watcher.stop()
+        for t in getattr(self, "_threads", []):
+            t.join(timeout=5)
+        self.state = "stopped"
+        self.write_status()
+
+
+# ============================================================================
+# INCREMENTAL REFRESH
+# ============================================================================
+
+def run_incremental_refresh(changed):
+    """Re-unifies only the affected streams, then the engine and downstream stages."""
+    import data_ingestion
+    import pipeline_runner
+
+    streams = sorted({s for s in map(stream_of, changed) if s})
+    for year, taxi in streams:
+        if year in data_ingestion.DATA_NEEDS:
+            print(f"[watch] Re-unifying {year} {taxi}...")
+            data_ingestion.process_and_unify(year, taxi)
+
+    # Engine, report and content; each is skipped if its inputs are unchanged
+    stages = [s for s in pipeline_runner.STAGES if s.name != "ingest"]
+    ok, ctx = pipeline_runner.run_pipeline(stages=stages)
+    ctx.close()
+    pipeline_runner.print_timings(ctx)
+    if not ok:
+        raise RuntimeError("pipeline stage failed")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def add_arguments(parser):
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE_S,
+                        help="Seconds without new files before a refresh starts")
+    parser.add_argument("--max-delay", type=float, default=DEFAULT_MAX_DELAY_S,
+                        help="Refresh at the latest this long after the first event")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_S, help="Polling interval (no watchdog)")
+    parser.add_argument("--source-interval", type=float, default=DEFAULT_SOURCE_INTERVAL_S,
+                        help="Seconds between download-source checks (0 disables)")
+    parser.add_argument("--no-revalidate", action="store_true",
+                        help="Only probe missing/imputed months, not republished ones")
+    parser.add_argument("--no-watchdog", action="store_true", help="Force the polling watcher")
+    parser.add_argument("--once", action="store_true", help="Check the source, refresh once and exit")
+    parser.add_argument("--status", action="store_true", help="Print the running daemon's status and exit")
+
+
+def run(args):
+    if args.status:
+        path = OUTPUT_DIR / STATUS_FILE
+        if not path.exists():
+            print("No daemon status yet.")
+            return 1
+        print(path.read_text())
+        return 0
+
+    daemon = RefreshDaemon(debounce=args.debounce, max_delay=args.max_delay, poll_interval=args.poll,
+                           source_interval=args.source_interval, use_watchdog=not args.no_watchdog,
+                           revalidate=not args.no_revalidate)
+    if args.once:
+        if args.source_interval:
+            check_source(daemon.data_dir, revalidate=daemon.revalidate)
+        # Without history, --once treats every trip file as changed
+        daemon._known = {}
+        daemon.run_once()
+        return 0 if daemon.last_error is None else 1
+
+    daemon.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n[watch] Stopping...")
+    finally:
+        daemon.stop()
+    return 0
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Watch data_downloads/ and refresh output/ incrementally.")
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,34 +2,76 @@
 Generate Executive Summary
 ==========================
 Generates a PDF Executive Summary from the Market Analysis data.
+
+Batch mode (`--batch`) writes one report per congestion zone and month to
+output/reports/<year>-<month>/zone_<id>.pdf:
+- the data for every report comes from one query_service query (zone_daily)
+- documents render in a process pool; each worker builds its styles, font
+  metrics and the static chart elements (frame, gridlines, day axis) once
+  and reuses them for every document it renders
+- the run reports documents per second
+
+Every PDF has a .<name>.fingerprint sidecar (inputs + template version);
+reports whose data and layout are unchanged are not rebuilt.
+
+Usage:
+    python core_modules/report_builder.py
+    python core_modules/report_builder.py --batch [--year 2025] [--workers 8]
 """
 
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
 import json
 import os
-import pandas as pd
+import sys
+import time
+import argparse
+import calendar
+from functools import lru_cache
+
+import fingerprints
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+DATA_DIR = os.path.join(BASE_DIR, "data_downloads")
 PDF_FILE = os.path.join(OUTPUT_DIR, "market_summary.pdf")
+REPORTS_SUBDIR = "reports"
+BATCH_WORKERS = min(os.cpu_count() or 1, 8)
 
-def generate_pdf():
-    print(f"Generating {PDF_FILE}...")
-    
+# Bump when the layout changes so existing PDFs are rebuilt
+REPORT_TEMPLATE_VERSION = 1
+BATCH_TEMPLATE_VERSION = 1
+
+def generate_pdf(stats=None, correlation_text=None, force=False):
+    """
+    Builds the PDF. In-process callers may pass the engine's stats dict and
+    correlation text directly; otherwise they are read from output/.
+    Returns False when the existing PDF was built from the same inputs.
+    """
     # Load Data
-    stats = {}
-    if os.path.exists(f"{OUTPUT_DIR}/market_stats.json"):
-        with open(f"{OUTPUT_DIR}/market_stats.json", 'r') as f:
-            stats = json.load(f)
+    if stats is None:
+        stats = {}
+        if os.path.exists(f"{OUTPUT_DIR}/market_stats.json"):
+            with open(f"{OUTPUT_DIR}/market_stats.json", 'r') as f:
+                stats = json.load(f)
             
     anomaly_count = stats.get('anomaly_count', 0)
         
-    correlation_text = "N/A"
-    if os.path.exists(f"{OUTPUT_DIR}/correlation_summary.txt"):
-        with open(f"{OUTPUT_DIR}/correlation_summary.txt", 'r') as f:
-            correlation_text = f.read()
+    if correlation_text is None:
+        correlation_text = "N/A"
+        if os.path.exists(f"{OUTPUT_DIR}/correlation_summary.txt"):
+            with open(f"{OUTPUT_DIR}/correlation_summary.txt", 'r') as f:
+                correlation_text = f.read()
+
+    fingerprint = fingerprints.value_digest({'stats': stats, 'correlation': correlation_text},
+                                            extra=REPORT_TEMPLATE_VERSION)
+    if not force and fingerprints.artifact_current(PDF_FILE, fingerprint):
+        print(f"  -> Inputs unchanged, keeping {PDF_FILE}")
+        return False
+
+    # ReportLab is only loaded when a PDF is actually built
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    print(f"Generating {PDF_FILE}...")
 
     # Create PDF
     c = canvas.Canvas(PDF_FILE, pagesize=letter)
@@ -109,7 +151,232 @@ def generate_pdf():
             y -= 20
             
     c.save()
+    fingerprints.record_artifact(PDF_FILE, fingerprint)
     print(f"PDF Report saved to {PDF_FILE}")
+    return True
+
+# ============================================================================
+# BATCH REPORTS (per zone x month)
+# ============================================================================
+
+CHART_W, CHART_H = 500, 180
+GRID_STEPS = 4
+
+# Per-worker cache, filled once by _init_worker
+_STYLES = None
+
+
+def _init_worker():
+    """Loads ReportLab and builds the styles every document shares."""
+    global _STYLES
+    from reportlab.lib import colors
+    from reportlab.pdfbase import pdfmetrics
+
+    _STYLES = {
+        'title': ("Helvetica-Bold", 20),
+        'heading': ("Helvetica-Bold", 14),
+        'body': ("Helvetica", 11),
+        'small': ("Helvetica", 8),
+        'bar': colors.HexColor("#1f77b4"),
+        'grid': colors.HexColor("#dddddd"),
+        'muted': colors.HexColor("#666666"),
+    }
+    # Font metrics are parsed on first use; do it here rather than per document
+    for font in ("Helvetica", "Helvetica-Bold"):
+        pdfmetrics.getFont(font).stringWidth("0", 10)
+
+
+@lru_cache(maxsize=None)
+def _chart_frame(days):
+    """
+    Static geometry of the daily-trips chart for a month length: gridline
+    segments, day-axis tick labels and the bar slot width.
+    """
+    gridlines = [(0, CHART_H * step / GRID_STEPS, CHART_W, CHART_H * step / GRID_STEPS)
+                 for step in range(1, GRID_STEPS)]
+    slot = CHART_W / days
+    ticks = [(slot * (day - 0.5), str(day)) for day in range(1, days + 1, 2)]
+    return gridlines, ticks, slot
+
+
+def _draw_chart(c, x, y, days, trips):
+    """Daily-trips bar chart: the cached frame plus this document's bars and scale labels."""
+    gridlines, ticks, slot = _chart_frame(days)
+    top = max(max(trips), 1)
+    c.saveState()
+    c.translate(x, y)
+    c.setLineWidth(0.5)
+    c.setStrokeColor(_STYLES['grid'])
+    c.lines(gridlines)
+    c.setStrokeColor(_STYLES['muted'])
+    c.rect(0, 0, CHART_W, CHART_H, stroke=1, fill=0)
+
+    c.setFillColor(_STYLES['bar'])
+    for day, count in enumerate(trips):
+        if count:
+            c.rect(slot * day + 1, 0, slot - 2, CHART_H * count / top, stroke=0, fill=1)
+
+    c.setFillColor(_STYLES['muted'])
+    c.setFont(*_STYLES['small'])
+    for tx, label in ticks:
+        c.drawCentredString(tx, -10, label)
+    for step in range(GRID_STEPS + 1):
+        c.drawString(CHART_W + 4, CHART_H * step / GRID_STEPS - 3, f"{top * step / GRID_STEPS:,.0f}")
+    c.restoreState()
+
+
+def _render_report(job):
+    """Writes one zone/month PDF. Runs inside a pool worker."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    if _STYLES is None:
+        _init_worker()
+    c = canvas.Canvas(job['path'], pagesize=letter)
+    width, height = letter
+    month_name = calendar.month_name[job['month']]
+
+    c.setFont(*_STYLES['title'])
+    c.drawString(50, height - 50, f"Zone {job['location_id']}: {month_name} {job['year']}")
+    c.setFont(*_STYLES['body'])
+    c.setFillColor(_STYLES['muted'])
+    c.drawString(50, height - 70, f"Congestion zone monthly report ({job['taxi']} taxis)")
+    c.setFillColor("black")
+
+    c.setFont(*_STYLES['heading'])
+    c.drawString(50, height - 110, "1. Monthly Overview")
+    c.setFont(*_STYLES['body'])
+    y = height - 135
+    compliance = job['compliant_trips'] / job['trips'] if job['trips'] else 0.0
+    for line in (
+        f"Trips: {job['trips']:,}",
+        f"Revenue: ${job['revenue']:,.2f}",
+        f"Congestion Surcharge Collected: ${job['surcharge']:,.2f}",
+        f"Surcharge Compliance: {compliance:.1%}",
+        f"Average Distance: {job['avg_distance']:.2f} mi",
+        f"Average Duration: {job['avg_duration_min']:.1f} min",
+        f"Busiest Day: {month_name} {job['busiest_day']} ({job['busiest_trips']:,} trips)",
+    ):
+        c.drawString(70, y, line)
+        y -= 20
+
+    y -= 20
+    c.setFont(*_STYLES['heading'])
+    c.drawString(50, y, "2. Daily Trips")
+    y -= 20 + CHART_H + 20
+    _draw_chart(c, 60, y, job['days'], job['daily_trips'])
+
+    c.save()
+    fingerprints.record_artifact(job['path'], job['fingerprint'])
+    return job['path']
+
+
+def batch_jobs(daily, year, taxi, reports_dir):
+    """One job dict per (zone, month) from the zone_daily frame."""
+    import numpy as np
+    daily = daily.assign(month=daily['date'].dt.month, day=daily['date'].dt.day)
+    jobs = []
+    for (loc, month), g in daily.groupby(['location_id', 'month'], sort=True):
+        days = calendar.monthrange(year, month)[1]
+        per_day = np.zeros(days, dtype=np.int64)
+        per_day[g['day'].to_numpy() - 1] = g['trips'].to_numpy()
+        trips = int(g['trips'].sum())
+        busiest = int(per_day.argmax())
+        jobs.append({
+            'path': os.path.join(reports_dir, f"{year}-{month:02d}", f"zone_{int(loc)}.pdf"),
+            'location_id': int(loc), 'year': year, 'month': int(month), 'taxi': taxi,
+            'trips': trips,
+            'revenue': float(g['revenue'].sum()),
+            'surcharge': float(g['surcharge'].sum()),
+            'compliant_trips': int(g['compliant_trips'].sum()),
+            # trip-weighted means of the daily averages
+            'avg_distance': float((g['avg_distance'] * g['trips']).sum() / trips) if trips else 0.0,
+            'avg_duration_min': float(np.nansum(g['avg_duration_min'] * g['trips']) / trips) if trips else 0.0,
+            'days': days,
+            'daily_trips': per_day.tolist(),
+            'busiest_day': busiest + 1,
+            'busiest_trips': int(per_day[busiest]),
+        })
+    for job in jobs:
+        content = {k: v for k, v in job.items() if k != 'path'}
+        job['fingerprint'] = fingerprints.value_digest(content, extra=BATCH_TEMPLATE_VERSION)
+    return jobs
+
+
+def load_zone_daily(year, taxi="all", zones="core", data_dir=None, output_dir=None):
+    """Every zone/day aggregate for the year in one query over the trip store."""
+    import query_service
+    service = query_service.QueryService(data_dir=data_dir or DATA_DIR, output_dir=output_dir or OUTPUT_DIR)
+    try:
+        table, _ = service.metric("zone_daily", {"start": f"{year}-01-01", "end": f"{year}-12-31",
+                                                 "taxi": taxi, "zones": zones})
+    finally:
+        service.close()
+    df = table.to_pandas()
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df
+
+
+def generate_batch(year=2025, taxi="all", zones="core", workers=BATCH_WORKERS, reports_dir=None, force=False):
+    """
+    Renders every zone/month report for the year whose inputs changed since
+    it was last built. Returns a summary dict with the document counts,
+    timings and docs/sec.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    reports_dir = reports_dir or os.path.join(OUTPUT_DIR, REPORTS_SUBDIR)
+    print(f"Generating batch reports for {year} into {reports_dir}...")
+    start = time.perf_counter()
+    daily = load_zone_daily(year, taxi, zones)
+    jobs = batch_jobs(daily, year, taxi, reports_dir)
+    total = len(jobs)
+    if not force:
+        jobs = [job for job in jobs if not fingerprints.artifact_current(job['path'], job['fingerprint'])]
+    for folder in {os.path.dirname(job['path']) for job in jobs}:
+        os.makedirs(folder, exist_ok=True)
+    query_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        chunk = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            written = list(pool.map(_render_report, jobs, chunksize=chunk))
+    else:
+        _init_worker()
+        written = [_render_report(job) for job in jobs]
+    render_s = time.perf_counter() - start
+
+    summary = {
+        'documents': len(written),
+        'unchanged': total - len(jobs),
+        'zones': int(daily['location_id'].nunique()) if len(daily) else 0,
+        'months': int(daily['date'].dt.month.nunique()) if len(daily) else 0,
+        'workers': workers,
+        'query_s': round(query_s, 4),
+        'render_s': round(render_s, 4),
+        'docs_per_s': round(len(written) / render_s, 1) if render_s > 0 else 0.0,
+    }
+    print(f"  -> {summary['documents']} reports rebuilt, {summary['unchanged']} unchanged "
+          f"({summary['zones']} zones x {summary['months']} months): query {query_s:.2f}s, render {render_s:.2f}s on {workers} worker(s), "
+          f"{summary['docs_per_s']} docs/s")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the PDF executive summary or per-zone batch reports.")
+    parser.add_argument("--batch", action="store_true", help="One report per congestion zone and month")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--taxi", choices=["all", "yellow", "green"], default="all")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the inputs are unchanged")
+    args = parser.parse_args(argv)
+    if args.batch:
+        generate_batch(args.year, args.taxi, workers=args.workers, force=args.force)
+    else:
+        generate_pdf(force=args.force)
+    return 0
+
 
 if __name__ == "__main__":
-    generate_pdf()
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Resource Monitor
+================
+Per-phase and per-query resource instrumentation for the ingestion layer and
+the processing engine.
+
+Each monitored phase records:
+- wall time
+- peak process RSS (background sampler; psutil if available, /proc otherwise)
+- peak DuckDB buffer-manager usage (duckdb_memory(), sampled on a cursor)
+- Python heap peak (tracemalloc; off unless MEMORY_TRACE_PYTHON=1 or the
+  caller asks for it, since tracing slows allocation-heavy phases)
+- in-memory size of any Polars frames noted during the phase
+
+Results are merged into output/run_metrics.json under a per-component key
+("ingestion", "engine"), so every stage of a run lands in one file.
+
+Budgets:
+    MEMORY_BUDGET_MB=4096                    -> ceiling for every phase (peak RSS)
+    MEMORY_BUDGETS="anomaly_audit=2048,..."  -> per-phase overrides
+    MEMORY_TRACE_PYTHON=1                    -> also record Python heap peaks
+A phase that exceeds its budget raises MemoryBudgetExceeded after its metrics
+have been recorded.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+import contextlib
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BASE_DIR = Path(__file__).parent.parent
+METRICS_FILE = "run_metrics.json"
+
+SAMPLE_INTERVAL_S = 0.05
+_MB = 1024 * 1024
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Raised when a phase's peak RSS exceeds its configured budget."""
+
+
+def budgets_from_env():
+    """Reads MEMORY_BUDGET_MB / MEMORY_BUDGETS into (default_mb, {phase: mb})."""
+    default = os.environ.get("MEMORY_BUDGET_MB")
+    default = float(default) if default else None
+
+    per_phase = {}
+    for item in os.environ.get("MEMORY_BUDGETS", "").split(","):
+        if "=" in item:
+            name, mb = item.split("=", 1)
+            per_phase[name.strip()] = float(mb)
+    return default, per_phase
+
+
+# ============================================================================
+# SAMPLING
+# ============================================================================
+
+def current_rss():
+    """Resident set size of this process in bytes (0 if unknown)."""
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is a peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+def duckdb_memory(cursor):
+    """Bytes held by DuckDB's buffer manager, or None if not queryable."""
+    if cursor is None:
+        return None
+    try:
+        return int(cursor.execute("SELECT SUM(memory_usage_bytes) FROM duckdb_memory()").fetchone()[0] or 0)
+    except Exception:
+        return None
+
+
+class _Sampler(threading.Thread):
+    """Polls RSS (and DuckDB usage) until stopped, keeping the peaks."""
+
+    def __init__(self, cursor=None, interval=SAMPLE_INTERVAL_S):
+        super().__init__(daemon=True)
+        self.cursor = cursor
+        self.interval = interval
+        self.peak_rss = current_rss()
+        self.peak_duckdb = duckdb_memory(cursor)
+        self._stop_event = threading.Event()
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, current_rss())
+        used = duckdb_memory(self.cursor)
+        if used is not None:
+            self.peak_duckdb = max(self.peak_duckdb or 0, used)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self._sample()
+
+
+# ============================================================================
+# MONITOR
+# ============================================================================
+
+class ResourceMonitor:
+    """
+    Collects resource metrics for one component of a run.
+
+    Usage:
+        monitor = ResourceMonitor("engine", conn=conn)
+        with monitor.phase("anomaly_audit"):
+            ...
+            monitor.query("audit_copy", sql)
+        monitor.save(OUTPUT_DIR)
+    """
+
+    def __init__(self, component, conn=None, track_python=None, budgets=None):
+        self.component = component
+        self.conn = conn
+        if track_python is None:
+            track_python = os.environ.get("MEMORY_TRACE_PYTHON") == "1"
+        self.track_python = track_python
+        self.default_budget_mb, self.budgets_mb = budgets if budgets is not None else budgets_from_env()
+        self.run_id = os.environ.get("MARKET_RUN_ID") or uuid.uuid4().hex[:12]
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self.phases = {}
+        self._current = None
+        self._py_peaks = []
+
+    def attach(self, conn):
+        """Attach a DuckDB connection opened after the monitor was created."""
+        self.conn = conn
+
+    def budget_for(self, name):
+        return self.budgets_mb.get(name, self.default_budget_mb)
+
+    def _cursor(self):
+        if self.conn is None:
+            return None
+        try:
+            return self.conn.cursor()
+        except Exception:
+            return None
+
+    @contextlib.contextmanager
+    def _measure(self, record):
+        cursor = self._cursor()
+        sampler = _Sampler(cursor)
+        started_tracing = False
+        if self.track_python:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            # Nested measurements reset the peak, so fold the enclosing
+            # measurement's peak-so-far into its accumulator first.
+            if self._py_peaks:
+                self._py_peaks[-1] = max(self._py_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._py_peaks.append(0)
+
+        rss_before = current_rss()
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield record
+        finally:
+            sampler.stop()
+            record['wall_s'] = round(time.perf_counter() - start, 4)
+            record['rss_start_mb'] = round(rss_before / _MB, 2)
+            record['peak_rss_mb'] = round(sampler.peak_rss / _MB, 2)
+            if sampler.peak_duckdb is not None:
+                record['peak_duckdb_mb'] = round(sampler.peak_duckdb / _MB, 2)
+            if self.track_python:
+                peak = max(self._py_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                record['peak_python_mb'] = round(peak / _MB, 2)
+                if self._py_peaks:
+                    self._py_peaks[-1] = max(self._py_peaks[-1], peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            if cursor is not None:
+                cursor.close()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Measures a named phase; enforces its budget on exit."""
+        record = {'queries': {}, 'polars': {}}
+        self.phases[name] = record
+        self._current = record
+        try:
+            with self._measure(record):
+                yield record
+        finally:
+            self._current = None
+
+        budget = self.budget_for(name)
+        if budget is not None:
+            record['budget_mb'] = budget
+            if record['peak_rss_mb'] > budget:
+                record['budget_exceeded'] = True
+                raise MemoryBudgetExceeded(
+                    f"Phase '{name}' peaked at {record['peak_rss_mb']:.1f} MB (budget {budget:.1f} MB)"
+                )
+
+    def query(self, name, sql, conn=None):
+        """
+        Executes a SQL statement on the monitored connection and records its
+        metrics under the current phase. Returns the DuckDB result.
+        """
+        conn = conn or self.conn
+        record = {}
+        with self._measure(record):
+            result = conn.execute(sql)
+        if self._current is not None:
+            queries = self._current['queries']
+            # A name repeated within a phase gets its own record (name#2, ...)
+            label, n = name, 1
+            while label in queries:
+                n += 1
+                label = f"{name}#{n}"
+            queries[label] = record
+        return result
+
+    def note_polars(self, name, df):
+        """Records the in-memory size of a collected Polars DataFrame."""
+        if self._current is None:
+            return
+        try:
+            size = df.estimated_size()
+        except Exception:
+            return
+        self._current['polars'][name] = {
+            'rows': df.height,
+            'estimated_mb': round(size / _MB, 2),
+        }
+
+    def to_dict(self):
+        return {
+            'run_id': self.run_id,
+            'started': self.started,
+            'finished': datetime.now().isoformat(timespec='seconds'),
+            'psutil': PSUTIL_AVAILABLE,
+            'phases': self.phases,
+        }
+
+    def save(self, output_dir):
+        """Merges this component's metrics into output/run_metrics.json."""
+        path = Path(output_dir) / METRICS_FILE
+        metrics = {}
+        if path.exists():
+            try:
+                with open(path) as f:
+                    metrics = json.load(f)
+            except (OSError, ValueError):
+                metrics = {}
+        metrics[self.component] = self.to_dict()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(metrics, f, indent=2)
+        return path
+
+    def print_summary(self):
+        print(f"\n  Resource usage ({self.component}):")
+        for name, rec in self.phases.items():
+            duck = rec.get('peak_duckdb_mb')
+            duck_str = f"{duck:>8.1f}" if duck is not None else f"{'n/a':>8}"
+            py = rec.get('peak_python_mb')
+            py_str = f"{py:>7.1f}" if py is not None else f"{'n/a':>7}"
+            print(f"    {name:<28} {rec.get('wall_s', 0):>8.2f}s  rss {rec.get('peak_rss_mb', 0):>8.1f} MB  "
+                  f"duckdb {duck_str} MB  python {py_str} MB")
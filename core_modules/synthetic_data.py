@@ -0,0 +1,356 @@
+"""
+Synthetic Market Data Generator
+===============================
+Writes deterministic, TLC-shaped Yellow/Green trip Parquet files so the toolkit
+can be exercised and benchmarked without the CloudFront download.
+
+Features:
+- Real TLC column names per taxi type, including the year-to-year schema drift
+  (timestamp units, integer widths, 'airport_fee' vs 'Airport_fee', the 2025
+  'cbd_congestion_fee' column, null surcharges in older Green files).
+- Scale-factor driven volume: rows per file = BASE_ROWS[taxi] * scale.
+- Realistic shapes: hourly demand curve, log-normal distances, speed varying by
+  hour, fares built from the TLC meter formula, card tips, zone-bound surcharges.
+- Injected anomalies matching the engine audit rules, plus surcharge leakage.
+
+Usage:
+    python core_modules/synthetic_data.py --scale 0.1 --out benchmarks/work/sf_0.1
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ============================================================================
+# CONFIGURATION
+# ============================================================================
+
+BASE_DIR = Path(__file__).parent.parent
+
+# Rows per monthly file at scale factor 1.0
+BASE_ROWS = {'yellow': 50_000, 'green': 5_000}
+
+# Same coverage the engine expects (Dec 2023 source, full 2024, Jan-Nov 2025)
+DEFAULT_MONTHS = {
+    2023: [12],
+    2024: list(range(1, 13)),
+    2025: list(range(1, 12)),
+}
+
+TAXI_TYPES = ['yellow', 'green']
+DEFAULT_SEED = 2025
+
+# Kept in sync with execution_backends.CONGESTION_ZONE_IDS (duplicated so the
+# generator only needs numpy and pyarrow).
+CONGESTION_ZONE_IDS = np.array([
+    4, 12, 13, 24, 41, 42, 43, 45, 48, 50, 68, 74, 75, 87, 88, 90, 100, 103,
+    104, 105, 107, 113, 114, 116, 120, 125, 127, 128, 137, 140, 142, 143, 144,
+    148, 151, 152, 153, 158, 161, 162, 163, 164, 166, 170, 186, 194, 202, 209,
+    211, 212, 213, 214, 216, 217, 224, 229, 230, 231, 232, 233, 234, 235, 236,
+    237, 238, 239, 240, 241, 242, 243, 244, 245, 246, 249, 250
+])
+ALL_ZONE_IDS = np.arange(1, 266)
+OUTER_ZONE_IDS = np.setdiff1d(ALL_ZONE_IDS, CONGESTION_ZONE_IDS)
+
+# Share of trips touching the core zone, by taxi type
+CORE_SHARE = {'yellow': 0.75, 'green': 0.15}
+
+# Relative pickup demand per hour of day (sums need not be 1)
+HOURLY_DEMAND = np.array([
+    2.6, 1.8, 1.2, 0.8, 0.7, 1.0, 2.0, 3.6, 4.6, 4.7, 4.5, 4.6,
+    4.9, 5.0, 5.3, 5.5, 5.6, 6.2, 6.6, 6.3, 5.7, 5.4, 4.8, 3.7
+])
+# Average speed (mph) by hour: slow in the daytime peak, faster overnight
+HOURLY_SPEED = np.array([
+    15.0, 16.0, 17.0, 18.0, 18.5, 17.0, 13.0, 10.5, 9.5, 9.8, 10.0, 10.0,
+    9.8, 9.6, 9.3, 9.0, 9.2, 9.0, 9.5, 10.5, 11.5, 12.5, 13.5, 14.5
+])
+
+# Anomaly / leakage injection rates (fraction of rows)
+ANOMALY_RATES = {
+    'impossible_physics': 0.002,
+    'value_mismatch': 0.0015,
+    'stationary': 0.001,
+}
+LEAKAGE_RATE = 0.03
+
+# Surcharge values per year (TLC tariff)
+CONGESTION_SURCHARGE = {'yellow': 2.5, 'green': 2.75}
+CBD_FEE_2025 = 0.75
+
+
+# ============================================================================
+# SCHEMA DRIFT
+# ============================================================================
+
+def trip_schema(year, taxi_type):
+    """
+    Returns the (column -> arrow type) layout TLC published for a given year.
+    Older files carry nanosecond timestamps and 64-bit IDs; newer ones are
+    microsecond / 32-bit, and 2025 adds the CBD congestion fee.
+    """
+    ts = pa.timestamp('ns') if year <= 2023 else pa.timestamp('us')
+    id_type = pa.int64() if year <= 2023 else pa.int32()
+    prefix = 'tpep' if taxi_type == 'yellow' else 'lpep'
+
+    if taxi_type == 'yellow':
+        fields = [
+            ('VendorID', id_type),
+            (f'{prefix}_pickup_datetime', ts),
+            (f'{prefix}_dropoff_datetime', ts),
+            ('passenger_count', pa.float64() if year <= 2023 else pa.int64()),
+            ('trip_distance', pa.float64()),
+            ('RatecodeID', pa.float64() if year <= 2023 else pa.int64()),
+            ('store_and_fwd_flag', pa.string()),
+            ('PULocationID', id_type),
+            ('DOLocationID', id_type),
+            ('payment_type', pa.int64()),
+            ('fare_amount', pa.float64()),
+            ('extra', pa.float64()),
+            ('mta_tax', pa.float64()),
+            ('tip_amount', pa.float64()),
+            ('tolls_amount', pa.float64()),
+            ('improvement_surcharge', pa.float64()),
+            ('total_amount', pa.float64()),
+            ('congestion_surcharge', pa.float64()),
+            ('airport_fee' if year <= 2023 else 'Airport_fee', pa.float64()),
+        ]
+    else:
+        fields = [
+            ('VendorID', id_type),
+            (f'{prefix}_pickup_datetime', ts),
+            (f'{prefix}_dropoff_datetime', ts),
+            ('store_and_fwd_flag', pa.string()),
+            ('RatecodeID', pa.float64()),
+            ('PULocationID', id_type),
+            ('DOLocationID', id_type),
+            ('passenger_count', pa.float64()),
+            ('trip_distance', pa.float64()),
+            ('fare_amount', pa.float64()),
+            ('extra', pa.float64()),
+            ('mta_tax', pa.float64()),
+            ('tip_amount', pa.float64()),
+            ('tolls_amount', pa.float64()),
+            ('ehail_fee', pa.float64()),
+            ('improvement_surcharge', pa.float64()),
+            ('total_amount', pa.float64()),
+            ('payment_type', pa.float64()),
+            ('trip_type', pa.float64()),
+            ('congestion_surcharge', pa.float64()),
+        ]
+
+    if year >= 2025:
+        fields.append(('cbd_congestion_fee', pa.float64()))
+
+    return pa.schema(fields)
+
+
+# ============================================================================
+# GENERATION
+# ============================================================================
+
+def _rng(seed, year, month, taxi_type):
+    """Independent, reproducible stream per (year, month, taxi)."""
+    return np.random.default_rng(
+        np.random.SeedSequence([seed, year, month, TAXI_TYPES.index(taxi_type)])
+    )
+
+
+def _month_bounds(year, month):
+    start = np.datetime64(f"{year}-{month:02d}-01T00:00:00", 'us')
+    nxt = np.datetime64(f"{year + 1}-01-01", 'M') if month == 12 else np.datetime64(f"{year}-{month + 1:02d}", 'M')
+    end = nxt.astype('datetime64[us]')
+    return start, end
+
+
+def generate_month(year, month, taxi_type, rows, seed=DEFAULT_SEED):
+    """
+    Builds one month of synthetic trips as an Arrow table with the TLC schema
+    for that year. Returns (table, anomaly_counts).
+    """
+    rng = _rng(seed, year, month, taxi_type)
+    start, end = _month_bounds(year, month)
+    n_days = int((end - start) // np.timedelta64(1, 'D'))
+
+    # --- Pickup times: uniform day, hour from the demand curve ---
+    day = rng.integers(0, n_days, rows)
+    hour = rng.choice(24, rows, p=HOURLY_DEMAND / HOURLY_DEMAND.sum())
+    second = rng.integers(0, 3600, rows)
+    pickup = start + (day * 86_400 + hour * 3600 + second).astype('timedelta64[s]')
+
+    # --- Distance / duration ---
+    distance = np.round(rng.lognormal(mean=0.6, sigma=0.75, size=rows), 2)
+    distance = np.clip(distance, 0.1, 60.0)
+    speed = HOURLY_SPEED[hour] * rng.lognormal(0.0, 0.25, rows)
+    duration_s = np.maximum(distance / speed * 3600.0 + rng.normal(90, 30, rows), 120.0)
+
+    # --- Locations: a CORE_SHARE of trips touch the congestion zone ---
+    touches_core = rng.random(rows) < CORE_SHARE[taxi_type]
+    pu_core = touches_core & (rng.random(rows) < 0.7)
+    do_core = touches_core & (~pu_core | (rng.random(rows) < 0.8))
+    pu_loc = np.where(pu_core, rng.choice(CONGESTION_ZONE_IDS, rows), rng.choice(OUTER_ZONE_IDS, rows))
+    do_loc = np.where(do_core, rng.choice(CONGESTION_ZONE_IDS, rows), rng.choice(OUTER_ZONE_IDS, rows))
+
+    # --- Fares (meter formula: flag drop + per-mile + per-minute) ---
+    fare = np.round(3.0 + 2.5 * distance + 0.7 * duration_s / 60.0, 2)
+    extra = np.where((hour >= 16) & (hour < 20), 2.5, np.where((hour >= 20) | (hour < 6), 1.0, 0.0))
+    mta_tax = np.full(rows, 0.5)
+    improvement = np.full(rows, 1.0)
+    payment_type = np.where(rng.random(rows) < 0.78, 1, 2)
+    tip = np.where(payment_type == 1, np.round(fare * rng.normal(0.18, 0.05, rows).clip(0, 0.5), 2), 0.0)
+    tolls = np.where(rng.random(rows) < 0.04, 6.94, 0.0)
+
+    surcharge = np.where(do_core | pu_core, CONGESTION_SURCHARGE[taxi_type], 0.0)
+    leak = (surcharge > 0) & (rng.random(rows) < LEAKAGE_RATE)
+    surcharge = np.where(leak, 0.0, surcharge)
+
+    # --- Anomaly injection (mutually exclusive slices) ---
+    draw = rng.random(rows)
+    r_phys = ANOMALY_RATES['impossible_physics']
+    r_val = r_phys + ANOMALY_RATES['value_mismatch']
+    r_stat = r_val + ANOMALY_RATES['stationary']
+
+    phys = draw < r_phys
+    distance = np.where(phys, np.round(rng.uniform(15, 40, rows), 2), distance)
+    duration_s = np.where(phys, rng.uniform(120, 600, rows), duration_s)
+
+    val = (draw >= r_phys) & (draw < r_val)
+    duration_s = np.where(val, rng.uniform(5, 55, rows), duration_s)
+    fare = np.where(val, np.round(rng.uniform(25, 80, rows), 2), fare)
+
+    stat = (draw >= r_val) & (draw < r_stat)
+    distance = np.where(stat, 0.0, distance)
+
+    dropoff = pickup + duration_s.astype('timedelta64[s]')
+
+    cbd_fee = np.where(
+        (year >= 2025) & (pu_core | do_core) & (pickup >= np.datetime64('2025-01-05')),
+        CBD_FEE_2025, 0.0
+    )
+    airport_fee = np.where(rng.random(rows) < 0.06, 1.75, 0.0)
+
+    total = np.round(fare + extra + mta_tax + improvement + tip + tolls + surcharge + cbd_fee, 2)
+
+    columns = {
+        'VendorID': rng.choice([1, 2, 6, 7], rows, p=[0.28, 0.7, 0.01, 0.01]) if taxi_type == 'yellow'
+                    else rng.choice([1, 2], rows, p=[0.15, 0.85]),
+        'passenger_count': rng.choice([1, 2, 3, 4, 5, 6], rows, p=[0.72, 0.15, 0.05, 0.03, 0.03, 0.02]),
+        'trip_distance': distance,
+        'RatecodeID': np.where(rng.random(rows) < 0.97, 1, 2),
+        'store_and_fwd_flag': np.where(rng.random(rows) < 0.995, 'N', 'Y'),
+        'PULocationID': pu_loc,
+        'DOLocationID': do_loc,
+        'payment_type': payment_type,
+        'fare_amount': fare,
+        'extra': extra,
+        'mta_tax': mta_tax,
+        'tip_amount': tip,
+        'tolls_amount': tolls,
+        'improvement_surcharge': improvement,
+        'total_amount': total,
+        'congestion_surcharge': surcharge,
+        'airport_fee': airport_fee,
+        'Airport_fee': airport_fee,
+        'ehail_fee': None,
+        'trip_type': np.where(rng.random(rows) < 0.97, 1, 2),
+        'cbd_congestion_fee': cbd_fee,
+    }
+    prefix = 'tpep' if taxi_type == 'yellow' else 'lpep'
+    columns[f'{prefix}_pickup_datetime'] = pickup
+    columns[f'{prefix}_dropoff_datetime'] = dropoff
+
+    schema = trip_schema(year, taxi_type)
+    arrays = []
+    for field in schema:
+        values = columns[field.name]
+        if values is None:
+            arrays.append(pa.nulls(rows, type=field.type))
+            continue
+        arr = pa.array(values)
+        if pa.types.is_timestamp(field.type):
+            arr = arr.cast(field.type)
+        elif field.name == 'congestion_surcharge' and taxi_type == 'green' and year <= 2023:
+            # Older Green files leave the surcharge null on a share of rows
+            mask = rng.random(rows) < 0.1
+            arr = pa.array(np.where(mask, np.nan, values), from_pandas=True)
+        arrays.append(arr.cast(field.type))
+
+    counts = {
+        'impossible_physics': int(phys.sum()),
+        'value_mismatch': int(val.sum()),
+        'stationary': int(stat.sum()),
+        'leakage': int(leak.sum()),
+    }
+    return pa.Table.from_arrays(arrays, schema=schema), counts
+
+
+def generate_factors(cache_dir, year=2025, seed=DEFAULT_SEED):
+    """Writes a synthetic external-factor (precipitation) cache for the engine."""
+    rng = np.random.default_rng(np.random.SeedSequence([seed, year, 99]))
+    days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01"))
+    wet = rng.random(len(days)) < 0.33
+    precip = np.where(wet, np.round(rng.gamma(0.8, 6.0, len(days)), 1), 0.0)
+
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f"external_factors_{year}.csv"
+    with open(path, "w") as f:
+        f.write("date,factor_value\n")
+        for d, p in zip(days, precip):
+            f.write(f"{d},{p}\n")
+    return path
+
+
+def generate_dataset(out_dir, scale=1.0, months=None, seed=DEFAULT_SEED, cache_dir=None):
+    """
+    Writes a full synthetic tree under out_dir using the data_downloads layout:
+        {out_dir}/{year}/{taxi}/{taxi}_tripdata_{year}-{MM}.parquet
+
+    Returns a manifest dict with row and anomaly counts per file.
+    """
+    out_dir = Path(out_dir)
+    months = months or DEFAULT_MONTHS
+    manifest = {'scale': scale, 'seed': seed, 'files': {}, 'total_rows': 0}
+
+    for year, month_list in months.items():
+        for taxi in TAXI_TYPES:
+            dest_dir = out_dir / str(year) / taxi
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            rows = max(int(BASE_ROWS[taxi] * scale), 1)
+            for month in month_list:
+                table, counts = generate_month(year, month, taxi, rows, seed=seed)
+                path = dest_dir / f"{taxi}_tripdata_{year}-{month:02d}.parquet"
+                pq.write_table(table, path)
+                manifest['files'][str(path.relative_to(out_dir))] = {'rows': table.num_rows, **counts}
+                manifest['total_rows'] += table.num_rows
+
+    if cache_dir is not None:
+        generate_factors(cache_dir, seed=seed)
+
+    return manifest
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic TLC trip data.")
+    parser.add_argument("--scale", type=float, default=0.1, help="Scale factor (1.0 = %d yellow rows/month)" % BASE_ROWS['yellow'])
+    parser.add_argument("--out", default=str(BASE_DIR / "benchmarks" / "synthetic"), help="Output data directory")
+    parser.add_argument("--cache", default=None, help="Optional cache directory for synthetic external factors")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args(argv)
+
+    print(f"Generating synthetic data (scale={args.scale}, seed={args.seed}) -> {args.out}")
+    manifest = generate_dataset(args.out, scale=args.scale, seed=args.seed, cache_dir=args.cache)
+    print(f"Done. {manifest['total_rows']:,} rows across {len(manifest['files'])} files.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
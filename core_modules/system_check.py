@@ -1,12 +1,66 @@
 #!/usr/bin/env python
 """
 Verification Script - Check Market Analysis Toolkit Integrity
+
+With --verify the data store is validated too, not only listed:
+- Parquet: footer and metadata parse, row groups add up to the row count,
+  and every column chunk lies inside the file (catches truncation)
+- unified CSVs: header present, file ends on a complete row, row count
+- --checksums: also decodes every Parquet row group and records a SHA-256
+  per column chunk (SHA-256 of the whole file for CSVs)
+
+Files are verified in a thread pool. Results are cached in
+cache/verify_cache.json keyed by (path, size, mtime_ns), so a repeat check
+of an unchanged tree only stats the files.
+
+With --perf the latest benchmark_suite run is compared with a stored
+baseline (benchmarks/perf_baseline.json): per-phase wall time and peak RSS,
+and the rows processed per scale, each against a tolerance. When no run
+exists yet the synthetic benchmark is run first. Exceeding a tolerance
+fails the check with a per-phase diff. The baseline is machine-specific and
+not versioned: the first --perf run on a host records it.
+
+Usage:
+    python run_analysis.py check [--verify] [--checksums] [--workers 16]
+    python run_analysis.py check --perf [--time-tolerance 0.5] [--memory-tolerance 0.25]
+    python run_analysis.py check --perf --update-baseline
 """
 
 import os
 import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from fingerprints import file_stat
+
+BASE_DIR = CORE_DIR.parent
+DATA_DIR = BASE_DIR / "data_downloads"
+CACHE_DIR = BASE_DIR / "cache"
+VERIFY_CACHE = "verify_cache.json"
+VERIFY_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+VERIFY_CACHE_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+BENCH_DIR = BASE_DIR / "benchmarks"
+BENCH_RESULTS_DIR = BENCH_DIR / "results"
+PERF_BASELINE = "perf_baseline.json"
+PERF_SCALE = 0.05
+# Allowed growth over the baseline (0.5 = +50%); phases below the floors
+# are too short / small for the ratio to mean anything
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+ROWS_TOLERANCE = 0.0
+TIME_FLOOR_S = 0.05
+MEMORY_FLOOR_MB = 32.0
+
 def check_file(path, description):
     """Check if a file exists and report."""
     if os.path.exists(path):
@@ -33,9 +87,322 @@ def check_directory(path, description):
         print(f"  ❌ {description:.<50} MISSING")
         return False
 
-def main():
+# ============================================================================
+# DATA VERIFICATION
+# ============================================================================
+
+def verify_parquet(path, checksums=False):
+    """Footer, row-count and chunk-bounds check of one Parquet file."""
+    import pyarrow.parquet as pq
+
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(4)
+        f.seek(max(size - 4, 0))
+        tail = f.read(4)
+    if head != b"PAR1" or tail != b"PAR1":
+        raise ValueError("missing PAR1 magic (truncated or not Parquet)")
+
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    group_rows = 0
+    for i in range(meta.num_row_groups):
+        group = meta.row_group(i)
+        group_rows += group.num_rows
+        for j in range(group.num_columns):
+            col = group.column(j)
+            start = col.dictionary_page_offset or col.data_page_offset
+            if start is None or start < 4 or start + col.total_compressed_size > size:
+                raise ValueError(f"row group {i} column {col.path_in_schema} lies outside the file")
+    if group_rows != meta.num_rows:
+        raise ValueError(f"row groups hold {group_rows} rows, footer says {meta.num_rows}")
+
+    result = {'rows': meta.num_rows, 'columns': meta.num_columns}
+    if checksums:
+        sums = {}
+        with open(path, "rb") as f:
+            for i in range(meta.num_row_groups):
+                pf.read_row_group(i)  # decodes every page
+                group = meta.row_group(i)
+                for j in range(group.num_columns):
+                    col = group.column(j)
+                    f.seek(col.dictionary_page_offset or col.data_page_offset)
+                    digest = hashlib.sha256(f.read(col.total_compressed_size)).hexdigest()
+                    sums[f"{i}:{col.path_in_schema}"] = digest[:16]
+        result['checksums'] = sums
+    return result
+
+
+def verify_csv(path, checksums=False):
+    """Header, trailing-row and row-count check of one unified CSV."""
+    digest = hashlib.sha256() if checksums else None
+    lines = 0
+    last = b""
+    header = None
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            if header is None:
+                header = chunk.split(b"\n", 1)[0]
+            lines += chunk.count(b"\n")
+            last = (last + chunk)[-65536:]
+            if digest:
+                digest.update(chunk)
+    if not header:
+        raise ValueError("empty file")
+    if not last.endswith(b"\n"):
+        raise ValueError("last row is incomplete (no trailing newline)")
+    rows = last.rstrip(b"\n").rsplit(b"\n", 1)
+    if lines > 1 and rows[-1].count(b",") != header.count(b","):
+        raise ValueError("last row has a different field count than the header")
+    result = {'rows': max(lines - 1, 0), 'columns': header.count(b",") + 1}
+    if digest:
+        result['checksums'] = {'file': digest.hexdigest()[:16]}
+    return result
+
+
+def data_files(data_dir=None):
+    data_dir = Path(data_dir or DATA_DIR)
+    return (sorted(data_dir.glob("*/*/*.parquet")) + sorted(data_dir.glob("analysis/*/*/*.parquet"))
+            + sorted(data_dir.glob("*_unified.csv")))
+
+
+def load_verify_cache(cache_dir=None):
+    path = Path(cache_dir or CACHE_DIR) / VERIFY_CACHE
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get('version') == VERIFY_CACHE_VERSION:
+            return cache['files']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def save_verify_cache(entries, cache_dir=None):
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    tmp = cache_dir / (VERIFY_CACHE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({'version': VERIFY_CACHE_VERSION, 'files': entries}, f)
+    os.replace(tmp, cache_dir / VERIFY_CACHE)
+
+
+def _verify_one(path, stat, checksums):
+    verify = verify_parquet if path.endswith(".parquet") else verify_csv
+    entry = {'size': stat[0], 'mtime_ns': stat[1]}
+    try:
+        entry.update(verify(path, checksums))
+        entry['ok'] = True
+    except Exception as e:
+        entry.update(ok=False, error=f"{type(e).__name__}: {e}")
+    return path, entry
+
+
+def verify_data(data_dir=None, cache_dir=None, checksums=False, workers=VERIFY_WORKERS, use_cache=True):
+    """
+    Verifies every Parquet file and unified CSV under data_dir. Unchanged
+    files (same size and mtime, checksums already recorded if requested)
+    are answered from the cache. Returns a summary dict.
+    """
+    start = time.perf_counter()
+    cache = load_verify_cache(cache_dir) if use_cache else {}
+    results, todo = {}, []
+    for path in map(str, data_files(data_dir)):
+        stat = file_stat(path)
+        if stat is None:
+            continue
+        hit = cache.get(path)
+        if (hit and (hit['size'], hit['mtime_ns']) == stat
+                and (not checksums or 'checksums' in hit or not hit['ok'])):
+            results[path] = hit
+        else:
+            todo.append((path, stat))
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo)))) as pool:
+            for path, entry in pool.map(lambda item: _verify_one(item[0], item[1], checksums), todo):
+                results[path] = entry
+        save_verify_cache(results, cache_dir)
+
+    failures = {p: e['error'] for p, e in results.items() if not e['ok']}
+    return {
+        'files': len(results),
+        'verified': len(todo),
+        'cached': len(results) - len(todo),
+        'rows': sum(e.get('rows', 0) for e in results.values() if e['ok']),
+        'bytes': sum(e['size'] for e in results.values()),
+        'failures': failures,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def print_verification(summary):
+    for path, error in sorted(summary['failures'].items()):
+        print(f"  ❌ {os.path.relpath(path, BASE_DIR)}: {error}")
+    ok = summary['files'] - len(summary['failures'])
+    print(f"  {'✅' if not summary['failures'] else '❌'} {ok}/{summary['files']} files valid, "
+          f"{summary['rows']:,} rows, {summary['bytes'] / (1024 * 1024):,.1f} MB "
+          f"({summary['verified']} verified, {summary['cached']} cached) in {summary['seconds'] * 1000:.0f} ms")
+
+
+# ============================================================================
+# PERFORMANCE REGRESSION GATE
+# ============================================================================
+
+def latest_bench_result(results_dir=None, scale=None):
+    """(path, result) of the newest benchmark_suite result (covering `scale`), or (None, None)."""
+    results_dir = Path(results_dir or BENCH_RESULTS_DIR)
+    for path in sorted(results_dir.glob("bench_*.json"), reverse=True):
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if scale is None or any(s['scale'] == scale for s in result.get('scales', [])):
+            return path, result
+    return None, None
+
+
+def run_perf_benchmark(scale=PERF_SCALE):
+    """Runs the synthetic benchmark at one scale and saves it like benchmark_suite does."""
+    import benchmark_suite
+    print(f"  -> Running the synthetic benchmark (scale {scale})...")
+    result = benchmark_suite.run_benchmarks([scale])
+    path = benchmark_suite.save_results(result, BENCH_RESULTS_DIR)
+    return path, result
+
+
+def load_baseline(bench_dir=None):
+    path = Path(bench_dir or BENCH_DIR) / PERF_BASELINE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(result, source, bench_dir=None):
+    path = Path(bench_dir or BENCH_DIR) / PERF_BASELINE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    baseline = dict(result, baseline_from=str(source))
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2)
+    return path
+
+
+def _check_metric(rows, scale, phase, metric, old, new, tolerance, floor, unit):
+    if old is None or new is None:
+        return
+    change = (new - old) / old if old else (0.0 if new == old else float('inf'))
+    # Small phases are reported but never fail the gate
+    gated = max(old, new) >= floor
+    rows.append({
+        'scale': scale, 'phase': phase, 'metric': metric, 'unit': unit,
+        'baseline': old, 'latest': new, 'change': change, 'limit': tolerance,
+        'failed': gated and change > tolerance,
+    })
+
+
+def compare_perf(baseline, latest, time_tol=TIME_TOLERANCE, mem_tol=MEMORY_TOLERANCE,
+                 rows_tol=ROWS_TOLERANCE, time_floor=TIME_FLOOR_S, mem_floor=MEMORY_FLOOR_MB):
+    """Per-scale, per-phase comparison rows (wall time, peak RSS, rows processed)."""
+    rows = []
+    base_scales = {s['scale']: s for s in baseline['scales']}
+    for entry in latest['scales']:
+        base = base_scales.get(entry['scale'])
+        if base is None:
+            continue
+        scale = entry['scale']
+        old_rows, new_rows = base.get('rows'), entry.get('rows')
+        if old_rows is not None and new_rows is not None:
+            change = abs(new_rows - old_rows) / old_rows if old_rows else float(new_rows != old_rows)
+            rows.append({'scale': scale, 'phase': '(dataset)', 'metric': 'rows', 'unit': '',
+                         'baseline': old_rows, 'latest': new_rows, 'change': change, 'limit': rows_tol,
+                         'failed': change > rows_tol})
+        for phase, secs in entry.get('timings', {}).items():
+            _check_metric(rows, scale, phase, 'time', base.get('timings', {}).get(phase), secs,
+                          time_tol, time_floor, 's')
+        for phase, mem in entry.get('memory', {}).items():
+            _check_metric(rows, scale, phase, 'peak_rss', base.get('memory', {}).get(phase, {}).get('peak_rss_mb'),
+                          mem.get('peak_rss_mb'), mem_tol, mem_floor, 'MB')
+    return rows
+
+
+def print_perf_diff(rows, only_failed=False):
+    print(f"  {'scale':>6} {'phase':<34} {'metric':<9} {'baseline':>11} {'latest':>11} {'change':>8} {'limit':>7}")
+    for r in rows:
+        if only_failed and not r['failed']:
+            continue
+        fmt = (lambda v: f"{v:,}") if r['metric'] == 'rows' else (lambda v: f"{v:.3f}{r['unit']}")
+        change = f"{r['change']:+.0%}" if r['change'] != float('inf') else "new"
+        print(f"  {r['scale']:>6} {r['phase']:<34} {r['metric']:<9} {fmt(r['baseline']):>11} {fmt(r['latest']):>11} "
+              f"{change:>8} {'+' + format(r['limit'], '.0%'):>7} {'❌' if r['failed'] else '✅'}")
+
+
+def perf_gate(args):
+    """
+    Compares the latest benchmark run with the baseline. Returns True if
+    every gated metric is within tolerance (or a baseline was just recorded).
+    """
+    baseline = load_baseline()
+    scale = args.perf_scale if args.perf_scale is not None else (
+        baseline['scales'][0]['scale'] if baseline else PERF_SCALE)
+    path, latest = (None, None) if args.perf_run else latest_bench_result(scale=scale)
+    if latest is None:
+        path, latest = run_perf_benchmark(scale)
+
+    if baseline is None or args.update_baseline:
+        target = save_baseline(latest, path)
+        print(f"  ✅ Baseline recorded from {Path(path).name} -> {os.path.relpath(target, BASE_DIR)}")
+        return True
+
+    rows = compare_perf(baseline, latest, args.time_tolerance, args.memory_tolerance, args.rows_tolerance)
+    if not rows:
+        print(f"  ⚠️ {Path(path).name} shares no scale with the baseline; nothing compared.")
+        return True
+    failed = [r for r in rows if r['failed']]
+    print(f"  Latest: {Path(path).name}  Baseline: {Path(baseline.get('baseline_from', '?')).name}")
+    print_perf_diff(rows, only_failed=not args.verbose and bool(failed))
+    if failed:
+        print(f"  ❌ {len(failed)} metric(s) over tolerance")
+    else:
+        print(f"  ✅ {len(rows)} metrics within tolerance")
+    return not failed
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="System integrity check.")
+    add_arguments(parser)
+    return parser
+
+
+def add_arguments(parser):
+    parser.add_argument("--verify", action="store_true",
+                        help="Validate Parquet footers/row counts and unified CSVs in data_downloads/")
+    parser.add_argument("--checksums", action="store_true",
+                        help="With --verify: decode every row group and record column checksums")
+    parser.add_argument("--workers", type=int, default=VERIFY_WORKERS, help="Verification threads")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached verification results")
+    perf = parser.add_argument_group("performance gate")
+    perf.add_argument("--perf", action="store_true",
+                      help="Compare the latest benchmark run with the stored baseline")
+    perf.add_argument("--perf-run", action="store_true", help="Run a fresh synthetic benchmark first")
+    perf.add_argument("--perf-scale", type=float, help=f"Benchmark scale (default: baseline's, else {PERF_SCALE})")
+    perf.add_argument("--update-baseline", action="store_true", help="Store the latest run as the new baseline")
+    perf.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE, help="Allowed wall-time growth (0.5 = +50%%)")
+    perf.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE, help="Allowed peak-RSS growth")
+    perf.add_argument("--rows-tolerance", type=float, default=ROWS_TOLERANCE, help="Allowed change in rows processed")
+    perf.add_argument("--verbose", action="store_true", help="Show every metric, not only failures")
+
+
+def main(argv=None, args=None):
     """Run all verification checks."""
-    
+    if args is None:
+        args = build_parser().parse_args(argv)
+
     print("""
     ╔════════════════════════════════════════════════════════════════╗
     ║        MARKET ANALYSIS TOOLKIT - SYSTEM INTEGRITY CHECK        ║
@@ -89,6 +456,19 @@ def main():
     
     for dir_path, desc in dirs.items():
         check_directory(dir_path, desc)
+
+    if args.verify or args.checksums:
+        print("\n🔍 Data Verification" + (" (with checksums)" if args.checksums else ""))
+        print("-" * 65)
+        summary = verify_data(checksums=args.checksums, workers=args.workers, use_cache=not args.no_cache)
+        print_verification(summary)
+        all_ok &= not summary['failures']
+
+    perf_ok = True
+    if args.perf or args.update_baseline:
+        print("\n⏱️  Performance Gate")
+        print("-" * 65)
+        perf_ok = perf_gate(args)
     
     # Check documentation
     print("\n📖 Documentation")
@@ -108,12 +488,16 @@ def main():
     # Summary
     print("\n" + "=" * 65)
     
-    if all_ok:
+    if all_ok and perf_ok:
         print("✅ SYSTEM CHECK PASSED")
         print("\nAll core components are active.")
         print("\nNext Steps:")
         print("  1. python run_analysis.py          (Execute Analysis)")
         print("  2. streamlit run core_modules/analytics_dashboard.py (Launch Dashboard)")
+    elif all_ok:
+        print("❌ SYSTEM CHECK FAILED")
+        print("\nPerformance regressed beyond tolerance (see the diff above).")
+        return 1
     else:
         print("❌ SYSTEM CHECK FAILED")
         print("\nCritical components missing. Check installation.")
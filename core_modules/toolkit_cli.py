@@ -0,0 +1,183 @@
+"""
+Market Toolkit CLI
+==================
+One entry point for the individual toolkit stages.
+
+    python run_analysis.py <command> [options]
+    python core_modules/toolkit_cli.py <command> [options]
+
+Commands:
+    ingest      Download and unify raw trip data
+    engine      Run the processing engine (ETL + analytics)
+    report      Build the PDF executive summary (--batch: per zone x month)
+    content     Generate content assets
+    artifacts   Precompute dashboard heatmaps, factor fit and figure specs
+    zones       Download and simplify TLC zone shapes for the dashboard maps
+    check       System integrity check
+    dashboard   Launch the Streamlit dashboard
+    watch       Refresh daemon: re-run ingest/engine as new months arrive
+    serve       Local HTTP/JSON + Arrow query service over the outputs
+    imports     Import-time benchmark for the entry points
+
+Only argparse is imported up front; each command imports its stage module
+(and through it Polars, DuckDB, pandas, ReportLab ...) when it runs, so
+`--help` and `check` start in milliseconds.
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+CORE_DIR = Path(__file__).parent
+BASE_DIR = CORE_DIR.parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+
+# ============================================================================
+# COMMANDS
+# ============================================================================
+
+def cmd_ingest(args):
+    import data_ingestion
+    return data_ingestion.main(revalidate=args.revalidate)
+
+
+def cmd_engine(args):
+    if args.backend:
+        os.environ["ENGINE_BACKEND"] = args.backend
+    if args.csv:
+        os.environ["ENGINE_CSV"] = "1"
+    import processing_engine
+    return processing_engine.main(revalidate=args.revalidate)
+
+
+def cmd_report(args):
+    import report_builder
+    if args.batch:
+        workers = args.workers or report_builder.BATCH_WORKERS
+        report_builder.generate_batch(args.year, args.taxi, workers=workers, force=args.force)
+    else:
+        report_builder.generate_pdf(force=args.force)
+    return 0
+
+
+def cmd_content(args):
+    import content_generator
+    content_generator.generate_blog_files(force=args.force)
+    return 0
+
+
+def cmd_artifacts(args):
+    import dashboard_artifacts
+    return dashboard_artifacts.main()
+
+
+def cmd_zones(args):
+    import zone_geometry
+    return zone_geometry.main()
+
+
+def cmd_check(args):
+    import system_check
+    # system_check resolves its paths relative to the project root
+    os.chdir(BASE_DIR)
+    return system_check.main(args=args)
+
+
+def cmd_dashboard(args):
+    import subprocess
+    dashboard_path = str(CORE_DIR / "analytics_dashboard.py")
+    cmd = [sys.executable, "-m", "streamlit", "run", dashboard_path]
+    if args.port:
+        cmd += ["--server.port", str(args.port)]
+    try:
+        return subprocess.run(cmd).returncode
+    except KeyboardInterrupt:
+        print("\nDashboard stopped by user.")
+        return 0
+
+
+def cmd_watch(args):
+    import refresh_daemon
+    return refresh_daemon.run(args)
+
+
+def cmd_serve(args):
+    import query_service
+    return query_service.run(args)
+
+
+def cmd_imports(args):
+    import import_timing
+    argv = ["--repeats", str(args.repeats), "--budget-ms", str(args.budget_ms)]
+    return import_timing.main(argv + list(args.modules))
+
+
+COMMANDS = {
+    "ingest": (cmd_ingest, "Download and unify raw trip data"),
+    "engine": (cmd_engine, "Run the processing engine (ETL + analytics)"),
+    "report": (cmd_report, "Build the PDF executive summary"),
+    "content": (cmd_content, "Generate content assets"),
+    "artifacts": (cmd_artifacts, "Precompute dashboard heatmaps, factor fit and figure specs"),
+    "zones": (cmd_zones, "Download and simplify TLC zone shapes for the dashboard maps"),
+    "check": (cmd_check, "System integrity check"),
+    "dashboard": (cmd_dashboard, "Launch the Streamlit dashboard"),
+    "watch": (cmd_watch, "Refresh daemon: re-run ingest/engine as new months arrive"),
+    "serve": (cmd_serve, "Local HTTP/JSON + Arrow query service over the outputs"),
+    "imports": (cmd_imports, "Import-time benchmark for the entry points"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="run_analysis.py",
+        description="Market Trend Analysis Toolkit. Run without a command for the full pipeline.",
+    )
+    sub = parser.add_subparsers(dest="command", metavar="command")
+    parsers = {name: sub.add_parser(name, help=help_text) for name, (_, help_text) in COMMANDS.items()}
+
+    parsers["ingest"].add_argument("--revalidate", action="store_true",
+                                   help="Re-check downloaded months (ETag/Last-Modified) and refetch republished ones")
+    parsers["engine"].add_argument("--backend", choices=["duckdb", "polars"],
+                                   help="Analytics backend (overrides ENGINE_BACKEND)")
+    parsers["engine"].add_argument("--csv", action="store_true",
+                                   help="Also write CSV copies of the result tables (ENGINE_CSV=1)")
+    parsers["engine"].add_argument("--revalidate", action="store_true",
+                                   help="Re-check the zone lookup and downloaded months (incl. the Dec 2023/2024 "
+                                        "imputation sources) and refetch republished ones")
+    parsers["report"].add_argument("--batch", action="store_true",
+                                   help="One PDF per congestion zone and month (output/reports/)")
+    parsers["report"].add_argument("--year", type=int, default=2025)
+    parsers["report"].add_argument("--taxi", choices=["all", "yellow", "green"], default="all")
+    parsers["report"].add_argument("--workers", type=int, help="Process pool size (default: CPU count, max 8)")
+    for name in ("report", "content"):
+        parsers[name].add_argument("--force", action="store_true",
+                                   help="Rebuild even if the inputs and template are unchanged")
+    import system_check
+    system_check.add_arguments(parsers["check"])
+    parsers["dashboard"].add_argument("--port", type=int, help="Streamlit server port")
+    import refresh_daemon
+    refresh_daemon.add_arguments(parsers["watch"])
+    import query_service
+    query_service.add_arguments(parsers["serve"])
+    parsers["imports"].add_argument("modules", nargs="*", help="Modules to profile (default: entry points)")
+    parsers["imports"].add_argument("--repeats", type=int, default=3)
+    parsers["imports"].add_argument("--budget-ms", type=float, default=300,
+                                    help="Fail if any module's import exceeds this (0 disables)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.command:
+        parser.print_help()
+        return 0
+    func, _ = COMMANDS[args.command]
+    return func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
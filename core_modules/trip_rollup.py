@@ -0,0 +1,273 @@
+"""
+Hourly Trip Rollup
+==================
+An hourly cube of the trip data that the engine keeps up to date, so the
+query service answers daily, monthly, per-zone and period-over-period
+metrics for any date range by aggregating rollup rows instead of scanning
+trips.
+
+Keyed by (taxi_code, hour, pickup_loc, dropoff_in_zone). Every measure is
+additive, so any coarser grouping, and every average the metrics report,
+comes out exact:
+
+- trips, compliant_trips           trip counts (all / surcharge paid)
+- fare_sum, total_sum, surcharge_sum, distance_sum
+- tip_proxy_sum                    sum of (total - fare) / fare, 0 when fare <= 0
+- duration_sum, duration_trips     over trips with duration_min > 0
+- momentum_sum, momentum_trips     over trips passing MOMENTUM_VALID
+
+Written to output/rollup/<year>/<taxi>/<raw file name>, one zstd Parquet
+file per raw month sorted by hour and pickup zone. A month is rebuilt only
+when its trips, the core zone or the momentum filter change.
+
+Usage:
+    python core_modules/trip_rollup.py [--force]
+    python core_modules/trip_rollup.py --check [--data DIR --output DIR]   # rollup vs trip scan
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+import fingerprints
+from execution_backends import (
+    MOMENTUM_VALID,
+    TAXI_CODES,
+    TAXI_TYPES,
+    DuckDBBackend,
+    analysis_fingerprint,
+    _sql_path,
+)
+
+BASE_DIR = CORE_DIR.parent
+DATA_DIR = BASE_DIR / "data_downloads"
+OUTPUT_DIR = BASE_DIR / "output"
+
+ROLLUP_SUBDIR = "rollup"  # under OUTPUT_DIR
+ROLLUP_VERSION = 1
+ROLLUP_KEYS = ['taxi_code', 'hour', 'pickup_loc', 'dropoff_in_zone']
+
+# Target latency of a rollup-backed metric (uncached), checked by --check
+TARGET_MS = 100
+
+# ============================================================================
+# FILES
+# ============================================================================
+
+def rollup_path(output_dir, raw_path):
+    """Rollup file for a raw monthly file: rollup/{year}/{taxi}/<same name>."""
+    raw_path = Path(raw_path)
+    return Path(output_dir) / ROLLUP_SUBDIR / raw_path.parent.parent.name / raw_path.parent.name / raw_path.name
+
+
+def rollup_fingerprint(raw_path):
+    """The month's trip fingerprint (raw stat, zones, thresholds) plus the rollup layout."""
+    return fingerprints.value_digest(analysis_fingerprint(raw_path),
+                                     extra={'rollup': ROLLUP_VERSION, 'momentum': MOMENTUM_VALID})
+
+
+def rollup_current(output_dir, raw_path):
+    return fingerprints.artifact_current(str(rollup_path(output_dir, raw_path)), rollup_fingerprint(raw_path))
+
+
+def raw_months(data_dir, year=None, taxi=None):
+    """{(year, taxi): [raw monthly files]} for the streams on disk."""
+    data_dir = Path(data_dir)
+    streams = {}
+    for year_dir in sorted(data_dir.glob("[0-9][0-9][0-9][0-9]")):
+        if year is not None and int(year_dir.name) != year:
+            continue
+        for t in TAXI_TYPES:
+            if taxi is not None and t != taxi:
+                continue
+            files = sorted(str(f) for f in (year_dir / t).glob("*.parquet"))
+            if files:
+                streams[(int(year_dir.name), t)] = files
+    return streams
+
+
+def partition_files(data_dir=None, output_dir=None):
+    """
+    {(year, taxi): [rollup files]} for the streams whose every month has a
+    current rollup. Streams with a missing or stale month are left out, so
+    callers fall back to scanning their trips.
+    """
+    output_dir = output_dir or OUTPUT_DIR
+    partitions = {}
+    for stream, files in raw_months(data_dir or DATA_DIR).items():
+        if all(rollup_current(output_dir, f) for f in files):
+            partitions[stream] = [str(rollup_path(output_dir, f)) for f in files]
+    return partitions
+
+# ============================================================================
+# BUILD
+# ============================================================================
+
+def rollup_sql(trips, taxi):
+    """Hourly rollup of a normalized trip select (DuckDBBackend.source_sql)."""
+    return f"""
+        SELECT
+            CAST({TAXI_CODES[taxi]} AS UTINYINT) as taxi_code,
+            date_trunc('hour', pickup_time) as hour,
+            pickup_loc,
+            dropoff_in_zone,
+            CAST(COUNT(*) AS UINTEGER) as trips,
+            CAST(COUNT(*) FILTER (WHERE congestion_surcharge > 0) AS UINTEGER) as compliant_trips,
+            SUM(fare) as fare_sum,
+            SUM(total_amount) as total_sum,
+            SUM(congestion_surcharge) as surcharge_sum,
+            SUM(trip_distance) as distance_sum,
+            SUM(CASE WHEN fare > 0 THEN (total_amount - fare)/fare ELSE 0 END) as tip_proxy_sum,
+            CAST(SUM(duration_min) FILTER (WHERE duration_min > 0) AS BIGINT) as duration_sum,
+            CAST(COUNT(*) FILTER (WHERE duration_min > 0) AS UINTEGER) as duration_trips,
+            SUM(CAST(momentum AS DOUBLE)) FILTER (WHERE {MOMENTUM_VALID}) as momentum_sum,
+            CAST(COUNT(*) FILTER (WHERE {MOMENTUM_VALID}) AS UINTEGER) as momentum_trips
+        FROM ({trips})
+        GROUP BY ALL
+        ORDER BY hour, pickup_loc, dropoff_in_zone"""
+
+
+def roll_month(backend, raw_path, taxi, output_dir):
+    """Writes the rollup of one raw month (from its projection when current). Returns its row count."""
+    out = rollup_path(output_dir, raw_path)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = str(out) + ".part"
+    sql = rollup_sql(backend.month_sql(raw_path, taxi), taxi)
+    backend.conn.execute(f"COPY ({sql}) TO '{_sql_path(tmp)}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+    os.replace(tmp, out)
+    fingerprints.record_artifact(str(out), rollup_fingerprint(raw_path))
+    return backend.conn.execute(f"SELECT COUNT(*) FROM read_parquet('{_sql_path(out)}')").fetchone()[0]
+
+
+def build_rollup(data_dir=None, output_dir=None, conn=None, force=False):
+    """
+    Brings the rollup up to date for every stream on disk; months whose
+    rollup is current are skipped. Returns {'written', 'current', 'rows', 'bytes'}.
+    """
+    data_dir = data_dir or DATA_DIR
+    output_dir = output_dir or OUTPUT_DIR
+    backend = DuckDBBackend(data_dir, conn=conn)
+    summary = {'written': 0, 'current': 0, 'rows': 0, 'bytes': 0}
+    try:
+        for (_, taxi), files in raw_months(data_dir).items():
+            for raw in files:
+                if not force and rollup_current(output_dir, raw):
+                    summary['current'] += 1
+                else:
+                    summary['rows'] += roll_month(backend, raw, taxi, output_dir)
+                    summary['written'] += 1
+                summary['bytes'] += os.path.getsize(rollup_path(output_dir, raw))
+    finally:
+        backend.close()
+    return summary
+
+
+def print_rollup_summary(summary):
+    print(f"  -> Hourly rollup: {summary['written']} month(s) rebuilt ({summary['rows']:,} rows), "
+          f"{summary['current']} current, {summary['bytes'] / 1e6:.2f} MB on disk.")
+
+# ============================================================================
+# CHECK
+# ============================================================================
+
+# Dashboard / report shaped queries that the rollup should answer
+CHECK_QUERIES = [
+    ("revenue", {"group": "day"}),
+    ("revenue", {"group": "month", "zones": "all"}),
+    ("leakage", {}),
+    ("leakage", {"zone": "68"}),
+    ("momentum", {"year": "2025", "start_month": "1", "end_month": "6", "taxi": "all"}),
+    ("momentum", {"year": "2024", "zones": "all"}),
+    ("zone_momentum", {"start": "2025-01-01", "end": "2025-06-30"}),
+    ("daily_transactions", {}),
+    ("zone_daily", {}),
+    ("zone_daily", {"zones": "4,12,13", "taxi": "green"}),
+    ("engagement", {"zones": "core"}),
+    ("engagement", {}),
+]
+
+
+def check(data_dir=None, output_dir=None, repeats=3):
+    """
+    Runs CHECK_QUERIES through the query service from the rollup and from a
+    trip scan (result cache bypassed). Returns [{name, params, rollup_ms,
+    trips_ms, rollup_used, parity}].
+    """
+    import query_service
+    from execution_backends import compare_tables
+
+    data_dir = data_dir or DATA_DIR
+    output_dir = output_dir or OUTPUT_DIR
+    build_rollup(data_dir, output_dir)
+    services = {
+        'rollup': query_service.QueryService(data_dir=data_dir, output_dir=output_dir, use_rollup=True),
+        'trips': query_service.QueryService(data_dir=data_dir, output_dir=output_dir, use_rollup=False),
+    }
+    results = []
+    try:
+        for name, raw in CHECK_QUERIES:
+            row = {'name': name, 'params': raw}
+            tables = {}
+            for kind, service in services.items():
+                best = float('inf')
+                for _ in range(repeats):
+                    service.cache.clear()
+                    start = time.perf_counter()
+                    tables[kind], _ = service.metric(name, raw)
+                    best = min(best, time.perf_counter() - start)
+                row[f'{kind}_ms'] = round(best * 1000, 2)
+            service = services['rollup']
+            row['rollup_used'] = service.plan(name, query_service.parse_params(name, raw))[2] == 'rollup'
+            keys = [c for c in tables['trips'].column_names if c in ('period', 'date', 'month', 'dow', 'hour',
+                                                                    'pickup_loc', 'location_id')]
+            row['parity'] = not compare_tables(tables['trips'], tables['rollup'], keys, rel_tol=1e-5)
+            results.append(row)
+    finally:
+        for service in services.values():
+            service.close()
+    return results
+
+
+def print_check(results):
+    print(f"  {'metric':<20} {'params':<44} {'trips (ms)':>10} {'rollup (ms)':>11}  parity")
+    for r in results:
+        params = ",".join(f"{k}={v}" for k, v in r['params'].items()) or "-"
+        source = f"{r['rollup_ms']:>11.1f}" if r['rollup_used'] else f"{'(scan)':>11}"
+        print(f"  {r['name']:<20} {params:<44} {r['trips_ms']:>10.1f} {source}  "
+              f"{'OK' if r['parity'] else 'MISMATCH'}")
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build / check the hourly trip rollup.")
+    parser.add_argument("--data", help="Trip data directory (default: data_downloads/)")
+    parser.add_argument("--output", help="Output directory (default: output/)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every month")
+    parser.add_argument("--check", action="store_true",
+                        help="Time the query service's metrics from the rollup vs a trip scan and compare results")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        results = check(args.data, args.output)
+        print_check(results)
+        slow = [r for r in results if r['rollup_used'] and r['rollup_ms'] > TARGET_MS]
+        ok = all(r['parity'] for r in results) and not slow
+        print(f"\n{'OK' if ok else 'FAILED'}: {sum(r['rollup_used'] for r in results)}/{len(results)} "
+              f"queries from the rollup, target {TARGET_MS} ms")
+        return 0 if ok else 1
+
+    print("\n[ROLLUP] Updating hourly trip rollup...")
+    print_rollup_summary(build_rollup(args.data, args.output, force=args.force))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
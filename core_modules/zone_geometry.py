@@ -0,0 +1,499 @@
+"""
+Zone Geometry
+=============
+TLC taxi-zone polygons for the dashboard's choropleth maps.
+
+- Source: the TLC zone shapefile (data_downloads/taxi_zones/taxi_zones.shp,
+  downloaded once from the TLC site) or a GeoJSON at
+  data_downloads/taxi_zones.geojson. The shapefile is read with `struct`
+  (no GDAL / geopandas needed) and its NY State Plane coordinates are
+  inverse-projected to lon/lat from the .prj parameters.
+- Every zone is simplified (Douglas-Peucker) at each SIMPLIFY_TOLERANCES
+  level, so a city-wide view never carries full-resolution outlines.
+- All levels are cached in cache/zone_geometry.npz as flat float32
+  coordinates plus int32 offset arrays (zone -> polygons -> rings -> points),
+  keyed on the source file's size/mtime.
+- Metrics are joined to zones with array indexing on LocationID, and fill
+  colours are computed for all zones at once.
+
+Usage:
+    python core_modules/zone_geometry.py          # build the cache, print sizes
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import struct
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+CORE_DIR = Path(__file__).parent
+if str(CORE_DIR) not in sys.path:
+    sys.path.insert(0, str(CORE_DIR))
+
+from fingerprints import file_stat
+
+BASE_DIR = CORE_DIR.parent
+DATA_DIR = BASE_DIR / "data_downloads"
+CACHE_DIR = BASE_DIR / "cache"
+SHAPEFILE = "taxi_zones/taxi_zones.shp"
+GEOJSON_FILE = "taxi_zones.geojson"
+CACHE_FILE = "zone_geometry.npz"
+ZONES_URL = "https://d37ci6vzurychx.cloudfront.net/misc/taxi_zones.zip"
+
+# Level -> Douglas-Peucker tolerance in degrees (~11 m, ~55 m, ~220 m)
+SIMPLIFY_TOLERANCES = {
+    'fine': 0.0001,
+    'medium': 0.0005,
+    'coarse': 0.002,
+}
+
+# NAD83 / New York Long Island (ftUS), EPSG:2263; used when no .prj is found
+NY_STATE_PLANE = {
+    'standard_parallel_1': 40.66666666666666,
+    'standard_parallel_2': 41.03333333333333,
+    'latitude_of_origin': 40.16666666666666,
+    'central_meridian': -74.0,
+    'false_easting': 984250.0,
+    'false_northing': 0.0,
+    'semi_major': 6378137.0,
+    'inverse_flattening': 298.257222101,
+    'unit': 0.3048006096012192,
+}
+
+# ============================================================================
+# PROJECTION
+# ============================================================================
+
+def parse_prj(text):
+    """Lambert Conformal Conic parameters from an ESRI .prj, or None for lon/lat data."""
+    if "PROJCS" not in text.upper():
+        return None
+    if "LAMBERT_CONFORMAL_CONIC" not in text.upper():
+        raise ValueError("Unsupported zone projection (expected Lambert Conformal Conic)")
+    params = dict(NY_STATE_PLANE)
+    for name, value in re.findall(r'PARAMETER\["([^"]+)",\s*([-\d.eE+]+)\]', text):
+        key = name.lower()
+        if key in params:
+            params[key] = float(value)
+    spheroid = re.search(r'SPHEROID\["[^"]*",\s*([-\d.eE+]+),\s*([-\d.eE+]+)\]', text)
+    if spheroid:
+        params['semi_major'], params['inverse_flattening'] = map(float, spheroid.groups())
+    unit = re.findall(r'UNIT\["[^"]*",\s*([-\d.eE+]+)\]', text)
+    if unit:
+        params['unit'] = float(unit[-1])  # the PROJCS linear unit comes last
+    return params
+
+
+def lcc_to_lonlat(x, y, p):
+    """Inverse ellipsoidal Lambert Conformal Conic (Snyder 1987, eq. 15-9 ff.), vectorized."""
+    a = p['semi_major']
+    f = 1 / p['inverse_flattening']
+    e = math.sqrt(2 * f - f * f)
+    rad = math.radians
+
+    def m(phi):
+        return math.cos(phi) / math.sqrt(1 - (e * math.sin(phi)) ** 2)
+
+    def t(phi):
+        return math.tan(math.pi / 4 - phi / 2) / ((1 - e * math.sin(phi)) / (1 + e * math.sin(phi))) ** (e / 2)
+
+    phi1, phi2 = rad(p['standard_parallel_1']), rad(p['standard_parallel_2'])
+    phi0, lon0 = rad(p['latitude_of_origin']), rad(p['central_meridian'])
+    n = (math.log(m(phi1)) - math.log(m(phi2))) / (math.log(t(phi1)) - math.log(t(phi2)))
+    F = m(phi1) / (n * t(phi1) ** n)
+    rho0 = a * F * t(phi0) ** n
+
+    unit = p['unit']
+    dx = (np.asarray(x, dtype=np.float64) - p['false_easting']) * unit
+    dy = rho0 - (np.asarray(y, dtype=np.float64) - p['false_northing']) * unit
+    sign = 1.0 if n > 0 else -1.0
+    rho = sign * np.hypot(dx, dy)
+    ts = (rho / (a * F)) ** (1 / n)
+    theta = np.arctan2(sign * dx, sign * dy)
+    lon = theta / n + lon0
+
+    phi = np.pi / 2 - 2 * np.arctan(ts)
+    for _ in range(8):
+        es = e * np.sin(phi)
+        phi = np.pi / 2 - 2 * np.arctan(ts * ((1 - es) / (1 + es)) ** (e / 2))
+    return np.degrees(lon), np.degrees(phi)
+
+
+# ============================================================================
+# READERS
+# ============================================================================
+# Both return [(location_id, zone name, borough, [polygon, ...])] where a
+# polygon is [outer ring, hole, ...] and a ring is an (n, 2) lon/lat array.
+
+def _signed_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1]))
+
+
+def read_dbf(path):
+    """Records of a dBASE III table as dicts (the attribute half of a shapefile)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    count, header_len, record_len = struct.unpack('<IHH', data[4:12])
+    fields, pos = [], 32
+    while data[pos] != 0x0D:
+        name = data[pos:pos + 11].split(b'\0', 1)[0].decode('ascii')
+        fields.append((name, chr(data[pos + 11]), data[pos + 16]))
+        pos += 32
+
+    records = []
+    for i in range(count):
+        start = header_len + i * record_len
+        if data[start:start + 1] == b'*':  # deleted
+            continue
+        pos, row = start + 1, {}
+        for name, kind, length in fields:
+            raw = data[pos:pos + length].decode('latin-1').strip()
+            pos += length
+            if kind in 'NF':
+                row[name] = float(raw) if raw and ('.' in raw or kind == 'F') else (int(raw) if raw else None)
+            else:
+                row[name] = raw
+        records.append(row)
+    return records
+
+
+def read_shp(path):
+    """Polygon parts of a .shp file: one list of (n, 2) arrays per record (None for null shapes)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if struct.unpack('>i', data[:4])[0] != 9994:
+        raise ValueError(f"{path} is not a shapefile")
+    shapes, pos = [], 100
+    while pos + 8 <= len(data):
+        content_len = struct.unpack('>i', data[pos + 4:pos + 8])[0] * 2
+        body = pos + 8
+        shape_type = struct.unpack('<i', data[body:body + 4])[0]
+        if shape_type == 0:
+            shapes.append(None)
+        elif shape_type in (5, 15, 25):  # Polygon, PolygonZ, PolygonM (XY part is identical)
+            num_parts, num_points = struct.unpack('<ii', data[body + 36:body + 44])
+            parts = np.frombuffer(data, '<i4', num_parts, body + 44)
+            points = np.frombuffer(data, '<f8', 2 * num_points, body + 44 + 4 * num_parts).reshape(-1, 2)
+            bounds = list(parts) + [num_points]
+            shapes.append([points[bounds[i]:bounds[i + 1]] for i in range(num_parts)])
+        else:
+            raise ValueError(f"Unsupported shape type {shape_type} in {path}")
+        pos = body + content_len
+    return shapes
+
+
+def load_shapefile(path):
+    path = Path(path)
+    prj_path = path.with_suffix('.prj')
+    projection = parse_prj(prj_path.read_text()) if prj_path.exists() else NY_STATE_PLANE
+    records = read_dbf(path.with_suffix('.dbf'))
+    zones = []
+    for record, rings in zip(records, read_shp(path)):
+        if not rings:
+            continue
+        polygons = []
+        for ring in rings:
+            # Shapefile outer rings are clockwise, holes counter-clockwise
+            if _signed_area(ring) <= 0 or not polygons:
+                polygons.append([ring])
+            else:
+                polygons[-1].append(ring)
+        if projection:
+            polygons = [[np.column_stack(lcc_to_lonlat(r[:, 0], r[:, 1], projection)) for r in poly]
+                        for poly in polygons]
+        zones.append((int(record['LocationID']), record.get('zone', ''), record.get('borough', ''), polygons))
+    return zones
+
+
+def load_geojson(path):
+    with open(path) as f:
+        collection = json.load(f)
+    zones = []
+    for feature in collection['features']:
+        props = feature.get('properties') or {}
+        geom = feature.get('geometry')
+        if not geom:
+            continue
+        coords = geom['coordinates'] if geom['type'] == 'MultiPolygon' else [geom['coordinates']]
+        polygons = [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in poly] for poly in coords]
+        location_id = props.get('LocationID', props.get('location_id', props.get('locationid')))
+        zones.append((int(location_id), props.get('zone', ''), props.get('borough', ''), polygons))
+    return zones
+
+
+def find_source(data_dir=None):
+    """Local zone shapefile or GeoJSON, or None."""
+    data_dir = Path(data_dir or DATA_DIR)
+    for candidate in (data_dir / SHAPEFILE, data_dir / GEOJSON_FILE):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def ensure_source(data_dir=None):
+    """Path of the zone source, downloading the TLC shapefile once if neither file exists."""
+    data_dir = Path(data_dir or DATA_DIR)
+    existing = find_source(data_dir)
+    if existing:
+        return existing
+    import requests
+    target = data_dir / SHAPEFILE
+    target.parent.mkdir(parents=True, exist_ok=True)
+    archive = target.parent / "taxi_zones.zip"
+    print(f"  -> Downloading TLC zone shapes from {ZONES_URL}...")
+    try:
+        response = requests.get(ZONES_URL, timeout=60)
+        response.raise_for_status()
+        archive.write_bytes(response.content)
+        with zipfile.ZipFile(archive) as zf:
+            for member in zf.namelist():
+                name = os.path.basename(member)
+                if name.startswith("taxi_zones."):
+                    (target.parent / name).write_bytes(zf.read(member))
+    except Exception as e:
+        print(f"  -> Could not download zone shapes: {e}")
+        return None
+    finally:
+        if archive.exists():
+            archive.unlink()
+    return target if target.exists() else None
+
+
+# ============================================================================
+# SIMPLIFICATION
+# ============================================================================
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker: indices of the points to keep (endpoints always kept)."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        a, b = points[start], points[end]
+        segment = points[start + 1:end]
+        ab = b - a
+        length = math.hypot(ab[0], ab[1])
+        if length == 0:
+            dist = np.hypot(*(segment - a).T)
+        else:
+            dist = np.abs(ab[0] * (segment[:, 1] - a[1]) - ab[1] * (segment[:, 0] - a[0])) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            mid = start + 1 + i
+            keep[mid] = True
+            stack.append((start, mid))
+            stack.append((mid, end))
+    return np.flatnonzero(keep)
+
+
+def simplify_ring(ring, tolerance):
+    """Simplified closed ring, or None if it collapses below a triangle."""
+    if tolerance <= 0 or len(ring) <= 4:
+        return ring
+    # Split the ring at its farthest point so both halves are open lines
+    far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    first = ring[:far + 1][simplify_line(ring[:far + 1], tolerance)]
+    second = ring[far:][simplify_line(ring[far:], tolerance)]
+    out = np.vstack([first, second[1:]])
+    return out if len(out) >= 4 else None
+
+
+# ============================================================================
+# PACKED GEOMETRY
+# ============================================================================
+
+class ZoneGeometry:
+    """
+    All zones at every simplification level, as flat arrays:
+    levels[name] = {'coords': (n, 2) float32 lon/lat,
+                    'ring_offsets', 'polygon_offsets', 'zone_offsets': int32}
+    zone i owns polygons zone_offsets[i]:zone_offsets[i+1], and so on down.
+    """
+
+    def __init__(self, location_ids, names, boroughs, levels, source_stamp=""):
+        self.location_ids = np.asarray(location_ids, dtype=np.int16)
+        self.names = np.asarray(names, dtype=str)
+        self.boroughs = np.asarray(boroughs, dtype=str)
+        self.levels = levels
+        self.source_stamp = source_stamp
+
+    @classmethod
+    def from_zones(cls, zones, tolerances=None, source_stamp=""):
+        tolerances = tolerances or SIMPLIFY_TOLERANCES
+        zones = sorted(zones, key=lambda z: z[0])
+        levels = {}
+        for level, tolerance in tolerances.items():
+            coords, rings, polys, zone_offsets = [], [0], [0], [0]
+            for _, _, _, polygons in zones:
+                for polygon in polygons:
+                    kept = []
+                    for i, ring in enumerate(polygon):
+                        simple = simplify_ring(ring, tolerance)
+                        if simple is None:
+                            if i > 0:
+                                continue  # drop collapsed holes
+                            simple = ring  # keep tiny islands as they are
+                        kept.append(simple)
+                    for ring in kept:
+                        coords.append(ring)
+                        rings.append(rings[-1] + len(ring))
+                    polys.append(polys[-1] + len(kept))
+                zone_offsets.append(zone_offsets[-1] + len(polygons))
+            levels[level] = {
+                'coords': np.vstack(coords).astype(np.float32),
+                'ring_offsets': np.asarray(rings, dtype=np.int32),
+                'polygon_offsets': np.asarray(polys, dtype=np.int32),
+                'zone_offsets': np.asarray(zone_offsets, dtype=np.int32),
+            }
+        return cls([z[0] for z in zones], [z[1] for z in zones], [z[2] for z in zones], levels, source_stamp)
+
+    # -- binary cache --------------------------------------------------------
+
+    def save(self, path):
+        arrays = {'location_ids': self.location_ids, 'names': self.names, 'boroughs': self.boroughs,
+                  'source_stamp': np.asarray(self.source_stamp)}
+        for level, parts in self.levels.items():
+            for key, value in parts.items():
+                arrays[f"{level}.{key}"] = value
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            levels = {}
+            for key in data.files:
+                if "." in key:
+                    level, part = key.split(".", 1)
+                    levels.setdefault(level, {})[part] = data[key]
+            return cls(data['location_ids'], data['names'], data['boroughs'], levels, str(data['source_stamp']))
+
+    # -- access ----------------------------------------------------------------
+
+    def stats(self):
+        """Points and bytes per level."""
+        return {level: {'points': int(len(p['coords'])),
+                        'bytes': int(sum(a.nbytes for a in p.values()))}
+                for level, p in self.levels.items()}
+
+    def polygons(self, level):
+        """Per zone: list of polygons, each a list of rings of [lon, lat] pairs (pydeck/GeoJSON order)."""
+        p = self.levels[level]
+        coords = np.round(p['coords'].astype(np.float64), 6).tolist()
+        rings, polys, zones = p['ring_offsets'], p['polygon_offsets'], p['zone_offsets']
+        out = []
+        for z in range(len(self.location_ids)):
+            zone = []
+            for poly in range(zones[z], zones[z + 1]):
+                zone.append([coords[rings[r]:rings[r + 1]] for r in range(polys[poly], polys[poly + 1])])
+            out.append(zone)
+        return out
+
+    def join(self, location_ids, values, fill=np.nan):
+        """Aligns metric values to self.location_ids by array lookup (ids not in the metric -> fill)."""
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        size = int(max(self.location_ids.max(), location_ids.max(initial=0))) + 1
+        lookup = np.full(size, fill, dtype=np.float64)
+        valid = (location_ids >= 0) & (location_ids < size)
+        lookup[location_ids[valid]] = values[valid]
+        return lookup[self.location_ids.astype(np.int64)]
+
+    def geojson(self, level, properties=None):
+        """FeatureCollection at a level; properties maps name -> array aligned with location_ids."""
+        features = []
+        properties = properties or {}
+        for i, polygons in enumerate(self.polygons(level)):
+            props = {'LocationID': int(self.location_ids[i]), 'zone': str(self.names[i]),
+                     'borough': str(self.boroughs[i])}
+            for name, values in properties.items():
+                value = values[i]
+                props[name] = value.tolist() if hasattr(value, 'tolist') else value
+            features.append({'type': 'Feature', 'properties': props,
+                             'geometry': {'type': 'MultiPolygon', 'coordinates': polygons}})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+def color_scale(values, diverging=False, missing=(200, 200, 200, 80)):
+    """RGBA uint8 colours for an array of values (NaN -> missing)."""
+    values = np.asarray(values, dtype=np.float64)
+    colors = np.tile(np.array(missing, dtype=np.uint8), (len(values), 1))
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return colors
+    v = values[valid]
+    if diverging:
+        # Blue (negative) - white - red (positive), symmetric around 0
+        span = np.nanpercentile(np.abs(v), 95) or 1.0
+        s = np.clip(v / span, -1, 1)
+        r = np.where(s > 0, 255, 255 * (1 + s))
+        g = 255 * (1 - np.abs(s))
+        b = np.where(s < 0, 255, 255 * (1 - s))
+    else:
+        # Yellow -> red sequential
+        lo, hi = np.nanpercentile(v, [5, 95])
+        s = np.clip((v - lo) / (hi - lo), 0, 1) if hi > lo else np.zeros_like(v)
+        r = np.full_like(s, 255)
+        g = 230 * (1 - s)
+        b = 60 * (1 - s)
+    colors[valid] = np.column_stack([r, g, b, np.full_like(s, 180)]).astype(np.uint8)
+    return colors
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+def load_zones(data_dir=None, cache_dir=None, tolerances=None, download=True):
+    """
+    ZoneGeometry from the binary cache, rebuilt from the shapefile/GeoJSON
+    when the source (or the tolerance set) changed. None if no source exists.
+    """
+    data_dir = Path(data_dir or DATA_DIR)
+    cache_path = Path(cache_dir or CACHE_DIR) / CACHE_FILE
+    tolerances = tolerances or SIMPLIFY_TOLERANCES
+    source = ensure_source(data_dir) if download else find_source(data_dir)
+    if source is None:
+        return None
+
+    stamp = json.dumps([str(source), file_stat(source), tolerances])
+    if cache_path.exists():
+        cached = ZoneGeometry.load(cache_path)
+        if cached.source_stamp == stamp:
+            return cached
+
+    zones = load_geojson(source) if source.suffix == ".geojson" else load_shapefile(source)
+    geometry = ZoneGeometry.from_zones(zones, tolerances, source_stamp=stamp)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    geometry.save(cache_path)
+    return geometry
+
+
+def main():
+    start = time.perf_counter()
+    geometry = load_zones()
+    if geometry is None:
+        print("No zone shapes available (data_downloads/taxi_zones/ or taxi_zones.geojson).")
+        return 1
+    print(f"{len(geometry.location_ids)} zones ready in {time.perf_counter() - start:.2f}s "
+          f"({CACHE_DIR / CACHE_FILE})")
+    for level, info in geometry.stats().items():
+        print(f"  {level:<8} tolerance {SIMPLIFY_TOLERANCES.get(level, 0):<7} "
+              f"{info['points']:>8,} points  {info['bytes'] / 1024:>8.1f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,56 +1,47 @@
-import subprocess
 import sys
-import time
 import os
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "core_modules"))
 
 def main():
+    # Sub-commands (ingest, engine, report, ...) go to the lazy CLI so a
+    # single stage or --help does not import the whole pipeline
+    if len(sys.argv) > 1 and sys.argv[1] != "--force":
+        import toolkit_cli
+        return toolkit_cli.main(sys.argv[1:])
+
+    import pipeline_runner
+
     print("=========================================")
     print("      Market Trend Analysis Tool         ")
     print("=========================================")
 
-    # 1. Run Data Ingestion
-    print(f"\n[1/5] Ingesting Market Data Streams...")
-    try:
-        subprocess.run([sys.executable, os.path.join("core_modules", "data_ingestion.py")], check=True)
-    except subprocess.CalledProcessError:
-        print("Error encountered in data_ingestion.py. Stopping.")
-        return
+    # Shared run ID so every stage's metrics land under the same run
+    os.environ.setdefault("MARKET_RUN_ID", uuid.uuid4().hex[:12])
 
-    # 2. Run Pipeline
-    print(f"\n[2/5] Running Processing Engine...")
-    try:
-        subprocess.run([sys.executable, os.path.join("core_modules", "processing_engine.py")], check=True)
-    except subprocess.CalledProcessError:
-        print("Error encountered in processing_engine.py. Stopping.")
-        return
+    # 1-5. Stages run in-process in dependency order, sharing one DuckDB
+    # connection. Report and content build in parallel once the engine is
+    # done, and stages whose inputs have not changed are skipped.
+    # Pass --force to rebuild everything.
+    force = "--force" in sys.argv
+    stages = pipeline_runner.STAGES + [pipeline_runner.DASHBOARD_STAGE]
+    ok, ctx = pipeline_runner.run_pipeline(stages=stages, force=force)
+    ctx.close()
+    pipeline_runner.print_timings(ctx)
 
-    # 3. Generate Report
-    print(f"\n[3/5] Generating Executive Summary...")
-    try:
-        subprocess.run([sys.executable, os.path.join("core_modules", "report_builder.py")], check=True)
-    except subprocess.CalledProcessError:
-        print("Error encountered in report_builder.py. Stopping.")
+    if ctx.dashboard is None:
         return
-
-    # 4. Generate Blogs
-    print(f"\n[4/5] Generating Content Assets...")
-    try:
-        subprocess.run([sys.executable, os.path.join("core_modules", "content_generator.py")], check=True)
-    except subprocess.CalledProcessError:
-        print("Error encountered in content_generator.py. Stopping.")
+    if not ok:
+        ctx.dashboard.terminate()
         return
-
-    # 5. Launch Dashboard
-    print(f"\n[5/5] Launching Analytics Dashboard...")
-    print("Press Ctrl+C to stop the dashboard server.")
-    dashboard_path = os.path.join("core_modules", "analytics_dashboard.py")
     try:
-        # Use python -m streamlit to ensure we use the correct environment
-        subprocess.run([sys.executable, "-m", "streamlit", "run", dashboard_path], check=True)
+        ctx.dashboard.wait()
     except KeyboardInterrupt:
+        ctx.dashboard.terminate()
         print("\nDashboard stopped by user.")
     except Exception as e:
         print(f"Error launching dashboard: {e}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())